@@ -0,0 +1 @@
+"""Offline benchmarks for the healthcare AI assistant."""
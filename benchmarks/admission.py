@@ -0,0 +1,99 @@
+"""Admission control under overload.
+
+The upstream model serves 20 calls at a time, 50 ms each, and queues the rest, the way a provider at its rate limit
+behaves. A burst of 400 turns from 100 users arrives at once. Without admission control every turn is accepted and
+waits upstream, so all of them get slow; with it, turns beyond the concurrency limit and a short queue are rejected
+at once with 429, and the admitted ones keep a predictable latency. Reports latency percentiles of completed turns,
+how many were rejected, and how long a rejection took.
+
+Run with `python -m benchmarks.admission [--json results.json]`.
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, ainvoke_turn, quantile, report
+from healthcare_ai.admission import AdmissionController, AdmissionRejectedError
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+
+TURNS = 400
+USERS = 100
+UPSTREAM_CAPACITY = 20
+MODEL_SECONDS = 0.05
+
+
+class _Upstream(AgentMiddleware[AgentState[Any], Any]):
+    """Let only `UPSTREAM_CAPACITY` model calls proceed at once, queueing the others."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.slots = asyncio.Semaphore(UPSTREAM_CAPACITY)
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        async with self.slots:
+            return await handler(request)
+
+
+async def _burst(admission: AdmissionController | None) -> tuple[list[float], list[float]]:
+    """Return the latencies of completed and of rejected turns."""
+    agent = build_agent(
+        FakeChatModel(script=[], latency=MODEL_SECONDS), checkpointer=InMemorySaver(), middleware=[_Upstream()]
+    )
+    completed: list[float] = []
+    rejected: list[float] = []
+
+    async def turn(index: int) -> None:
+        start = time.perf_counter()
+        try:
+            if admission is None:
+                await ainvoke_turn(agent, f"thread-{index}")
+            else:
+                async with admission.admit(f"user-{index % USERS}"):
+                    await ainvoke_turn(agent, f"thread-{index}")
+        except AdmissionRejectedError:
+            rejected.append(time.perf_counter() - start)
+        else:
+            completed.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(turn(index) for index in range(TURNS)))
+    return completed, rejected
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Admission control under overload.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    controllers = {
+        "no admission control": None,
+        "admission control": AdmissionController(
+            user_rate=1.0, user_burst=10, max_concurrent=UPSTREAM_CAPACITY, max_queue=40, queue_timeout=1.0
+        ),
+    }
+    results: list[Result] = []
+    for name, admission in controllers.items():
+        completed, rejected = asyncio.run(_burst(admission))
+        results.extend(Result(f"{name}, p{q * 100:g}", quantile(completed, q) * 1e3, "ms") for q in (0.5, 0.99))
+        results.append(Result(f"{name}, rejected", len(rejected), "turns"))
+        if rejected:
+            results.append(Result(f"{name}, rejection p99", quantile(rejected, 0.99) * 1e3, "ms"))
+    report(
+        f"Admission control, burst of {TURNS} turns, upstream serves {UPSTREAM_CAPACITY} at once", results, args.json
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Agent loop benchmark.
+
+Measures, with the offline fake model and no network:
+
+- graph overhead: one turn with a single model call and no tools, without a checkpointer
+- tool dispatch: extra cost per tool call, sequential steps and a parallel batch in one step
+- checkpointer writes: extra cost per turn for each checkpointer backend
+- throughput: turns per second with N concurrent conversations and a 50 ms model
+
+Run with `python -m benchmarks.agent [--json results.json]`.
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, ainvoke_turn, invoke_turn, report, throughput, time_per_call
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.memory import BoundedInMemorySaver, PooledSqliteSaver
+
+REPEAT = 200
+CONCURRENCY = (1, 10, 50, 100)
+WEATHER_CALL: dict[str, Any] = {"name": "get_weather_for_location", "args": {"city": "Florida"}}
+
+
+def _turn_seconds(script: list[list[dict[str, Any]]], checkpointer: BaseCheckpointSaver[str] | None = None) -> float:
+    agent = build_agent(FakeChatModel(script=script), checkpointer=checkpointer)
+    return time_per_call(lambda i: invoke_turn(agent, f"thread-{i}"), repeat=REPEAT)
+
+
+def _graph_and_tools() -> list[Result]:
+    baseline = _turn_seconds([])
+    sequential = _turn_seconds([[WEATHER_CALL]] * 3)
+    parallel = _turn_seconds([[WEATHER_CALL] * 3])
+    return [
+        Result("graph overhead per turn", baseline * 1e3, "ms"),
+        Result("tool dispatch per sequential step", (sequential - baseline) / 3 * 1e3, "ms"),
+        Result("tool dispatch per call, 3 in one step", (parallel - baseline) / 3 * 1e3, "ms"),
+    ]
+
+
+def _checkpointers(directory: Path) -> list[Result]:
+    backends: dict[str, BaseCheckpointSaver[str]] = {
+        "memory": InMemorySaver(),
+        "bounded": BoundedInMemorySaver(max_threads=1000, max_checkpoints_per_thread=5),
+        "sqlite": PooledSqliteSaver(str(directory / "checkpoints.sqlite")),
+    }
+    baseline = _turn_seconds([])
+    return [
+        Result(f"checkpointer cost per turn, {name}", (_turn_seconds([], saver) - baseline) * 1e3, "ms")
+        for name, saver in backends.items()
+    ]
+
+
+def _throughput() -> list[Result]:
+    agent = build_agent(FakeChatModel(latency=0.05), checkpointer=InMemorySaver())
+    return [
+        Result(
+            f"throughput, {concurrency} concurrent threads",
+            throughput(
+                lambda worker, _: ainvoke_turn(agent, f"thread-{worker}"), concurrency=concurrency, calls_per_worker=3
+            ),
+            "turns/s",
+        )
+        for concurrency in CONCURRENCY
+    ]
+
+
+def main() -> None:
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Agent loop benchmark.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        results = [*_graph_and_tools(), *_checkpointers(Path(directory)), *_throughput()]
+    report("Agent loop (fake model)", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Approximate against exact vector search: recall@10 against queries per second.
+
+Builds the exact index and the IVF index over the same 1M synthetic 128-dimensional vectors, drawn around 10,000
+random centers the way embeddings of related chunks cluster, and queries both with perturbed corpus vectors. For
+each `nprobe`, reports the IVF index's recall of the exact top 10 and its single-query throughput, next to the
+exact index's throughput, plus the IVF index's build time.
+
+Run with `python -m benchmarks.ann [--json results.json]`.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from benchmarks.harness import Result, report
+from healthcare_ai.rag.ann import IVFIndex
+from healthcare_ai.rag.index import SearchIndex, VectorIndex
+
+SIZE = 1_000_000
+DIMENSIONS = 128
+CENTERS = 10_000
+K = 10
+QUERIES = 200
+ADD_BATCH = 50_000
+NPROBES = (1, 4, 16, 64, 256)
+
+
+def synthetic(rng: np.random.Generator) -> npt.NDArray[np.float32]:
+    """Return `SIZE` vectors scattered around `CENTERS` random centers."""
+    centers = rng.standard_normal((CENTERS, DIMENSIONS), dtype=np.float32)
+    vectors = centers[rng.integers(CENTERS, size=SIZE)]
+    vectors += rng.standard_normal((SIZE, DIMENSIONS), dtype=np.float32)
+    return vectors
+
+
+def fill(index: SearchIndex, vectors: npt.NDArray[np.float32]) -> None:
+    """Add `vectors` to `index` under ids `"0"`, `"1"`, ..."""
+    for first in range(0, len(vectors), ADD_BATCH):
+        rows = range(first, min(first + ADD_BATCH, len(vectors)))
+        index.add([str(row) for row in rows], vectors[rows.start : rows.stop])
+
+
+def queries_per_second(index: SearchIndex, queries: npt.NDArray[np.float32]) -> tuple[float, list[set[str]]]:
+    """Search `queries` one at a time; return the throughput and each query's ids."""
+    start = time.perf_counter()
+    found = [{id_ for id_, _ in index.search(query, K)} for query in queries]
+    return len(queries) / (time.perf_counter() - start), found
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Approximate against exact vector search.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    vectors = synthetic(rng)
+    queries = vectors[rng.integers(SIZE, size=QUERIES)]
+    queries += 0.5 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact = VectorIndex(DIMENSIONS, capacity=SIZE)
+    fill(exact, vectors)
+    exact_qps, truth = queries_per_second(exact, queries)
+    del exact
+    results = [Result("exact", exact_qps, "queries/s")]
+
+    ivf = IVFIndex(DIMENSIONS)
+    start = time.perf_counter()
+    ivf.train(vectors)
+    trained = time.perf_counter() - start
+    fill(ivf, vectors)
+    results += [
+        Result(f"ivf, train {ivf.lists} lists", trained, "s"),
+        Result("ivf, build", time.perf_counter() - start, "s"),
+    ]
+    for nprobe in NPROBES:
+        ivf.nprobe = nprobe
+        qps, found = queries_per_second(ivf, queries)
+        recall = sum(len(ids & expected) for ids, expected in zip(found, truth, strict=True)) / (K * QUERIES)
+        results += [
+            Result(f"ivf, nprobe {nprobe}, recall@{K}", recall, ""),
+            Result(f"ivf, nprobe {nprobe}", qps, "queries/s"),
+        ]
+    report(f"Approximate search over {SIZE:,} vectors of {DIMENSIONS} dimensions", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
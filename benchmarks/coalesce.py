@@ -0,0 +1,83 @@
+"""Request coalescing under a burst of identical first turns.
+
+200 users ask the same question at once, each in a new conversation; half of them are in Florida and half in San
+Francisco, so their turns share the first model call and then split by the location their tools resolved. Every
+model call takes 100 ms. Reports how many calls went upstream and the turn latency percentiles, with and without
+coalescing.
+
+Run with `python -m benchmarks.coalesce [--json results.json]`.
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, agent_args, quantile, report
+from healthcare_ai.app import build_agent
+from healthcare_ai.coalesce import RequestCoalescingMiddleware
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.tools import Context
+
+TURNS = 200
+MODEL_SECONDS = 0.1
+
+
+class _Upstream(AgentMiddleware[AgentState[Any], Any]):
+    """Count the model calls that reach the model."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        self.calls += 1
+        return await handler(request)
+
+
+async def _burst(coalesce: bool) -> tuple[int, list[float]]:  # noqa: FBT001
+    """Return the upstream model calls and the turn latencies."""
+    upstream = _Upstream()
+    middleware: list[AgentMiddleware[AgentState[Any], Any]] = [upstream]
+    if coalesce:
+        middleware.insert(0, RequestCoalescingMiddleware())
+    agent = build_agent(FakeChatModel(latency=MODEL_SECONDS), checkpointer=InMemorySaver(), middleware=middleware)
+    latencies: list[float] = []
+
+    async def turn(index: int) -> None:
+        agent_input, config, _ = agent_args(f"thread-{index}")
+        # User "1" is in Florida, every other user in San Francisco.
+        context = Context(user_id="1" if index % 2 else str(index + 2))
+        start = time.perf_counter()
+        await agent.ainvoke(agent_input, config=config, context=context)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(turn(index) for index in range(TURNS)))
+    return upstream.calls, latencies
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Request coalescing under a burst of identical first turns.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    results: list[Result] = []
+    for name, coalesce in {"no coalescing": False, "coalescing": True}.items():
+        calls, latencies = asyncio.run(_burst(coalesce))
+        results.append(Result(f"{name}, upstream calls", calls, "calls"))
+        results.extend(Result(f"{name}, p{q * 100:g}", quantile(latencies, q) * 1e3, "ms") for q in (0.5, 0.99))
+    report(f"Request coalescing, burst of {TURNS} identical first turns", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Embedding stage throughput.
+
+Embeds the chunks of a 4 MB synthetic corpus with the offline hashing embedder, each call taking 10 ms like a
+round trip to an embedding API. Compares one chunk per call against batches of 64, sequential and 8 at a time,
+and re-indexing the unchanged corpus from a warm on-disk cache. Reports chunks embedded per second.
+
+Run with `python -m benchmarks.embed [--json results.json]`.
+"""
+
+import argparse
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+from benchmarks.harness import Result, report
+from benchmarks.ingest import write_corpus
+from healthcare_ai.rag.embed import EmbeddingCache, EmbeddingStage, HashingEmbeddings
+from healthcare_ai.rag.ingest import Chunk, ingest
+
+CORPUS_MB = 4
+CALL_SECONDS = 0.01
+# Chunks embedded one per call; the whole corpus would take minutes
+UNBATCHED_CHUNKS = 300
+
+
+def _rate(stage: EmbeddingStage, chunks: list[Chunk]) -> float:
+    start = time.perf_counter()
+    for _ in stage.embed(chunks):
+        pass
+    return len(chunks) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Embedding stage throughput.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    embeddings = HashingEmbeddings(latency=CALL_SECONDS)
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = Path(directory) / "corpus.txt"
+        write_corpus(corpus, CORPUS_MB)
+        chunks = list(ingest([corpus]))
+        cache = EmbeddingCache(str(Path(directory) / "embeddings.sqlite"))
+        stages = {
+            "one chunk per call": (EmbeddingStage(embeddings, batch_size=1, max_concurrency=1), UNBATCHED_CHUNKS),
+            "batches of 64": (EmbeddingStage(embeddings, max_concurrency=1), len(chunks)),
+            "batches of 64, 8 concurrent": (EmbeddingStage(embeddings, cache=cache, max_concurrency=8), len(chunks)),
+            "re-index from cache": (EmbeddingStage(embeddings, cache=cache, max_concurrency=8), len(chunks)),
+        }
+        results = [
+            Result(name, _rate(stage, list(islice(chunks, count))), "chunks/s")
+            for name, (stage, count) in stages.items()
+        ]
+        calls = stages["re-index from cache"][0].stats.calls
+    results.append(Result("re-index from cache, embedding calls", calls, "calls"))
+    report(f"Embedding {len(chunks)} chunks, {CALL_SECONDS * 1e3:g} ms per embedding call", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Shared helpers for the offline benchmarks.
+
+Benchmarks drive the real agent graph with `FakeChatModel`, so they need no network or API keys and their numbers
+are comparable between runs. Results print as a table and can be written as JSON for CI to track regressions.
+"""
+
+import asyncio
+import json
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+
+from healthcare_ai.app import Agent
+from healthcare_ai.tools import Context
+
+USER_MESSAGE = "what is the weather outside?"
+
+
+@dataclass
+class Result:
+    """One benchmark measurement."""
+
+    name: str
+    value: float
+    unit: str
+
+
+def time_per_call(fn: Callable[[int], object], *, repeat: int, warmup: int = 3) -> float:
+    """Return the mean seconds per call of `fn(i)` over `repeat` calls, after `warmup` untimed calls."""
+    for i in range(warmup):
+        fn(-1 - i)
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat
+
+
+def quantile(samples: list[float], q: float) -> float:
+    """Return the `q` quantile of `samples`, taking the nearest sample below it."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def throughput(fn: Callable[[int, int], Awaitable[object]], *, concurrency: int, calls_per_worker: int) -> float:
+    """Return calls per second when `concurrency` workers each await `fn(worker, i)` `calls_per_worker` times."""
+
+    async def worker(worker_id: int) -> None:
+        for i in range(calls_per_worker):
+            await fn(worker_id, i)
+
+    async def run() -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+        return time.perf_counter() - start
+
+    return concurrency * calls_per_worker / asyncio.run(run())
+
+
+def agent_args(thread_id: str, message: str = USER_MESSAGE) -> tuple[dict[str, Any], RunnableConfig, Context]:
+    """Return input, config and context for one conversation turn."""
+    config: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+    return {"messages": [{"role": "user", "content": message}]}, config, Context(user_id="1")
+
+
+def invoke_turn(agent: Agent, thread_id: str, message: str = USER_MESSAGE) -> dict[str, Any]:
+    """Run one conversation turn synchronously."""
+    agent_input, config, context = agent_args(thread_id, message)
+    return agent.invoke(agent_input, config=config, context=context)
+
+
+async def ainvoke_turn(agent: Agent, thread_id: str, message: str = USER_MESSAGE) -> dict[str, Any]:
+    """Run one conversation turn asynchronously."""
+    agent_input, config, context = agent_args(thread_id, message)
+    return await agent.ainvoke(agent_input, config=config, context=context)
+
+
+def report(title: str, results: list[Result], json_path: Path | None = None) -> None:
+    """Print results as a table and optionally write them to `json_path`."""
+    print(title)
+    width = max(len(result.name) for result in results)
+    for result in results:
+        print(f"  {result.name:<{width}}  {result.value:12.3f} {result.unit}")
+    if json_path is not None:
+        json_path.write_text(json.dumps([asdict(result) for result in results], indent=2))
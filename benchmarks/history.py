@@ -0,0 +1,53 @@
+"""History policy benchmark.
+
+Runs a 100-turn conversation on one thread against the offline fake model and reports the input tokens of the
+model call at selected turns, with and without the history policy. Without it the prompt grows with every turn;
+with it the prompt stays flat once the window is full.
+
+Run with `python -m benchmarks.history`.
+"""
+
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.history import HistoryMiddleware
+from healthcare_ai.tools import Context
+
+TURNS = 100
+REPORTED_TURNS = (1, 10, 25, 50, 75, 100)
+
+
+def _input_tokens_per_turn(middleware: list[AgentMiddleware[AgentState[Any], Any]]) -> list[int]:
+    agent = build_agent(FakeChatModel(), checkpointer=InMemorySaver(), middleware=middleware)
+    tokens: list[int] = []
+    for turn in range(TURNS):
+        response = agent.invoke(
+            {"messages": [{"role": "user", "content": f"what is the weather like today? ({turn})"}]},
+            config={"configurable": {"thread_id": "benchmark"}},
+            context=Context(user_id="1"),
+        )
+        last_call = next(message for message in reversed(response["messages"]) if isinstance(message, AIMessage))
+        tokens.append(last_call.usage_metadata["input_tokens"] if last_call.usage_metadata else 0)
+    return tokens
+
+
+def main() -> None:
+    """Run the benchmark and print input tokens per reported turn."""
+    policies: dict[str, list[AgentMiddleware[AgentState[Any], Any]]] = {
+        "full history": [],
+        "last 10 turns": [HistoryMiddleware(max_turns=10)],
+        "2000 tokens": [HistoryMiddleware(max_tokens=2000)],
+    }
+    print(f"{'turn':>16}" + "".join(f"{turn:>8}" for turn in REPORTED_TURNS))
+    for name, middleware in policies.items():
+        tokens = _input_tokens_per_turn(middleware)
+        print(f"{name:>16}" + "".join(f"{tokens[turn - 1]:>8}" for turn in REPORTED_TURNS))
+
+
+if __name__ == "__main__":
+    main()
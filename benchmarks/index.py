@@ -0,0 +1,67 @@
+"""Exact vector index build and search.
+
+Fills the NumPy index with 10k, 100k and 1M random 128-dimensional vectors and searches it for the top 10. Reports
+insertion throughput, single-query latency, throughput of 64-query batches, and the time to delete a tenth of the
+vectors, which tombstones them, and compact the matrix.
+
+Run with `python -m benchmarks.index [--json results.json]`.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from benchmarks.harness import Result, report, time_per_call
+from healthcare_ai.rag.index import VectorIndex
+
+SIZES = (10_000, 100_000, 1_000_000)
+DIMENSIONS = 128
+K = 10
+ADD_BATCH = 10_000
+QUERY_BATCH = 64
+
+
+def build(size: int, rng: np.random.Generator) -> VectorIndex:
+    """Return an index of `size` random vectors with ids `"0"`, `"1"`, ..."""
+    index = VectorIndex(DIMENSIONS)
+    for first in range(0, size, ADD_BATCH):
+        count = min(ADD_BATCH, size - first)
+        index.add([str(i) for i in range(first, first + count)], rng.standard_normal((count, DIMENSIONS)))
+    return index
+
+
+def _measure(size: int, rng: np.random.Generator, queries: npt.NDArray[np.float32]) -> list[Result]:
+    start = time.perf_counter()
+    index = build(size, rng)
+    added = size / (time.perf_counter() - start)
+    repeat = max(3, 1_000_000 // size)
+    single = time_per_call(lambda i: index.search(queries[i % QUERY_BATCH], K), repeat=repeat * 10)
+    batch = time_per_call(lambda _: index.search_batch(queries, K), repeat=repeat)
+    start = time.perf_counter()
+    index.delete(str(i) for i in range(0, size, 10))
+    index.compact()
+    deleted = time.perf_counter() - start
+    return [
+        Result(f"{size:,} vectors, add", added, "vectors/s"),
+        Result(f"{size:,} vectors, single query", single * 1e3, "ms"),
+        Result(f"{size:,} vectors, batches of {QUERY_BATCH}", QUERY_BATCH / batch, "queries/s"),
+        Result(f"{size:,} vectors, delete 10% and compact", deleted * 1e3, "ms"),
+    ]
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Exact vector index build and search.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((QUERY_BATCH, DIMENSIONS)).astype(np.float32)
+    results = [result for size in SIZES for result in _measure(size, rng, queries)]
+    report(f"Exact vector index, {DIMENSIONS} dimensions, top {K}", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Streaming ingestion throughput and memory.
+
+Builds synthetic corpora of 16 MB and 128 MB by repeating `sample_data.txt`, then chunks them with the README's
+defaults of 1000 characters and 200 of overlap. Reports throughput and the peak memory allocated while ingesting,
+which stays flat as the corpus grows because files are read and chunked as a stream.
+
+Run with `python -m benchmarks.ingest [--json results.json]`.
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.harness import Result, report
+from healthcare_ai.rag.ingest import ingest
+
+SAMPLE = Path(__file__).parent.parent / "sample_data.txt"
+CORPUS_MB = (16, 128)
+
+
+def write_corpus(path: Path, megabytes: int) -> None:
+    """Write a text file of about `megabytes` MB made of numbered copies of the sample document."""
+    sample = SAMPLE.read_text()
+    with path.open("w") as file:
+        for copy in range(megabytes * 2**20 // len(sample) + 1):
+            file.write(f"Document {copy}\n\n{sample}\n\n")
+
+
+def _ingest(path: Path) -> int:
+    return sum(1 for _ in ingest([path]))
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Streaming ingestion throughput and memory.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for megabytes in CORPUS_MB:
+            path = Path(directory) / f"corpus-{megabytes}.txt"
+            write_corpus(path, megabytes)
+            start = time.perf_counter()
+            chunks = _ingest(path)
+            seconds = time.perf_counter() - start
+            tracemalloc.start()
+            _ingest(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results += [
+                Result(f"{megabytes} MB, throughput", path.stat().st_size / 2**20 / seconds, "MB/s"),
+                Result(f"{megabytes} MB, chunks", chunks / seconds, "chunks/s"),
+                Result(f"{megabytes} MB, peak memory", peak / 2**10, "KB"),
+            ]
+    report("Streaming ingestion, 1000-character chunks with 200 of overlap", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
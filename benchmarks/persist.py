@@ -0,0 +1,104 @@
+"""Persistent index save and startup time.
+
+Saves an exact index of 1M 128-dimensional vectors, then times how long a worker takes to get a searchable index:
+mapping the file with `numpy.memmap`, against reading the whole matrix into memory. Then starts 4 worker
+processes on the same file with each loader, as restarted workers do, and reports their time to open it and answer
+a first query, and the memory private to each: mapped vectors stay in the page cache, shared by all workers.
+
+Run with `python -m benchmarks.persist [--json results.json]`.
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.harness import Result, report
+from benchmarks.index import build
+from healthcare_ai.rag.index import VectorIndex
+from healthcare_ai.rag.storage import IndexFile, load_index, save_index
+
+SIZE = 1_000_000
+WORKERS = 4
+# Run in each worker process: open the index, mapped or read into memory, answer one query, and print the seconds
+# taken and the MB of anonymous memory, which unlike the page cache is not shared between processes.
+_WORKER = """
+import sys, time
+start = time.perf_counter()
+from pathlib import Path
+import numpy as np
+from healthcare_ai.rag.index import VectorIndex
+from healthcare_ai.rag.storage import IndexFile, load_index
+path = Path(sys.argv[1])
+if sys.argv[2] == "mapped":
+    index = load_index(path)
+else:
+    mapped = IndexFile.open(path)
+    index = VectorIndex.from_arrays(list(mapped.ids), np.array(mapped.vectors))
+index.search(np.ones(index.dimensions), 10)
+seconds = time.perf_counter() - start
+rollup = dict(line.split(":", 1) for line in Path("/proc/self/smaps_rollup").read_text().splitlines()[1:])
+print(seconds, int(rollup["Anonymous"].split()[0]) / 1024, flush=True)
+sys.stdin.read()
+"""
+LOADERS = {"mapped": "memory-mapped", "read": "read into memory"}
+
+
+def _open_seconds(path: Path, loader: str) -> float:
+    start = time.perf_counter()
+    if loader == "mapped":
+        load_index(path)
+    else:
+        mapped = IndexFile.open(path)
+        VectorIndex.from_arrays(list(mapped.ids), np.array(mapped.vectors))
+    return time.perf_counter() - start
+
+
+def _workers(path: Path, loader: str) -> list[Result]:
+    """Start worker processes one after another, each keeping its index open until all have started."""
+    workers: list[subprocess.Popen[str]] = []
+    measured: list[tuple[float, float]] = []
+    for _ in range(WORKERS):
+        worker = subprocess.Popen(  # noqa: S603
+            [sys.executable, "-c", _WORKER, str(path), loader],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        assert worker.stdout is not None  # noqa: S101 - requested with stdout=PIPE
+        seconds, anonymous = worker.stdout.readline().split()
+        measured.append((float(seconds), float(anonymous)))
+        workers.append(worker)
+    for worker in workers:
+        worker.communicate("")
+    return [
+        Result(f"worker, {LOADERS[loader]}, open and first query, slowest", max(s for s, _ in measured), "s"),
+        Result(f"worker, {LOADERS[loader]}, anonymous memory, largest", max(mb for _, mb in measured), "MB"),
+    ]
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Persistent index save and startup time.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "index.vec"
+        index = build(SIZE, np.random.default_rng(0))
+        start = time.perf_counter()
+        save_index(index, path)
+        results = [Result("save", time.perf_counter() - start, "s")]
+        del index
+        results.append(Result("file size", path.stat().st_size / 2**20, "MB"))
+        results += [Result(f"open, {name}", _open_seconds(path, loader), "s") for loader, name in LOADERS.items()]
+        for loader in LOADERS:
+            results += _workers(path, loader)
+    report(f"Persistent index of {SIZE:,} vectors", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
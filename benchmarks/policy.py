@@ -0,0 +1,80 @@
+"""Model call policy benchmark.
+
+The fake model answers most calls in 40-60 ms but 2% of them take 1 s, the kind of tail a slow upstream adds.
+Runs the same turns, 10 conversations at a time, with no policy, with a per-attempt deadline and retries, and with
+hedging at the 95th percentile of recent latencies, and reports turn latency percentiles and the policy's counters.
+
+Run with `python -m benchmarks.policy [--json results.json]`.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, ainvoke_turn, quantile, report
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.model_policy import ModelPolicyMiddleware
+
+TURNS = 500
+CONCURRENCY = 10
+# Share of calls that hit the slow tail, and how slow they are
+SLOW_SHARE = 0.02
+SLOW_SECONDS = 1.0
+
+
+def _latency(seed: int) -> Callable[[], float]:
+    rng = random.Random(seed)  # noqa: S311 - reproducible latencies, not crypto
+
+    def draw() -> float:
+        return SLOW_SECONDS if rng.random() < SLOW_SHARE else rng.uniform(0.04, 0.06)
+
+    return draw
+
+
+def _turn_latencies(policy: ModelPolicyMiddleware | None) -> list[float]:
+    model = FakeChatModel(script=[], latency=_latency(seed=0))
+    agent = build_agent(model, checkpointer=InMemorySaver(), middleware=[policy] if policy else [])
+    latencies: list[float] = []
+
+    async def worker(worker_id: int) -> None:
+        for i in range(TURNS // CONCURRENCY):
+            start = time.perf_counter()
+            await ainvoke_turn(agent, f"thread-{worker_id}-{i}")
+            latencies.append(time.perf_counter() - start)
+
+    async def run() -> None:
+        await asyncio.gather(*(worker(worker_id) for worker_id in range(CONCURRENCY)))
+
+    asyncio.run(run())
+    return latencies
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Model call policy benchmark.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    policies = {
+        "no policy": None,
+        "200 ms deadline + retries": ModelPolicyMiddleware(attempt_timeout=0.2, backoff_base=0.01),
+        "hedge at p95": ModelPolicyMiddleware(hedge_quantile=0.95),
+    }
+    results: list[Result] = []
+    for name, policy in policies.items():
+        latencies = _turn_latencies(policy)
+        results.extend(Result(f"{name}, p{q * 100:g}", quantile(latencies, q) * 1e3, "ms") for q in (0.5, 0.95, 0.99))
+        if policy is not None:
+            counters = asdict(policy.stats)
+            results.extend(Result(f"{name}, {counter}", count, "calls") for counter, count in counters.items() if count)
+    report(f"Model call policy, {TURNS} turns, {SLOW_SHARE:.0%} of calls take {SLOW_SECONDS:g} s", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Prompt prefix caching check.
+
+Runs several conversations against the offline fake model, which caches prompt prefixes the way Anthropic does,
+with the history policy trimming old turns. With the prompt cache middleware every model call must share a single
+cached prefix, so all calls but the first read the tools and system prompt from the cache; without it nothing is
+cached. Reports the distinct prefixes seen and the cache read and write tokens.
+
+Run with `python -m benchmarks.prompt_cache [--json results.json]`.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, invoke_turn, report
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.history import HistoryMiddleware
+from healthcare_ai.prompt_cache import PromptCacheMiddleware
+
+if TYPE_CHECKING:
+    from langchain.agents.middleware import AgentMiddleware, AgentState
+
+THREADS = 5
+TURNS = 10
+
+
+def _run(prompt_cache: PromptCacheMiddleware | None) -> tuple[FakeChatModel, list[Result]]:
+    model = FakeChatModel()
+    middleware: list[AgentMiddleware[AgentState[Any], Any]] = [HistoryMiddleware(max_turns=3)]
+    if prompt_cache is not None:
+        middleware.append(prompt_cache)
+    agent = build_agent(model, checkpointer=InMemorySaver(), middleware=middleware)
+    for thread in range(THREADS):
+        for turn in range(TURNS):
+            invoke_turn(agent, f"thread-{thread}", f"what is the weather like today? ({turn})")
+    name = "with prompt cache" if prompt_cache else "without prompt cache"
+    results = [Result(f"{name}, distinct cached prefixes", model.cached_prefixes, "prefixes")]
+    if prompt_cache is not None:
+        stats = prompt_cache.stats
+        results += [
+            Result(f"{name}, model calls", stats.calls, "calls"),
+            Result(f"{name}, input tokens", stats.input_tokens, "tokens"),
+            Result(f"{name}, cache read tokens", stats.cache_read_tokens, "tokens"),
+            Result(f"{name}, cache write tokens", stats.cache_write_tokens, "tokens"),
+            Result(f"{name}, prefix hit rate", stats.hit_rate * 100, "%"),
+        ]
+    return model, results
+
+
+def main() -> None:
+    """Run the check; exit with an error if the cached prefix was not stable."""
+    parser = argparse.ArgumentParser(description="Prompt prefix caching check.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    _, without = _run(None)
+    model, with_cache = _run(PromptCacheMiddleware())
+    report(f"Prompt prefix caching, {THREADS} threads x {TURNS} turns (fake model)", without + with_cache, args.json)
+    if model.cached_prefixes != 1:
+        sys.exit("The prompt prefix changed between model calls")
+
+
+if __name__ == "__main__":
+    main()
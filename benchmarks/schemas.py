@@ -0,0 +1,85 @@
+"""Tool schema and response format overhead benchmark.
+
+Every model call binds the tools and the structured response format to the model. Left to the agent, that converts
+each tool to a JSON schema and resolves the response format into a fresh tool strategy on every call; the agent
+built by `build_agent` does both once. Measures the bind step alone, against an offline `ChatAnthropic` that sends
+nothing, and whole turns against the fake model, before and after.
+
+Run with `python -m benchmarks.schemas [--json results.json]`.
+"""
+
+import argparse
+from pathlib import Path
+
+from langchain.agents import create_agent
+from langchain.agents.structured_output import OutputToolBinding, ToolStrategy
+from langchain_anthropic import ChatAnthropic
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, invoke_turn, report, time_per_call
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.prompt import system_prompt
+from healthcare_ai.response import ResponseFormat
+from healthcare_ai.tools import Context, get_user_location, get_weather_for_location
+
+BIND_REPEAT = 500
+TURN_REPEAT = 200
+TOOLS = [get_user_location, get_weather_for_location]
+
+
+def _bind_cost() -> list[Result]:
+    # Binding only prepares the request; nothing is sent.
+    model = ChatAnthropic(model_name="claude-sonnet-4-5", api_key="offline")  # pyright: ignore[reportCallIssue, reportArgumentType]
+    # The agent builds the response format's output tool once either way.
+    output_tool = OutputToolBinding.from_schema_spec(ToolStrategy(ResponseFormat).schema_specs[0]).tool
+    schemas = [convert_to_openai_tool(tool) for tool in TOOLS]
+
+    def per_call(_: int) -> None:
+        ToolStrategy(ResponseFormat)
+        model.bind_tools([*TOOLS, output_tool], tool_choice="any")
+
+    def precompiled(_: int) -> None:
+        model.bind_tools([*schemas, output_tool], tool_choice="any")
+
+    return [
+        Result("bind per model call, converted per call", time_per_call(per_call, repeat=BIND_REPEAT) * 1e6, "us"),
+        Result("bind per model call, precompiled", time_per_call(precompiled, repeat=BIND_REPEAT) * 1e6, "us"),
+    ]
+
+
+def _turn_cost() -> list[Result]:
+    before = create_agent(
+        model=FakeChatModel(),
+        system_prompt=system_prompt,
+        tools=TOOLS,
+        context_schema=Context,
+        response_format=ResponseFormat,
+        checkpointer=InMemorySaver(),
+    )
+    after = build_agent(FakeChatModel(), checkpointer=InMemorySaver())
+    return [
+        Result(
+            "turn, converted per call",
+            time_per_call(lambda i: invoke_turn(before, f"before-{i}"), repeat=TURN_REPEAT) * 1e3,
+            "ms",
+        ),
+        Result(
+            "turn, precompiled",
+            time_per_call(lambda i: invoke_turn(after, f"after-{i}"), repeat=TURN_REPEAT) * 1e3,
+            "ms",
+        ),
+    ]
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Tool schema and response format overhead benchmark.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    report("Tool schema and response format overhead", _bind_cost() + _turn_cost(), args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Startup benchmark.
+
+Measures what a fresh worker process pays before it can serve a request: importing
+`healthcare_ai.app` and building the agent on first use. Every sample runs in a new
+interpreter so nothing is shared between runs.
+
+Run with `python -m benchmarks.startup`.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+SAMPLES = 5
+
+# Library imports are timed separately so the cost of the module itself is visible.
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import langchain.agents, langchain.chat_models, langgraph.checkpoint.memory
+t1 = time.perf_counter()
+import healthcare_ai.app as app
+t2 = time.perf_counter()
+app.get_agent()
+t3 = time.perf_counter()
+app.get_agent()
+t4 = time.perf_counter()
+print(json.dumps({"libraries": t1 - t0, "module": t2 - t1, "first_build": t3 - t2, "cached": t4 - t3}))
+"""
+
+
+def _sample() -> dict[str, float]:
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", _PROBE], capture_output=True, check=True, text=True
+    )
+    return json.loads(result.stdout)
+
+
+def main() -> None:
+    """Run the benchmark and print median timings in milliseconds."""
+    samples = [_sample() for _ in range(SAMPLES)]
+    for stage in ("libraries", "module", "first_build", "cached"):
+        median = statistics.median(sample[stage] for sample in samples)
+        print(f"{stage:>12}: {median * 1000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Time to first token of the structured response.
+
+The fake model takes 100 ms to start answering and then streams about 100 tokens per second, with a punny response
+of a typical length. Measures, over a run of turns, when the first `punny_response` text reaches the client, when
+the field is complete, and when the whole structured response is available, which is when a client that does not
+parse the stream could show anything.
+
+Run with `python -m benchmarks.streaming [--json results.json]`.
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import Result, agent_args, report
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.response_stream import astream_response
+
+TURNS = 20
+RESPONSE = {
+    "punny_response": (
+        "Looks like the sun is working overtime in Florida today: it's a 'sun-believable' forecast, so pack the "
+        "sunscreen and leave the umbrella at home!"
+    ),
+    "weather_conditions": "Sunny, 31 degrees and a light breeze from the east.",
+}
+
+
+async def _turn(index: int) -> dict[str, float]:
+    model = FakeChatModel(script=[], response=RESPONSE, latency=0.1, chunk_chars=4, chunk_latency=0.01)
+    agent = build_agent(model, checkpointer=InMemorySaver())
+    start = time.perf_counter()
+    seen: dict[str, float] = {}
+    async for event, data in astream_response(agent, *agent_args(f"thread-{index}")):
+        name = f"{event} {data['field']}" if event in {"delta", "field"} else event
+        seen.setdefault(name, time.perf_counter() - start)
+    return seen
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Time to first token of the structured response.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    turns = [asyncio.run(_turn(index)) for index in range(TURNS)]
+
+    def mean_ms(name: str) -> float:
+        return sum(turn[name] for turn in turns) / len(turns) * 1e3
+
+    results = [
+        Result("first punny_response text", mean_ms("delta punny_response"), "ms"),
+        Result("punny_response complete", mean_ms("field punny_response"), "ms"),
+        Result("weather_conditions complete", mean_ms("field weather_conditions"), "ms"),
+        Result("whole structured response", mean_ms("response"), "ms"),
+    ]
+    report(f"Structured response streaming, {TURNS} turns (fake model)", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Parallel tool-call benchmark.
+
+The fake model asks for three slow tools (100, 200 and 300 ms) in a single step. Run concurrently, the step takes
+about as long as the slowest tool; run one after another, it takes the sum. Measures the step latency, with the
+graph overhead of a tool-free turn subtracted, for:
+
+- the sync agent, which runs the calls in a thread pool
+- the async agent with async tools, which awaits them on the event loop
+- the async agent with sync-only tools, which runs them in worker threads
+- the async agent with each tool limited to one call at a time, against a step that calls one tool three times
+
+Run with `python -m benchmarks.tools [--json results.json]`.
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from benchmarks.harness import Result, ainvoke_turn, invoke_turn, report, time_per_call
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.tool_limits import ToolConcurrencyMiddleware
+
+REPEAT = 5
+# Seconds each slow tool takes
+DURATIONS = {"fetch_forecast": 0.1, "fetch_air_quality": 0.2, "fetch_pollen_count": 0.3}
+
+
+def _slow_tool(name: str, seconds: float, *, coroutine: bool = True) -> BaseTool:
+    def run(city: str) -> str:
+        time.sleep(seconds)
+        return f"{name} for {city}"
+
+    async def arun(city: str) -> str:
+        await asyncio.sleep(seconds)
+        return f"{name} for {city}"
+
+    return StructuredTool.from_function(
+        run, coroutine=arun if coroutine else None, name=name, description=f"Look up the {name} for a city."
+    )
+
+
+def _call(name: str) -> dict[str, Any]:
+    return {"name": name, "args": {"city": "Florida"}}
+
+
+def _step_seconds(
+    script: list[list[dict[str, Any]]],
+    *,
+    run_async: bool,
+    coroutine: bool = True,
+    limit: int | None = None,
+) -> float:
+    tools = [_slow_tool(name, seconds, coroutine=coroutine) for name, seconds in DURATIONS.items()]
+    middleware = [ToolConcurrencyMiddleware(default=limit)]
+
+    def turn_seconds(turn_script: list[list[dict[str, Any]]]) -> float:
+        agent = build_agent(FakeChatModel(script=turn_script), middleware=middleware, tools=tools)
+        if run_async:
+            return time_per_call(lambda i: asyncio.run(ainvoke_turn(agent, f"thread-{i}")), repeat=REPEAT, warmup=1)
+        return time_per_call(lambda i: invoke_turn(agent, f"thread-{i}"), repeat=REPEAT, warmup=1)
+
+    return turn_seconds(script) - turn_seconds([])
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Parallel tool-call benchmark.")
+    parser.add_argument("--json", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    step = [[_call(name) for name in DURATIONS]]
+    slowest = max(DURATIONS, key=DURATIONS.__getitem__)
+    results = [
+        Result("slowest tool", max(DURATIONS.values()) * 1e3, "ms"),
+        Result("sum of tools", sum(DURATIONS.values()) * 1e3, "ms"),
+        Result("step, sync agent", _step_seconds(step, run_async=False) * 1e3, "ms"),
+        Result("step, async agent, async tools", _step_seconds(step, run_async=True) * 1e3, "ms"),
+        Result("step, async agent, sync tools", _step_seconds(step, run_async=True, coroutine=False) * 1e3, "ms"),
+        Result(
+            f"step, 3 x {slowest}, no limit",
+            _step_seconds([[_call(slowest)] * 3], run_async=True) * 1e3,
+            "ms",
+        ),
+        Result(
+            f"step, 3 x {slowest}, limit 1",
+            _step_seconds([[_call(slowest)] * 3], run_async=True, limit=1) * 1e3,
+            "ms",
+        ),
+    ]
+    report("Parallel tool calls in one step (fake model)", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
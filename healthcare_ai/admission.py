@@ -0,0 +1,214 @@
+"""
+Admission control for agent turns.
+
+Every admitted turn makes model calls, so a burst of requests would otherwise open as many concurrent calls as it
+has requests, run into the provider's rate limits and slow every conversation down. Each turn is admitted in two
+steps:
+
+1. per user: a token bucket keyed on `Context.user_id` lets each user sustain `user_rate` turns per second, with
+   bursts of up to `user_burst`
+2. globally: at most `max_concurrent` turns run at once; up to `max_queue` more wait for a slot, each for at most
+   `queue_timeout` seconds
+
+A turn that is over its user's rate, finds the queue full, or waits too long is rejected at once with a suggested
+retry delay, which the server answers with 429, instead of adding to the latency of the turns already admitted. A
+turn turned away by the global limit gives its user's token back, since it never ran.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import cache
+
+from healthcare_ai.config import get_settings
+
+# Reasons for rejecting a turn
+USER_RATE = "user rate"
+QUEUE_FULL = "queue full"
+QUEUE_TIMEOUT = "queue timeout"
+# Seconds a client rejected for a full queue is asked to wait before retrying
+OVERLOAD_RETRY_AFTER = 1.0
+
+
+class AdmissionRejectedError(Exception):
+    """A turn was not admitted."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        """Reject for `reason`, suggesting a retry after `retry_after` seconds."""
+        super().__init__(f"Turn rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """The retry delay as a `Retry-After` header value, in whole seconds."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Allow `rate` events per second on average and `burst` at once."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Start full."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take a token if there is one and return 0, otherwise return the seconds until there is one."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Give back a token taken for an event that did not happen."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+@dataclass
+class AdmissionStats:
+    """Counters of the admission decisions."""
+
+    admitted: int = 0
+    # Rejected turns by reason
+    rejected: dict[str, int] = field(default_factory=dict[str, int])
+    # Turns running and waiting for a slot right now
+    running: int = 0
+    queued: int = 0
+    peak_queued: int = 0
+    # Total seconds admitted turns waited in the queue
+    queued_seconds: float = 0.0
+
+
+class AdmissionController:
+    """Admit turns under a per-user rate limit and a global concurrency limit with a bounded queue."""
+
+    def __init__(
+        self,
+        *,
+        user_rate: float | None = None,
+        user_burst: int = 10,
+        max_concurrent: int | None = None,
+        max_queue: int = 0,
+        queue_timeout: float | None = None,
+        max_users: int = 100_000,
+    ) -> None:
+        """Configure the limits; `None` disables the per-user or the global limit.
+
+        At most `max_users` buckets are kept, the least recently used dropped first; a dropped user starts again
+        with a full bucket.
+        """
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_users = max_users
+        self.stats = AdmissionStats()
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._slots = asyncio.Semaphore(max_concurrent) if max_concurrent is not None else None
+        self._lock = threading.Lock()
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejectedError:
+        with self._lock:
+            self.stats.rejected[reason] = self.stats.rejected.get(reason, 0) + 1
+        return AdmissionRejectedError(reason, retry_after)
+
+    def check_user(self, user_id: str) -> None:
+        """Take a token from the user's bucket, or raise `AdmissionRejectedError` if it is empty."""
+        if self.user_rate is None:
+            return
+        with self._lock:
+            if (bucket := self._buckets.get(user_id)) is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+                if len(self._buckets) > self.max_users:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(user_id)
+            wait = bucket.take(time.monotonic())
+        if wait > 0:
+            raise self._reject(USER_RATE, wait)
+
+    def refund_user(self, user_id: str) -> None:
+        """Give back the token `check_user` took for a turn that was not admitted after all."""
+        if self.user_rate is None:
+            return
+        with self._lock:
+            if (bucket := self._buckets.get(user_id)) is not None:
+                bucket.refund()
+
+    async def acquire(self, user_id: str) -> None:
+        """Admit a turn for `user_id`, waiting for a slot if needed; call `release` when it ends."""
+        self.check_user(user_id)
+        if self._slots is not None:
+            try:
+                if self._slots.locked():
+                    await self._wait_for_slot(self._slots)
+                else:
+                    await self._slots.acquire()
+            except BaseException:
+                # Rejected by the queue or cancelled while waiting: the turn never ran.
+                self.refund_user(user_id)
+                raise
+        with self._lock:
+            self.stats.admitted += 1
+            self.stats.running += 1
+
+    async def _wait_for_slot(self, slots: asyncio.Semaphore) -> None:
+        with self._lock:
+            full = self.stats.queued >= self.max_queue
+            if not full:
+                self.stats.queued += 1
+                self.stats.peak_queued = max(self.stats.peak_queued, self.stats.queued)
+        if full:
+            raise self._reject(QUEUE_FULL, OVERLOAD_RETRY_AFTER)
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await slots.acquire()
+        except TimeoutError:
+            raise self._reject(QUEUE_TIMEOUT, OVERLOAD_RETRY_AFTER) from None
+        finally:
+            with self._lock:
+                self.stats.queued -= 1
+        with self._lock:
+            self.stats.queued_seconds += time.monotonic() - start
+
+    def release(self) -> None:
+        """End an admitted turn, freeing its slot."""
+        with self._lock:
+            self.stats.running -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[None]:
+        """Run the body as an admitted turn for `user_id`."""
+        await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@cache
+def get_admission() -> AdmissionController | None:
+    """Return the process-wide admission controller, or `None` when no limit is configured."""
+    settings = get_settings()
+    if not settings.admission_user_rate and not settings.admission_max_concurrent:
+        return None
+    return AdmissionController(
+        user_rate=settings.admission_user_rate or None,
+        user_burst=settings.admission_user_burst,
+        max_concurrent=settings.admission_max_concurrent or None,
+        max_queue=settings.admission_max_queue,
+        queue_timeout=settings.admission_queue_timeout or None,
+    )
@@ -1,68 +1,155 @@
 """LangChain agent application."""
 
+import json
 import logging
+from collections.abc import Sequence
+from dataclasses import asdict
+from functools import cache
+from typing import TYPE_CHECKING, Any
 
 from langchain.agents import create_agent
-from langchain_core.runnables import RunnableConfig
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.agents.structured_output import ToolStrategy
+from langchain_core.language_models import BaseChatModel
+from langchain_core.tools import BaseTool
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.state import CompiledStateGraph
 
-from healthcare_ai.config import model
-from healthcare_ai.memory import checkpointer
+from healthcare_ai.cache import get_response_cache
+from healthcare_ai.coalesce import get_request_coalescer
+from healthcare_ai.config import get_model
+from healthcare_ai.history import get_history_middleware
+from healthcare_ai.memory import get_checkpointer
+from healthcare_ai.metrics import get_metrics
+from healthcare_ai.model_policy import get_model_policy
 from healthcare_ai.prompt import system_prompt
+from healthcare_ai.prompt_cache import get_prompt_cache
 from healthcare_ai.response import ResponseFormat
+from healthcare_ai.routing import get_router
+from healthcare_ai.tool_limits import get_tool_limits
+from healthcare_ai.tool_schemas import ToolSchemaMiddleware
 from healthcare_ai.tools import (
     Context,
     get_user_location,
     get_weather_for_location,
 )
+from healthcare_ai.tracing import InMemorySpanExporter, Tracer, TracingSaver, get_span_exporter, timing_record
+
+if TYPE_CHECKING:
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.runnables import RunnableConfig
 
-logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
 
+Agent = CompiledStateGraph[Any, Context, Any, Any]
+
 
 def get_weather(city: str) -> str:
     """Get weather for a given city."""
     return f"It's always sunny in {city}!"
 
 
-agent = create_agent(
-    model=model,
-    system_prompt=system_prompt,
-    tools=[get_user_location, get_weather_for_location],
-    context_schema=Context,
-    response_format=ResponseFormat,
-    checkpointer=checkpointer,
-)
-# `thread_id` is a unique identifier for a given conversation.
-config: RunnableConfig = {"configurable": {"thread_id": "1"}}
+def build_agent(
+    model: BaseChatModel,
+    *,
+    checkpointer: BaseCheckpointSaver[str] | None = None,
+    middleware: Sequence[AgentMiddleware[AgentState[Any], Any]] = (),
+    tools: Sequence[BaseTool] = (get_user_location, get_weather_for_location),
+) -> Agent:
+    """Assemble the weather agent around the given model, checkpointer, middleware and tools.
 
-response = agent.invoke(
-    {"messages": [{"role": "user", "content": "what is the weather outside?"}]},
-    config=config,
-    context=Context(user_id="1"),
-)
+    Everything derived from the tools and the response format is computed here once, not on every model call:
+    the tool schemas are precompiled, and the response format is fixed to a tool strategy, which is what
+    automatic detection picks for Anthropic models but would rebuild the `ResponseFormat` schema on each call.
+    """
+    return create_agent(
+        model=model,
+        system_prompt=system_prompt,
+        tools=list(tools),
+        context_schema=Context,
+        response_format=ToolStrategy(ResponseFormat),
+        checkpointer=None if checkpointer is None else TracingSaver(checkpointer),
+        # Outermost, so every other middleware sees the precompiled schemas.
+        middleware=[ToolSchemaMiddleware(tools), *middleware],
+    )
 
-logger.info(response["structured_response"])
-ResponseFormat(
-    punny_response=(
-        "Florida is still having a 'sun-derful' day! The sunshine is playing 'ray-dio' hits all day long!"
-        "I'd say it's the perfect weather for some 'solar-bration'! If you were hoping for rain, "
-        "I'm afraid that idea is all 'washed up' - the forecast remains 'clear-ly' brilliant!"
-    ),
-    weather_conditions="It's always sunny in Florida!",
-)
 
+@cache
+def get_agent() -> Agent:
+    """Return the process-wide agent, building it on first use.
 
-# Note that we can continue the conversation using the same `thread_id`.
-response = agent.invoke(
-    {"messages": [{"role": "user", "content": "thank you!"}]}, config=config, context=Context(user_id="1")
-)
+    Nothing is constructed at import time, so importing this module is cheap and
+    performs no network calls. The first call pays for model and graph setup.
+    """
+    middleware = get_history_middleware()
+    if (router := get_router()) is not None:
+        middleware.append(router)
+    # The cache goes after the history policy and the router, so it is keyed on the trimmed request and the model
+    # that actually sees it.
+    if (response_cache := get_response_cache()) is not None:
+        middleware.append(response_cache)
+    # Identical requests the cache could not answer wait for one model call.
+    if (coalescer := get_request_coalescer()) is not None:
+        middleware.append(coalescer)
+    if (prompt_cache := get_prompt_cache()) is not None:
+        middleware.append(prompt_cache)
+    # The policy is innermost, so cache hits skip it and each retry or hedge is a real model call.
+    middleware.append(get_model_policy())
+    middleware.extend(get_tool_limits())
+    agent = build_agent(get_model(), checkpointer=get_checkpointer(), middleware=middleware)
+    # Metrics are recorded from the trace spans, so either one turns tracing on.
+    exporters = [exporter for exporter in (get_span_exporter(), get_metrics()) if exporter is not None]
+    if exporters:
+        agent = agent.with_config(callbacks=[Tracer(*exporters).handler])
+    return agent
 
-logger.info(response["structured_response"])
-ResponseFormat(
-    punny_response=(
-        "You're 'thund-erfully' welcome! It's always a 'breeze' to help you stay 'current' with the weather. "
-        "I'm just 'cloud'-ing around waiting to 'shower' you with more forecasts whenever you need them. "
-        "Have a 'sun-sational' day in the Florida sunshine!"
-    ),
-    weather_conditions=None,
-)
+
+def main() -> None:
+    """Run a short example conversation against the agent."""
+    logging.basicConfig(level=logging.INFO)
+    agent = get_agent()
+    # Each turn is traced here as well, to log where its time went.
+    spans = InMemorySpanExporter()
+    # Callbacks passed with a call replace those the graph was configured with, so both are passed here.
+    configured = (agent.config or {}).get("callbacks")
+    callbacks: list[BaseCallbackHandler] = [*configured] if isinstance(configured, list) else []
+    callbacks.append(Tracer(spans).handler)
+    # `thread_id` is a unique identifier for a given conversation.
+    config: RunnableConfig = {"configurable": {"thread_id": "1"}, "callbacks": callbacks}
+
+    response = agent.invoke(
+        {"messages": [{"role": "user", "content": "what is the weather outside?"}]},
+        config=config,
+        context=Context(user_id="1"),
+    )
+
+    logger.info(json.dumps({**timing_record(spans.spans), "response": asdict(response["structured_response"])}))
+    spans.clear()
+    ResponseFormat(
+        punny_response=(
+            "Florida is still having a 'sun-derful' day! The sunshine is playing 'ray-dio' hits all day long!"
+            "I'd say it's the perfect weather for some 'solar-bration'! If you were hoping for rain, "
+            "I'm afraid that idea is all 'washed up' - the forecast remains 'clear-ly' brilliant!"
+        ),
+        weather_conditions="It's always sunny in Florida!",
+    )
+
+    # Note that we can continue the conversation using the same `thread_id`.
+    response = agent.invoke(
+        {"messages": [{"role": "user", "content": "thank you!"}]}, config=config, context=Context(user_id="1")
+    )
+
+    logger.info(json.dumps({**timing_record(spans.spans), "response": asdict(response["structured_response"])}))
+    spans.clear()
+    ResponseFormat(
+        punny_response=(
+            "You're 'thund-erfully' welcome! It's always a 'breeze' to help you stay 'current' with the weather. "
+            "I'm just 'cloud'-ing around waiting to 'shower' you with more forecasts whenever you need them. "
+            "Have a 'sun-sational' day in the Florida sunshine!"
+        ),
+        weather_conditions=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
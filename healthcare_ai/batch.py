@@ -0,0 +1,218 @@
+"""
+Batch runner for offline and bulk question processing.
+
+Reads prompts from a JSONL file, runs them through the agent with bounded concurrency and appends one JSONL
+result per prompt, with its timing, as soon as it finishes. Results are flushed line by line, so after a crash
+the same command resumes where it stopped: prompts already answered successfully are skipped, failed ones are
+retried.
+
+Run it with `python -m healthcare_ai.batch prompts.jsonl results.jsonl --max-concurrency 16`. Each input line is
+a JSON object whose message is read from `--message-field` and whose id is read from `--id-field`, falling back
+to the line number; `requests.jsonl` can be run with `--id-field request_id --message-field body`. Lines that are
+not valid JSON or lack the message are recorded as failed prompts.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, cast
+
+from healthcare_ai.app import Agent, get_agent
+from healthcare_ai.tools import Context
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """One prompt of a batch."""
+
+    # Identifies the prompt in the results and across resumed runs
+    id: str
+    # The user's message
+    message: str
+    # Conversation the prompt runs in; each prompt gets a fresh one unless the input names it
+    thread_id: str
+    # Passed to the tools as `Context.user_id`
+    user_id: str
+    # Why the input line is not a usable prompt; such items are recorded as failures without running
+    error: str | None = None
+
+
+@dataclass
+class BatchStats:
+    """Outcome counts of one batch run."""
+
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+
+def read_items(
+    path: Path,
+    *,
+    id_field: str = "id",
+    message_field: str = "message",
+    user_id: str = "1",
+) -> Iterator[BatchItem]:
+    """Yield the prompts of a JSONL file one line at a time; `thread_id` and `user_id` fields are optional.
+
+    A line that is not valid JSON or lacks the message field is yielded as an item carrying the error, so it is
+    recorded as failed instead of stopping the batch.
+    """
+    with path.open(encoding="utf-8") as lines:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record: object = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield _invalid_item(str(number), f"line {number} is not valid JSON: {error}")
+                continue
+            if not isinstance(record, dict):
+                yield _invalid_item(str(number), f"line {number} is not a JSON object")
+                continue
+            fields = cast("dict[str, Any]", record)
+            item_id = str(fields.get(id_field, number))
+            if message_field not in fields:
+                yield _invalid_item(item_id, f"line {number} has no {message_field!r} field")
+                continue
+            yield BatchItem(
+                id=item_id,
+                message=str(fields[message_field]),
+                thread_id=str(fields.get("thread_id") or f"batch-{uuid.uuid4().hex}"),
+                user_id=str(fields.get("user_id", user_id)),
+            )
+
+
+def _invalid_item(item_id: str, error: str) -> BatchItem:
+    return BatchItem(id=item_id, message="", thread_id="", user_id="", error=error)
+
+
+def completed_ids(path: Path) -> set[str]:
+    """Return the ids answered successfully in an earlier run writing to `path`."""
+    if not path.exists():
+        return set()
+    done: set[str] = set()
+    with path.open(encoding="utf-8") as lines:
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line of a crashed run may be cut short.
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+async def run_item(agent: Agent, item: BatchItem) -> dict[str, Any]:
+    """Answer one prompt and return its result record; failures are recorded rather than raised."""
+    config: RunnableConfig = {"configurable": {"thread_id": item.thread_id}}
+    record: dict[str, Any] = {"id": item.id, "thread_id": item.thread_id}
+    if item.error is not None:
+        logger.warning("Prompt %s is invalid: %s", item.id, item.error)
+        return {**record, "status": "error", "error": item.error, "seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        response = await agent.ainvoke(
+            {"messages": [{"role": "user", "content": item.message}]},
+            config=config,
+            context=Context(user_id=item.user_id),
+        )
+        record.update(status="ok", response=asdict(response["structured_response"]))
+    except Exception as error:  # noqa: BLE001 - one failed prompt must not stop the batch
+        logger.warning("Prompt %s failed: %r", item.id, error)
+        record.update(status="error", error=f"{type(error).__name__}: {error}")
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def _open_results(path: Path) -> IO[str]:
+    """Open `path` for appending, terminating a line cut short by a crash."""
+    cut_short = False
+    if path.exists() and path.stat().st_size:
+        with path.open("rb") as existing:
+            existing.seek(-1, os.SEEK_END)
+            cut_short = existing.read(1) != b"\n"
+    output = path.open("a", encoding="utf-8")
+    if cut_short:
+        output.write("\n")
+    return output
+
+
+async def run_batch(
+    agent: Agent,
+    items: Iterable[BatchItem],
+    output: Path,
+    *,
+    max_concurrency: int = 8,
+) -> BatchStats:
+    """Answer `items` with at most `max_concurrency` in flight, appending each result to `output` as it finishes.
+
+    Items are pulled from `items` lazily, so the input is never held in memory all at once.
+    """
+    stats = BatchStats()
+    done = completed_ids(output)
+
+    def pending() -> Iterator[BatchItem]:
+        for item in items:
+            if item.id in done:
+                stats.skipped += 1
+            else:
+                yield item
+
+    queue = pending()
+    with _open_results(output) as results:
+
+        async def worker() -> None:
+            # Workers share one iterator; each pulls the next prompt when its previous one finishes.
+            for item in queue:
+                record = await run_item(agent, item)
+                results.write(json.dumps(record, ensure_ascii=False) + "\n")
+                results.flush()
+                if record["status"] == "ok":
+                    stats.succeeded += 1
+                else:
+                    stats.failed += 1
+
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+    return stats
+
+
+def main() -> None:
+    """Run a batch from the command line."""
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of prompts with the agent.")
+    parser.add_argument("input", type=Path, help="JSONL file of prompts")
+    parser.add_argument("output", type=Path, help="JSONL file the results are appended to")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="prompts answered at once")
+    parser.add_argument("--id-field", default="id", help="input field holding each prompt's id")
+    parser.add_argument("--message-field", default="message", help="input field holding each prompt's message")
+    parser.add_argument("--user-id", default="1", help="user id for prompts that do not name one")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    items = read_items(args.input, id_field=args.id_field, message_field=args.message_field, user_id=args.user_id)
+    start = time.perf_counter()
+    stats = asyncio.run(run_batch(get_agent(), items, args.output, max_concurrency=args.max_concurrency))
+    logger.info(
+        "Answered %d prompts, %d failed, %d already done, in %.1f s",
+        stats.succeeded,
+        stats.failed,
+        stats.skipped,
+        time.perf_counter() - start,
+    )
+
+
+if __name__ == "__main__":
+    main()
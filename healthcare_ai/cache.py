@@ -0,0 +1,418 @@
+"""
+Response cache for the healthcare AI assistant.
+
+Many users ask the same questions, and each one otherwise costs full model calls. The cache sits in front of the
+chat model and is keyed on the normalized request: system prompt, messages, tool schemas and model parameters.
+Lookups go through an in-memory LRU tier, then an on-disk SQLite tier, then optionally a semantic tier that
+matches the user's message by embedding similarity.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Any, Protocol
+
+import numpy as np
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+from langchain.embeddings import init_embeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from healthcare_ai.config import get_settings
+from healthcare_ai.rag.index import Matrix, normalize
+
+
+@dataclass
+class CachedResponse:
+    """A model response together with how long the model took to produce it."""
+
+    response: ModelResponse
+    latency: float
+
+
+class CacheTier(Protocol):
+    """Exact-match storage for cached responses."""
+
+    name: str
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return the entry stored under `key`, if any."""
+        ...
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store `entry` under `key`."""
+        ...
+
+
+class MemoryCache:
+    """In-process LRU tier."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int) -> None:
+        """Keep at most `max_entries` responses."""
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return the entry stored under `key` and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store `entry`, evicting the least recently used entries beyond the limit."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache:
+    """On-disk tier shared by every worker on a node and kept across restarts."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        """Open or create the cache database at `path`."""
+        self._serde = JsonPlusSerializer()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, type TEXT, value BLOB, latency REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return the entry stored under `key`, if any."""
+        with self._lock:
+            row = self._conn.execute("SELECT type, value, latency FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        type_, value, latency = row
+        return CachedResponse(self._serde.loads_typed((type_, value)), latency)
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store `entry` under `key`."""
+        type_, value = self._serde.dumps_typed(entry.response)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, type, value, latency) VALUES (?, ?, ?, ?)",
+                (key, type_, value, entry.latency),
+            )
+            self._conn.commit()
+
+
+@dataclass(frozen=True)
+class _SemanticGroup:
+    """The entries of one request context, with their unit vectors as the rows of a matrix.
+
+    Groups are replaced rather than changed, so a lookup can score a group outside the lock.
+    """
+
+    matrix: Matrix
+    texts: list[str]
+    entries: list[CachedResponse]
+
+
+class SemanticCache:
+    """Tier that reuses a response when a new user message is similar enough to a cached one.
+
+    Only requests that share everything but the final user message are compared, so a match never crosses
+    conversations with different history, tools or model parameters. Entries are grouped by that context, and a
+    lookup scores the whole group with one matrix product.
+    """
+
+    name = "semantic"
+
+    def __init__(self, embeddings: Embeddings, *, threshold: float = 0.95, max_entries: int = 1000) -> None:
+        """Match when cosine similarity is at least `threshold`, keeping at most `max_entries` responses."""
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._groups: dict[str, _SemanticGroup] = {}
+        # (context, text) of every entry, least recently stored first
+        self._order: OrderedDict[tuple[str, str], None] = OrderedDict()
+        # Text -> unit vector, so a miss followed by a store embeds the message once
+        self._vectors: OrderedDict[str, Matrix] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> Matrix:
+        with self._lock:
+            if (vector := self._vectors.get(text)) is not None:
+                return vector
+        vector = normalize(self.embeddings.embed_query(text))[0]
+        with self._lock:
+            self._vectors[text] = vector
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def get(self, context_key: str, text: str) -> CachedResponse | None:
+        """Return the most similar entry in `context_key` above the threshold, if any."""
+        vector = self._embed(text)
+        with self._lock:
+            group = self._groups.get(context_key)
+        if group is None:
+            return None
+        scores = group.matrix @ vector
+        best = int(np.argmax(scores))
+        return group.entries[best] if scores[best] >= self.threshold else None
+
+    def put(self, context_key: str, text: str, entry: CachedResponse) -> None:
+        """Store `entry` for the user message `text`."""
+        vector = self._embed(text)
+        with self._lock:
+            group = self._groups.get(context_key)
+            if group is None:
+                self._groups[context_key] = _SemanticGroup(vector[np.newaxis], [text], [entry])
+            elif text in group.texts:
+                row = group.texts.index(text)
+                matrix = group.matrix.copy()
+                matrix[row] = vector
+                entries = [*group.entries[:row], entry, *group.entries[row + 1 :]]
+                self._groups[context_key] = _SemanticGroup(matrix, group.texts, entries)
+            else:
+                matrix = np.vstack([group.matrix, vector])
+                self._groups[context_key] = _SemanticGroup(matrix, [*group.texts, text], [*group.entries, entry])
+            self._order[context_key, text] = None
+            while len(self._order) > self.max_entries:
+                self._evict(*self._order.popitem(last=False)[0])
+
+    def _evict(self, context_key: str, text: str) -> None:
+        group = self._groups[context_key]
+        if len(group.texts) == 1:
+            del self._groups[context_key]
+            return
+        row = group.texts.index(text)
+        self._groups[context_key] = _SemanticGroup(
+            np.delete(group.matrix, row, axis=0),
+            [*group.texts[:row], *group.texts[row + 1 :]],
+            [*group.entries[:row], *group.entries[row + 1 :]],
+        )
+
+
+@dataclass
+class CacheStats:
+    """Cache effectiveness counters."""
+
+    # Hits per tier name
+    hits: dict[str, int] = field(default_factory=dict)
+    misses: int = 0
+    # Model latency avoided by hits, measured when each entry was computed
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from any tier."""
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return total_hits / lookups if lookups else 0.0
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _message_key(message: BaseMessage) -> dict[str, Any]:
+    """Describe a message by its content, leaving out IDs that differ between conversations."""
+    if isinstance(message, HumanMessage):
+        return {"type": message.type, "content": _normalize_text(message.text)}
+    if isinstance(message, AIMessage):
+        calls = [{"name": call["name"], "args": call["args"]} for call in message.tool_calls]
+        return {"type": message.type, "content": message.text, "tool_calls": calls}
+    if isinstance(message, ToolMessage):
+        return {"type": message.type, "name": message.name, "content": message.text}
+    return {"type": message.type, "content": message.text}
+
+
+def _tool_key(tool: BaseTool | dict[str, Any]) -> dict[str, Any]:
+    if isinstance(tool, dict):
+        return tool
+    return convert_to_openai_tool(tool)
+
+
+def _hash(payload: object) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _context(request: ModelRequest) -> dict[str, Any]:
+    """Everything about a request that affects the response apart from its messages."""
+    response_format = request.response_format
+    return {
+        "system_prompt": request.system_prompt,
+        "tools": [_tool_key(tool) for tool in request.tools],
+        "tool_choice": request.tool_choice,
+        "model": request.model._identifying_params,  # noqa: SLF001  # pyright: ignore[reportPrivateUsage]
+        "model_settings": request.model_settings,
+        "response_format": [type(response_format).__name__, getattr(response_format, "schema", None)],
+    }
+
+
+def request_key(request: ModelRequest) -> str:
+    """Return the exact-match cache key of a model request."""
+    return _hash({**_context(request), "messages": [_message_key(message) for message in request.messages]})
+
+
+def with_fresh_ids(response: ModelResponse) -> ModelResponse:
+    """Copy a cached response with new message and tool call IDs, so replaying it never collides with history."""
+    call_ids: dict[str, str] = {}
+    messages: list[BaseMessage] = []
+    for message in response.result:
+        update: dict[str, Any] = {"id": None}
+        if isinstance(message, AIMessage):
+            update["tool_calls"] = [
+                {**call, "id": call_ids.setdefault(call["id"] or "", f"call_{uuid.uuid4().hex}")}
+                for call in message.tool_calls
+            ]
+            if isinstance(message.content, list):
+                update["content"] = [
+                    {**block, "id": call_ids[block["id"]]}
+                    if isinstance(block, dict) and block.get("id") in call_ids
+                    else block
+                    for block in message.content
+                ]
+            update["response_metadata"] = {**message.response_metadata, "cache_hit": True}
+        elif isinstance(message, ToolMessage):
+            update["tool_call_id"] = call_ids.get(message.tool_call_id, message.tool_call_id)
+        messages.append(message.model_copy(update=update))
+    return ModelResponse(result=messages, structured_response=response.structured_response)
+
+
+class ResponseCacheMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Serve model calls from the cache tiers and store every fresh response in all of them."""
+
+    def __init__(self, tiers: list[CacheTier], semantic: SemanticCache | None = None) -> None:
+        """Look up `tiers` in order, then `semantic` for requests that end with a user message."""
+        super().__init__()
+        self.tiers = tiers
+        self.semantic = semantic
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # Leading tiers that never block, which async calls look up and fill on the event loop
+        self._in_memory = next((i for i, tier in enumerate(tiers) if not isinstance(tier, MemoryCache)), len(tiers))
+        # Whether any tier needs a worker thread: SQLite, or the semantic tier's embedding call
+        self._blocking = self._in_memory < len(tiers) or semantic is not None
+
+    def _record_hit(self, tier: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self.stats.hits[tier] = self.stats.hits.get(tier, 0) + 1
+            self.stats.saved_seconds += entry.latency
+
+    def _semantic_key(self, request: ModelRequest) -> tuple[str, str] | None:
+        """Return the context key and user text for the semantic tier, if the request qualifies."""
+        if self.semantic is None or not request.messages or not isinstance(request.messages[-1], HumanMessage):
+            return None
+        history = [_message_key(message) for message in request.messages[:-1]]
+        return _hash({**_context(request), "messages": history}), _normalize_text(request.messages[-1].text)
+
+    def _get(self, key: str, indexes: range) -> ModelResponse | None:
+        """Return the entry under `key` in the tiers at `indexes`, promoting it to every faster tier."""
+        for index in indexes:
+            tier = self.tiers[index]
+            if (entry := tier.get(key)) is not None:
+                for faster in self.tiers[:index]:
+                    faster.put(key, entry)
+                self._record_hit(tier.name, entry)
+                return with_fresh_ids(entry.response)
+        return None
+
+    def lookup(self, request: ModelRequest, key: str, start: int = 0) -> ModelResponse | None:
+        """Return a cached response for the request, promoting it to the faster tiers.
+
+        The first `start` tiers are skipped, for callers that already looked them up.
+        """
+        if (cached := self._get(key, range(start, len(self.tiers)))) is not None:
+            return cached
+        semantic_key = self._semantic_key(request)
+        if self.semantic and semantic_key and (entry := self.semantic.get(*semantic_key)) is not None:
+            self._record_hit(self.semantic.name, entry)
+            return with_fresh_ids(entry.response)
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    def store(self, request: ModelRequest, key: str, entry: CachedResponse, start: int = 0) -> None:
+        """Store a fresh response in every tier but the first `start`."""
+        for tier in self.tiers[start:]:
+            tier.put(key, entry)
+        if self.semantic is not None and (semantic_key := self._semantic_key(request)) is not None:
+            self.semantic.put(*semantic_key, entry)
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Return a cached response or call the model and cache its response."""
+        key = request_key(request)
+        if (cached := self.lookup(request, key)) is not None:
+            return cached
+        start = time.perf_counter()
+        response = handler(request)
+        self.store(request, key, CachedResponse(response, time.perf_counter() - start))
+        return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Return a cached response or call the model and cache its response.
+
+        The in-memory tiers are used on the event loop; only the SQLite and semantic tiers go to a worker thread.
+        """
+        key = request_key(request)
+        if (cached := self._get(key, range(self._in_memory))) is not None:
+            return cached
+        if self._blocking:
+            cached = await asyncio.to_thread(self.lookup, request, key, self._in_memory)
+        else:
+            cached = self.lookup(request, key, self._in_memory)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        response = await handler(request)
+        entry = CachedResponse(response, time.perf_counter() - start)
+        for tier in self.tiers[: self._in_memory]:
+            tier.put(key, entry)
+        if self._blocking:
+            await asyncio.to_thread(self.store, request, key, entry, self._in_memory)
+        return response
+
+
+@cache
+def get_response_cache() -> ResponseCacheMiddleware | None:
+    """Return the process-wide response cache, or `None` when every tier is disabled."""
+    settings = get_settings()
+    tiers: list[CacheTier] = []
+    if settings.response_cache_size:
+        tiers.append(MemoryCache(settings.response_cache_size))
+    if settings.response_cache_path:
+        tiers.append(SQLiteCache(settings.response_cache_path))
+    semantic = None
+    if settings.semantic_cache_embeddings:
+        semantic = SemanticCache(
+            init_embeddings(settings.semantic_cache_embeddings), threshold=settings.semantic_cache_threshold
+        )
+    if not tiers and semantic is None:
+        return None
+    return ResponseCacheMiddleware(tiers, semantic)
@@ -0,0 +1,133 @@
+"""
+Request coalescing for identical first turns.
+
+During an incident many users send the same first message within a second, and each of them would otherwise start
+the same model calls. While a model call is in flight, an identical call from another conversation that is still
+on its first turn waits for it instead of going upstream, and every waiter receives a copy of the response.
+
+Calls are identical when the model would see the same request: the response cache's key covers the system prompt,
+the normalized messages, the tools and the model's parameters. Later steps of a turn include the results of its
+tool calls, so conversations whose tools resolved differently, for example to different user locations, only
+share calls with conversations that resolved the same way. Conversations with earlier turns are never coalesced.
+
+Neither are calls whose tokens stream to the caller, as they do under LangGraph's "messages" stream mode: only the
+caller that made a call sees its tokens, so a streaming caller that waited for another's call would receive the
+response without them.
+"""
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+from langchain_core.callbacks import BaseCallbackManager
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables.config import ensure_config
+
+from healthcare_ai.cache import request_key, with_fresh_ids
+from healthcare_ai.config import get_settings
+
+
+@dataclass
+class CoalescingStats:
+    """Counters of coalesced model calls."""
+
+    # Eligible calls sent upstream, and calls that waited for one of those instead
+    leaders: int = 0
+    followers: int = 0
+
+
+def is_first_turn(request: ModelRequest) -> bool:
+    """Return whether the request's conversation is on its first turn."""
+    messages = request.state.get("messages", request.messages)
+    return sum(isinstance(message, HumanMessage) for message in messages) == 1
+
+
+def is_streaming() -> bool:
+    """Return whether the model call about to be made streams its tokens to the caller.
+
+    Chat models stream when a callback handler taps their output, as LangGraph's "messages" stream mode does.
+    """
+    callbacks = ensure_config().get("callbacks")
+    handlers = callbacks.handlers if isinstance(callbacks, BaseCallbackManager) else callbacks or []
+    return any(hasattr(handler, "tap_output_aiter") for handler in handlers)
+
+
+class RequestCoalescingMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Share one model call between identical first-turn requests in flight at the same time."""
+
+    def __init__(self) -> None:
+        """Start with no calls in flight."""
+        super().__init__()
+        self.stats = CoalescingStats()
+        self._in_flight: dict[str, Future[ModelResponse]] = {}
+        self._tasks: dict[str, asyncio.Task[ModelResponse]] = {}
+        self._lock = threading.Lock()
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Call the model, or wait for an identical call in flight."""
+        if not is_first_turn(request) or is_streaming():
+            return handler(request)
+        key = request_key(request)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+                self.stats.leaders += 1
+            else:
+                self.stats.followers += 1
+        if not leader:
+            return with_fresh_ids(future.result())
+        try:
+            response = handler(request)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(response)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Call the model, or wait for an identical call in flight."""
+        if not is_first_turn(request) or is_streaming():
+            return await handler(request)
+        key = request_key(request)
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(handler(request))
+                task.add_done_callback(lambda _: self._finish(key))
+                self.stats.leaders += 1
+            else:
+                self.stats.followers += 1
+        # Shielded so that a cancelled caller does not cancel the call other callers are waiting on.
+        response = await asyncio.shield(task)
+        return response if leader else with_fresh_ids(response)
+
+    def _finish(self, key: str) -> None:
+        with self._lock:
+            del self._tasks[key]
+
+
+@cache
+def get_request_coalescer() -> RequestCoalescingMiddleware | None:
+    """Return the process-wide request coalescer, or `None` when coalescing is disabled."""
+    return RequestCoalescingMiddleware() if get_settings().coalesce_requests else None
@@ -4,6 +4,146 @@ Model configurations for the healthcare AI assistant.
 Set up your language model with the right parameters for your use case.
 """
 
+import os
+from dataclasses import dataclass, fields
+from functools import cache
+from typing import Any
+
 from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+
+from healthcare_ai.fake_model import FakeChatModel
+
+ENV_PREFIX = "HEALTHCARE_AI_"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Deployment settings, overridable through `HEALTHCARE_AI_<FIELD>` environment variables."""
+
+    # Chat model as "provider:model", or "fake" for the offline stand-in
+    model: str = "anthropic:claude-sonnet-4-5"
+    # Smaller model for turns the router judges cheap, empty to send every turn to `model`
+    small_model: str = ""
+    # Model to retry on when the routed model times out or fails transiently, empty for none
+    fallback_model: str = ""
+    # Longest user message, in characters, that may go to the small model
+    route_small_max_chars: int = 200
+    # Comma-separated words suggesting a turn needs tools, which keeps it on the large model
+    route_tool_keywords: str = "weather,forecast,temperature,rain,sunny,outside,location,where"
+    # Seconds a turn should take; when less remains than the large model usually needs, use the small one. 0 for none
+    route_latency_budget: float = 0.0
+    # Seconds the routed model may take, retries included, before the call falls back, 0 for the policy's deadline
+    route_timeout: float = 10.0
+    # Seconds each call to the fake model takes
+    fake_model_latency: float = 0.0
+    # Checkpointer backend: "memory", "bounded" or "sqlite"
+    checkpointer: str = "memory"
+    # Limits of the bounded in-memory checkpointer
+    max_threads: int = 10_000
+    max_checkpoints_per_thread: int = 20
+    # Seconds a thread may stay idle before the bounded checkpointer evicts it
+    thread_ttl: float = 3600.0
+    # Path of the SQLite checkpoint database, shared by all workers on a node
+    sqlite_path: str = "checkpoints.sqlite"
+    # Number of pooled SQLite connections per process
+    sqlite_pool_size: int = 4
+    # Most recent turns and approximate tokens of history sent to the model, 0 for no limit
+    history_max_turns: int = 20
+    history_max_tokens: int = 8000
+    # Approximate history tokens that trigger a rolling summary, 0 to never summarize
+    history_summary_tokens: int = 0
+    # Messages kept verbatim after the history is summarized
+    history_summary_keep_messages: int = 20
+    # Responses kept in the in-memory cache tier, 0 to disable it
+    response_cache_size: int = 0
+    # Path of the SQLite cache tier, empty to disable it
+    response_cache_path: str = ""
+    # Embeddings model ("provider:model") for the semantic cache tier, empty to disable it
+    semantic_cache_embeddings: str = ""
+    # Cosine similarity at which the semantic tier treats two user messages as the same question
+    semantic_cache_threshold: float = 0.95
+    # How long the provider keeps the cached tools and system prompt, "5m" or "1h", empty to disable prompt caching
+    prompt_cache_ttl: str = "5m"
+    # Share one model call between identical first-turn requests in flight at the same time
+    coalesce_requests: bool = True
+    # Calls of each tool that may run at once across the process, 0 for no limit
+    tool_concurrency: int = 8
+    # Limits for individual tools overriding `tool_concurrency`, as "name=limit,name=limit"; 0 for no limit
+    tool_concurrency_limits: str = ""
+    # Connections to the model API per client, and how many idle ones are kept alive, 0 for no limit
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    # Seconds an idle connection is kept alive, 0 to keep it indefinitely
+    http_keepalive_expiry: float = 30.0
+    # Multiplex concurrent model calls over HTTP/2 connections
+    http2: bool = True
+    # Model calls per request, counting the first, and the backoff before retry n: up to min(max, base * 2**n) s
+    model_max_attempts: int = 3
+    model_backoff_base: float = 0.5
+    model_backoff_max: float = 8.0
+    # Seconds one model call attempt, and all attempts together, may take, 0 for no deadline
+    model_attempt_timeout: float = 10.0
+    model_total_timeout: float = 30.0
+    # Latency quantile of recent calls after which a duplicate request is sent, e.g. 0.95, 0 to never hedge
+    model_hedge_quantile: float = 0.0
+    # Worker threads shared by hedged sync model calls
+    model_call_workers: int = 32
+    # Where finished trace spans go: "console", "memory", empty to disable tracing
+    tracing: str = ""
+    # Record Prometheus metrics, served at /metrics
+    metrics: bool = True
+    # Turns per second each user may sustain, 0 for no per-user limit, and how many they may send at once
+    admission_user_rate: float = 1.0
+    admission_user_burst: int = 10
+    # Turns served at once, 0 for no limit, how many more may wait for a slot, and for how many seconds
+    admission_max_concurrent: int = 64
+    admission_max_queue: int = 256
+    admission_queue_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from the environment, falling back to the defaults above."""
+        overrides: dict[str, Any] = {}
+        for field in fields(cls):
+            raw = os.environ.get(ENV_PREFIX + field.name.upper())
+            if raw is None:
+                continue
+            if field.type is bool:
+                overrides[field.name] = raw.strip().lower() in {"1", "true", "yes", "on"}
+            elif field.type in {int, float}:
+                overrides[field.name] = field.type(raw)
+            else:
+                overrides[field.name] = raw
+        return cls(**overrides)
+
+
+@cache
+def get_settings() -> Settings:
+    """Return the process-wide settings."""
+    return Settings.from_env()
+
+
+def build_model(name: str) -> BaseChatModel:
+    """Build a chat model from a "provider:model" name, or the offline stand-in for "fake"."""
+    settings = get_settings()
+    if name == "fake":
+        return FakeChatModel(latency=settings.fake_model_latency)
+    # Imported here because the provider SDKs are slow to import and the fake model needs none of them.
+    from healthcare_ai.http_pool import get_http_pool  # noqa: PLC0415
+
+    # Retries and deadlines are applied by the model call policy, so the SDK's own retries are disabled.
+    model = init_chat_model(
+        name,
+        temperature=0.5,
+        timeout=settings.model_attempt_timeout or None,
+        max_tokens=1000,
+        max_retries=0,
+    )
+    return get_http_pool().attach(model)
+
 
-model = init_chat_model("anthropic:claude-sonnet-4-5", temperature=0.5, timeout=10, max_tokens=1000)
+@cache
+def get_model() -> BaseChatModel:
+    """Return the process-wide chat model, building it on first use."""
+    return build_model(get_settings().model)
@@ -0,0 +1,197 @@
+"""
+Offline stand-in for the chat model.
+
+Lets the agent run end to end without network access or API keys, so its behavior and cost can be measured
+locally. Select it with `HEALTHCARE_AI_MODEL=fake`.
+
+Within a turn the model replays a script: step `i` after the user's message emits the `i`-th batch of tool calls,
+and once the script is exhausted it returns the structured `ResponseFormat`. Latency is injectable, either fixed
+or drawn from a distribution, and the usage metadata reports an approximate input token count. When streamed, the
+tool call arguments arrive as small chunks of JSON, as a real model generates them.
+
+Like Anthropic's prompt caching, a system message carrying a `cache_control` block marks the bound tools and the
+system message as a cacheable prefix: the first call with a given prefix reports its tokens as cache writes,
+later calls as cache reads.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolCall,
+    ToolCallChunk,
+)
+from langchain_core.messages.ai import InputTokenDetails, UsageMetadata
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field, PrivateAttr
+
+from healthcare_ai.response import ResponseFormat
+
+DEFAULT_SCRIPT: list[list[dict[str, Any]]] = [
+    [{"name": "get_user_location", "args": {}}],
+    [{"name": "get_weather_for_location", "args": {"city": "Florida"}}],
+]
+DEFAULT_RESPONSE: dict[str, Any] = {
+    "punny_response": "It's a 'sun-believable' day in Florida!",
+    "weather_conditions": "It's always sunny in Florida!",
+}
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model that replays scripted tool calls and then a structured response."""
+
+    # Batches of tool calls (`name` and `args`) emitted on successive steps of each turn
+    script: list[list[dict[str, Any]]] = Field(default_factory=lambda: [list(step) for step in DEFAULT_SCRIPT])
+    # Arguments of the `ResponseFormat` tool call that ends each turn
+    response: dict[str, Any] = Field(default_factory=lambda: dict(DEFAULT_RESPONSE))
+    # Seconds each call takes, or a function drawing them from a distribution
+    latency: float | Callable[[], float] = 0.0
+    # When streaming, characters of tool call arguments per chunk and seconds between chunks
+    chunk_chars: int = 4
+    chunk_latency: float = 0.0
+    # Hashes of the prompt prefixes cached so far
+    _cached_prefixes: set[str] = PrivateAttr(default_factory=set[str])
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(
+        self,
+        tools: Sequence[dict[str, Any] | type | Callable[..., Any] | BaseTool],
+        *,
+        tool_choice: str | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401, ARG002
+    ) -> Runnable[LanguageModelInput, AIMessage]:
+        """Bind the tools' schemas, which count towards the prompt; the calls still follow the script."""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools])
+
+    @property
+    def cached_prefixes(self) -> int:
+        """Number of distinct prompt prefixes cached so far."""
+        with self._lock:
+            return len(self._cached_prefixes)
+
+    def delay(self) -> float:
+        """Draw the latency of one call."""
+        return self.latency() if callable(self.latency) else self.latency
+
+    def usage(self, messages: Sequence[BaseMessage], tools: Sequence[dict[str, Any]]) -> UsageMetadata:
+        """Count the approximate input tokens of a call, split into cache reads and writes."""
+        tools_tokens = len(json.dumps(tools)) // 4
+        input_tokens = count_tokens_approximately(messages) + tools_tokens
+        system = messages[0] if messages and isinstance(messages[0], SystemMessage) else None
+        details = InputTokenDetails(cache_read=0, cache_creation=0)
+        if system is not None and isinstance(system.content, list) and "cache_control" in json.dumps(system.content):
+            prefix = json.dumps([tools, system.content], sort_keys=True)
+            key = hashlib.sha256(prefix.encode()).hexdigest()
+            prefix_tokens = tools_tokens + count_tokens_approximately([system])
+            with self._lock:
+                cached = key in self._cached_prefixes
+                self._cached_prefixes.add(key)
+            details["cache_read" if cached else "cache_creation"] = prefix_tokens
+        return UsageMetadata(
+            input_tokens=input_tokens,
+            output_tokens=0,
+            total_tokens=input_tokens,
+            input_token_details=details,
+        )
+
+    def respond(self, messages: Sequence[BaseMessage], tools: Sequence[dict[str, Any]] = ()) -> AIMessage:
+        """Build the reply for the current step of the turn."""
+        turn_start = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=0)
+        step = sum(isinstance(message, AIMessage) for message in messages[turn_start:])
+        final: list[dict[str, Any]] = [{"name": ResponseFormat.__name__, "args": self.response}]
+        batch = self.script[step] if step < len(self.script) else final
+        tool_calls = [
+            ToolCall(name=call["name"], args=dict(call["args"]), id=f"call_{len(messages)}_{index}")
+            for index, call in enumerate(batch)
+        ]
+        usage = self.usage(messages, tools)
+        usage["output_tokens"] = count_tokens_approximately([AIMessage(content="", tool_calls=tool_calls)])
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content="", tool_calls=tool_calls, usage_metadata=usage)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: CallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> ChatResult:
+        if (seconds := self.delay()) > 0:
+            time.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=self.respond(messages, kwargs.get("tools", ())))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> ChatResult:
+        if (seconds := self.delay()) > 0:
+            await asyncio.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=self.respond(messages, kwargs.get("tools", ())))])
+
+    def chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        """Split a reply into the chunks a streaming model would send."""
+        yield AIMessageChunk(content="", usage_metadata=message.usage_metadata)
+        for index, call in enumerate(message.tool_calls):
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[ToolCallChunk(name=call["name"], args="", id=call["id"], index=index)],
+            )
+            arguments = json.dumps(call["args"])
+            for start in range(0, len(arguments), self.chunk_chars):
+                yield AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        ToolCallChunk(name=None, args=arguments[start : start + self.chunk_chars], id=None, index=index)
+                    ],
+                )
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: CallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> Iterator[ChatGenerationChunk]:
+        if (seconds := self.delay()) > 0:
+            time.sleep(seconds)
+        for index, chunk in enumerate(self.chunks(self.respond(messages, kwargs.get("tools", ())))):
+            if index > 1 and self.chunk_latency > 0:
+                time.sleep(self.chunk_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if (seconds := self.delay()) > 0:
+            await asyncio.sleep(seconds)
+        for index, chunk in enumerate(self.chunks(self.respond(messages, kwargs.get("tools", ())))):
+            if index > 1 and self.chunk_latency > 0:
+                await asyncio.sleep(self.chunk_latency)
+            yield ChatGenerationChunk(message=chunk)
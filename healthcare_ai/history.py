@@ -0,0 +1,119 @@
+"""
+Conversation history policy for the healthcare AI assistant.
+
+Every turn on a `thread_id` would otherwise resend the whole conversation to the model, so prompt size, latency
+and cost grow with conversation length. The policy caps what each model call sees to the most recent turns and a
+token budget, and can optionally fold older turns into a rolling summary.
+"""
+
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from langchain.agents.middleware import (
+    AgentMiddleware,
+    AgentState,
+    ModelRequest,
+    ModelResponse,
+    SummarizationMiddleware,
+)
+from langchain.agents.middleware.types import ModelCallResult
+from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from healthcare_ai.config import get_model, get_settings
+
+TokenCounter = Callable[[Sequence[AnyMessage]], int]
+
+# How the message `SummarizationMiddleware` replaces older turns with starts
+SUMMARY_PREFIX = "Here is a summary of the conversation to date:"
+
+
+def is_summary(message: AnyMessage) -> bool:
+    """Return whether `message` is the rolling summary of older turns."""
+    return isinstance(message, HumanMessage) and message.text.startswith(SUMMARY_PREFIX)
+
+
+class HistoryMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Send the model only the most recent turns of the conversation.
+
+    A turn starts at a user message and includes the tool calls and results that follow it, so trimming never
+    separates a tool call from its result. The checkpointed state keeps the full history; only the model request
+    is trimmed. The current turn is always sent, even when it alone exceeds `max_tokens`. A rolling summary at the
+    start of the history is always sent too, counts against `max_tokens`, and is not counted as a turn.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_turns: int | None = None,
+        max_tokens: int | None = None,
+        token_counter: TokenCounter = count_tokens_approximately,
+    ) -> None:
+        """Keep at most `max_turns` turns totalling at most `max_tokens`; `None` disables a limit."""
+        super().__init__()
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+
+    def trim(self, messages: list[AnyMessage]) -> list[AnyMessage]:
+        """Return the summary `messages` start with, if any, and the suffix of later turns the policy allows."""
+        if not messages or not is_summary(messages[0]):
+            return self._trim_turns(messages, self.max_tokens)
+        budget = None if self.max_tokens is None else self.max_tokens - self.token_counter(messages[:1])
+        return [messages[0], *self._trim_turns(messages[1:], budget)]
+
+    def _trim_turns(self, messages: list[AnyMessage], max_tokens: int | None) -> list[AnyMessage]:
+        turn_starts = [index for index, message in enumerate(messages) if isinstance(message, HumanMessage)]
+        if not turn_starts:
+            return messages
+        if self.max_turns is not None:
+            turn_starts = turn_starts[-self.max_turns :]
+        start = turn_starts[-1]
+        if max_tokens is None:
+            return messages[turn_starts[0] :]
+        # Add whole turns, newest first, while they fit in the budget.
+        tokens = self.token_counter(messages[start:])
+        for previous, current in zip(reversed(turn_starts[:-1]), reversed(turn_starts[1:]), strict=True):
+            tokens += self.token_counter(messages[previous:current])
+            if tokens > max_tokens:
+                break
+            start = previous
+        return messages[start:]
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Call the model with the trimmed history."""
+        return handler(request.override(messages=self.trim(request.messages)))
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Call the model with the trimmed history."""
+        return await handler(request.override(messages=self.trim(request.messages)))
+
+
+def get_history_middleware() -> list[AgentMiddleware[AgentState[Any], Any]]:
+    """Build the configured history policy; a limit of 0 in the settings disables it."""
+    settings = get_settings()
+    middleware: list[AgentMiddleware[AgentState[Any], Any]] = []
+    if settings.history_summary_tokens:
+        middleware.append(
+            SummarizationMiddleware(
+                model=get_model(),
+                max_tokens_before_summary=settings.history_summary_tokens,
+                messages_to_keep=settings.history_summary_keep_messages,
+            )
+        )
+    if settings.history_max_turns or settings.history_max_tokens:
+        middleware.append(
+            HistoryMiddleware(
+                max_turns=settings.history_max_turns or None,
+                max_tokens=settings.history_max_tokens or None,
+            )
+        )
+    return middleware
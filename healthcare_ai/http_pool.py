@@ -0,0 +1,257 @@
+"""
+Shared HTTP connection pool for model API calls.
+
+Left to itself the model client opens its own connections with default limits, and every new connection pays for
+a TCP and TLS handshake before the first byte of the request. The pool gives the process one sync and one async
+HTTP/2 client with explicit connection and keep-alive limits, which every agent invocation reuses, and counts
+requests in flight, pool saturation and new connections, so handshakes that still happen are visible.
+
+A model configured with a proxy gets clients of its own that send every request through the proxy, with the same
+limits and metrics. The async clients belong to the event loop that first uses them, which in a served deployment
+is the server's loop.
+"""
+
+import threading
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import asdict, dataclass
+from functools import cache
+from typing import Any
+
+import anthropic
+import httpx
+from langchain_anthropic import ChatAnthropic
+from langchain_core.language_models import BaseChatModel
+
+from healthcare_ai.config import get_settings
+
+
+@dataclass
+class PoolStats:
+    """Counters of one pool, shared by its sync and async clients."""
+
+    # Requests sent through the pool
+    requests: int = 0
+    # Requests whose response has not been fully read and closed yet
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    # Requests sent while `max_connections` or more were already in flight, which may wait for a connection
+    saturated: int = 0
+    # New connections opened, and the TLS handshakes they performed
+    connections_opened: int = 0
+    tls_handshakes: int = 0
+
+
+class PoolMetrics:
+    """Thread-safe pool counters."""
+
+    def __init__(self, max_connections: int | None) -> None:
+        """Count saturation against `max_connections`; `None` means the pool is unbounded."""
+        self.max_connections = max_connections
+        self._stats = PoolStats()
+        self._lock = threading.Lock()
+
+    def started(self) -> None:
+        """Record a request being sent."""
+        with self._lock:
+            stats = self._stats
+            if self.max_connections is not None and stats.in_flight >= self.max_connections:
+                stats.saturated += 1
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+    def finished(self) -> None:
+        """Record a response being closed, or a request failing."""
+        with self._lock:
+            self._stats.in_flight -= 1
+
+    def traced(self, event: str) -> None:
+        """Record an httpcore trace event."""
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self._stats.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self._stats.tls_handshakes += 1
+
+    def snapshot(self) -> dict[str, int]:
+        """Return a consistent copy of the counters."""
+        with self._lock:
+            return asdict(self._stats)
+
+
+class _MeteredStream(httpx.SyncByteStream):
+    """Response body that reports to the metrics when it is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, metrics: PoolMetrics) -> None:
+        self._stream = stream
+        self._metrics = metrics
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._metrics.finished()
+
+
+class _AsyncMeteredStream(httpx.AsyncByteStream):
+    """Response body that reports to the metrics when it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, metrics: PoolMetrics) -> None:
+        self._stream = stream
+        self._metrics = metrics
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._metrics.finished()
+
+
+class _MeteredTransport(httpx.BaseTransport):
+    """Transport that counts the requests it sends and the connections it opens."""
+
+    def __init__(self, transport: httpx.BaseTransport, metrics: PoolMetrics) -> None:
+        self._transport = transport
+        self._metrics = metrics
+
+    def _trace(self, event: str, _: dict[str, Any]) -> None:
+        self._metrics.traced(event)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions.setdefault("trace", self._trace)
+        self._metrics.started()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._metrics.finished()
+            raise
+        assert isinstance(response.stream, httpx.SyncByteStream)  # noqa: S101 - guaranteed by the sync transport
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_MeteredStream(response.stream, self._metrics),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class _AsyncMeteredTransport(httpx.AsyncBaseTransport):
+    """Transport that counts the requests it sends and the connections it opens."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, metrics: PoolMetrics) -> None:
+        self._transport = transport
+        self._metrics = metrics
+
+    async def _trace(self, event: str, _: dict[str, Any]) -> None:
+        self._metrics.traced(event)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions.setdefault("trace", self._trace)
+        self._metrics.started()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._metrics.finished()
+            raise
+        assert isinstance(response.stream, httpx.AsyncByteStream)  # noqa: S101 - guaranteed by the async transport
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncMeteredStream(response.stream, self._metrics),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HttpPool:
+    """A sync and an async HTTP client with one configuration and one set of metrics."""
+
+    def __init__(
+        self,
+        *,
+        max_connections: int | None = 100,
+        max_keepalive_connections: int | None = 20,
+        keepalive_expiry: float | None = 30.0,
+        http2: bool = True,
+    ) -> None:
+        """Size each client's pool; `None` removes a limit. HTTP/2 multiplexes concurrent requests on a connection."""
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.metrics = PoolMetrics(max_connections)
+        # Clients by the proxy they send requests through, `None` for direct connections
+        self._clients: dict[str | None, httpx.Client] = {}
+        self._async_clients: dict[str | None, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def client(self, proxy: str | None = None) -> httpx.Client:
+        """Return the shared sync client sending requests through `proxy`, creating it on first use."""
+        with self._lock:
+            if (client := self._clients.get(proxy)) is None:
+                transport = httpx.HTTPTransport(http2=self.http2, limits=self.limits, proxy=proxy)
+                client = self._clients[proxy] = httpx.Client(transport=_MeteredTransport(transport, self.metrics))
+            return client
+
+    def async_client(self, proxy: str | None = None) -> httpx.AsyncClient:
+        """Return the shared async client sending requests through `proxy`, creating it on first use."""
+        with self._lock:
+            if (client := self._async_clients.get(proxy)) is None:
+                transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits, proxy=proxy)
+                client = self._async_clients[proxy] = httpx.AsyncClient(
+                    transport=_AsyncMeteredTransport(transport, self.metrics)
+                )
+            return client
+
+    def attach(self, model: BaseChatModel) -> BaseChatModel:
+        """Route `model`'s API calls through the pool, and its proxy if it has one; other providers are unchanged."""
+        if isinstance(model, ChatAnthropic):
+            # ChatAnthropic builds its clients in cached properties and takes no HTTP client, so seed them.
+            params = model._client_params  # noqa: SLF001  # pyright: ignore[reportPrivateUsage]
+            proxy = model.anthropic_proxy or None
+            model.__dict__["_client"] = anthropic.Client(**params, http_client=self.client(proxy))
+            model.__dict__["_async_client"] = anthropic.AsyncClient(**params, http_client=self.async_client(proxy))
+        return model
+
+    async def aclose(self) -> None:
+        """Close every client and its connections."""
+        with self._lock:
+            clients, async_clients = list(self._clients.values()), list(self._async_clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+        for client in clients:
+            client.close()
+        for async_client in async_clients:
+            await async_client.aclose()
+
+
+@cache
+def get_http_pool() -> HttpPool:
+    """Return the process-wide HTTP pool."""
+    settings = get_settings()
+    return HttpPool(
+        max_connections=settings.http_max_connections or None,
+        max_keepalive_connections=settings.http_max_keepalive_connections or None,
+        keepalive_expiry=settings.http_keepalive_expiry or None,
+        http2=settings.http2,
+    )
@@ -2,8 +2,299 @@
 
 Add memory to your agent to maintain state across interactions.
 This allows the agent to remember previous conversations and context.
+
+The backend is selected with `Settings.checkpointer`. The in-memory saver is the default and is what tests use;
+the bounded saver keeps memory flat in long-running servers by evicting idle threads; the SQLite saver persists
+threads across restarts and lets every worker on a node serve any `thread_id`.
 """
 
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import contextmanager
+from functools import cache
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
 from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from healthcare_ai.config import get_settings
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Open a connection tuned for concurrent use in WAL mode."""
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL keeps the database consistent with NORMAL, and it avoids an fsync per commit.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class PooledSqliteSaver(SqliteSaver):
+    """SQLite checkpointer that spreads operations over a pool of WAL-mode connections.
+
+    `SqliteSaver` serializes every operation on one connection. Here each operation checks out its own
+    connection, so reads proceed concurrently and only writes queue on SQLite's writer lock. The async
+    methods run the same code in worker threads, so the saver serves both `invoke` and `ainvoke`.
+    """
+
+    def __init__(self, path: str, *, pool_size: int = 4) -> None:
+        """Open `pool_size` connections to the database at `path`."""
+        self._connections = [_connect(path) for _ in range(pool_size)]
+        self._checked_out = threading.local()
+        super().__init__(self._connections[0])
+        self._pool: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for conn in self._connections:
+            self._pool.put(conn)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The connection checked out by the current thread, so `SqliteSaver` queries stay on it."""
+        return getattr(self._checked_out, "conn", self._connections[0])
+
+    @conn.setter
+    def conn(self, _: sqlite3.Connection) -> None:  # pyright: ignore[reportIncompatibleVariableOverride]
+        """Ignore the single connection `SqliteSaver.__init__` assigns."""
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:  # noqa: FBT001, FBT002
+        """Yield a cursor on a pooled connection, committing afterwards if `transaction` is set.
+
+        A thread that already holds a connection, for example in a `list` generator it has not finished, gets
+        another cursor on it: waiting for a second one could wait forever once the pool is empty.
+        """
+        if not self.is_setup:
+            with self.lock:
+                self.setup()
+        held = getattr(self._checked_out, "conn", None)
+        conn = held if held is not None else self._pool.get()
+        self._checked_out.conn = conn
+        try:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                if transaction:
+                    conn.commit()
+                cur.close()
+        finally:
+            if held is None:
+                del self._checked_out.conn
+                self._pool.put(conn)
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        for conn in self._connections:
+            conn.close()
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get a checkpoint tuple without blocking the event loop."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List checkpoints without blocking the event loop."""
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint without blocking the event loop."""
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store intermediate writes without blocking the event loop."""
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete a thread without blocking the event loop."""
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """In-memory checkpointer that caps how many threads and checkpoints it keeps.
+
+    Threads are evicted least recently used first once there are more than `max_threads`, or once they have been
+    idle for `ttl` seconds. Each thread keeps only its newest `max_checkpoints_per_thread` checkpoints, together
+    with the writes and channel blobs they still reference. `None` disables a limit.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int | None = None,
+        max_checkpoints_per_thread: int | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        """Create an empty saver with the given limits."""
+        if max_checkpoints_per_thread is not None and max_checkpoints_per_thread < 1:
+            msg = "max_checkpoints_per_thread must keep at least the latest checkpoint"
+            raise ValueError(msg)
+        super().__init__()
+        self.max_threads = max_threads
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.ttl = ttl
+        # Number of threads and checkpoints dropped to stay within the limits
+        self.evicted_threads = 0
+        self.evicted_checkpoints = 0
+        self._lock = threading.RLock()
+        # Thread ID -> time of last use, least recently used first
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        # Thread ID -> (namespace, checkpoint ID) -> channel versions, to find the blobs a checkpoint references
+        self._channel_versions: dict[str, dict[tuple[str, str], ChannelVersions]] = {}
+
+    @property
+    def thread_count(self) -> int:
+        """Number of threads currently held."""
+        return len(self._last_used)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Approximate size of all serialized checkpoints, writes and blobs held."""
+        with self._lock:
+            checkpoint_bytes = sum(
+                len(checkpoint[1]) + len(metadata[1])
+                for namespaces in self.storage.values()
+                for checkpoints in namespaces.values()
+                for checkpoint, metadata, _ in checkpoints.values()
+            )
+            write_bytes = sum(len(value[1]) for writes in self.writes.values() for _, _, value, _ in writes.values())
+            blob_bytes = sum(len(blob[1]) for blob in self.blobs.values())
+        return checkpoint_bytes + write_bytes + blob_bytes
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get a checkpoint tuple, treating expired threads as gone."""
+        thread_id = config.get("configurable", {})["thread_id"]
+        with self._lock:
+            self.evict_expired()
+            if thread_id in self._last_used:
+                self._last_used[thread_id] = time.monotonic()
+                self._last_used.move_to_end(thread_id)
+            return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, then drop whatever no longer fits within the limits."""
+        configurable = config.get("configurable", {})
+        thread_id, checkpoint_ns = configurable["thread_id"], configurable["checkpoint_ns"]
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            versions = self._channel_versions.setdefault(thread_id, {})
+            versions[checkpoint_ns, checkpoint["id"]] = dict(checkpoint["channel_versions"])
+            self._last_used[thread_id] = time.monotonic()
+            self._last_used.move_to_end(thread_id)
+            self._prune_checkpoints(thread_id, checkpoint_ns)
+            self.evict_expired()
+            while self.max_threads is not None and len(self._last_used) > self.max_threads:
+                self._evict_thread(next(iter(self._last_used)))
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save intermediate writes."""
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete a thread using the per-thread index instead of scanning every key."""
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+            for (checkpoint_ns, checkpoint_id), versions in self._channel_versions.pop(thread_id, {}).items():
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for channel, version in versions.items():
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+            self.storage.pop(thread_id, None)
+
+    def evict_expired(self) -> None:
+        """Evict every thread that has been idle for longer than `ttl`."""
+        if self.ttl is None:
+            return
+        deadline = time.monotonic() - self.ttl
+        with self._lock:
+            while self._last_used and next(iter(self._last_used.values())) < deadline:
+                self._evict_thread(next(iter(self._last_used)))
+
+    def _evict_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+        self.evicted_threads += 1
+
+    def _prune_checkpoints(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drop the oldest checkpoints of a namespace beyond `max_checkpoints_per_thread`."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if self.max_checkpoints_per_thread is None or len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+        thread_versions = self._channel_versions[thread_id]
+        # Checkpoint IDs are time-ordered, so sorting them puts the oldest first.
+        ordered_ids = sorted(checkpoints)
+        excess = len(ordered_ids) - self.max_checkpoints_per_thread
+        candidates: set[tuple[str, str | int | float]] = set()
+        for checkpoint_id in ordered_ids[:excess]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            candidates.update(thread_versions.pop((checkpoint_ns, checkpoint_id), {}).items())
+        # Blobs are shared between checkpoints while a channel is unchanged, so keep those still referenced.
+        for checkpoint_id in ordered_ids[excess:]:
+            candidates.difference_update(thread_versions.get((checkpoint_ns, checkpoint_id), {}).items())
+        for channel, version in candidates:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        self.evicted_checkpoints += excess
+
 
-checkpointer = InMemorySaver()
+@cache
+def get_checkpointer() -> BaseCheckpointSaver[str]:
+    """Return the process-wide checkpointer for the configured backend."""
+    settings = get_settings()
+    if settings.checkpointer == "memory":
+        return InMemorySaver()
+    if settings.checkpointer == "bounded":
+        return BoundedInMemorySaver(
+            max_threads=settings.max_threads,
+            max_checkpoints_per_thread=settings.max_checkpoints_per_thread,
+            ttl=settings.thread_ttl,
+        )
+    if settings.checkpointer == "sqlite":
+        return PooledSqliteSaver(settings.sqlite_path, pool_size=settings.sqlite_pool_size)
+    msg = f"Unknown checkpointer backend: {settings.checkpointer!r}"
+    raise ValueError(msg)
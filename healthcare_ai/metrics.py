@@ -0,0 +1,301 @@
+"""
+Prometheus metrics for the agent service.
+
+The server exposes them at `/metrics` in Prometheus' text format: request rate and latency, latency histograms of
+turns, model calls, tool calls and checkpoint operations, tokens, errors by type, and, read from the components
+when scraped, admission decisions, cache effectiveness, checkpointer threads, connection pool and model call policy
+counters.
+
+Latencies, tokens and errors come from the agent's trace spans: `Metrics` is a span exporter, so the tracing
+callbacks feed it without any instrumentation of their own. Updates go to a shard owned by the recording thread,
+so the hot path takes no lock; a scrape sums the shards.
+"""
+
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Literal
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from healthcare_ai.admission import get_admission
+from healthcare_ai.cache import get_response_cache
+from healthcare_ai.coalesce import get_request_coalescer
+from healthcare_ai.config import get_settings
+from healthcare_ai.memory import BoundedInMemorySaver, get_checkpointer
+from healthcare_ai.model_policy import get_model_policy
+from healthcare_ai.prompt_cache import get_prompt_cache
+from healthcare_ai.routing import get_router
+from healthcare_ai.tool_cache import TOOL_CACHES
+from healthcare_ai.tracing import Span
+
+PREFIX = "healthcare_ai_"
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Kind = Literal["counter", "gauge", "histogram"]
+Labels = tuple[tuple[str, str], ...]
+
+# Type and help text of every metric, by name without the prefix
+METRICS: dict[str, tuple[Kind, str]] = {
+    "http_requests_total": ("counter", "HTTP requests served, by endpoint and status."),
+    "http_request_seconds": ("histogram", "Seconds until the response starts, by endpoint."),
+    "turn_seconds": ("histogram", "Seconds per agent turn, end to end."),
+    "model_seconds": ("histogram", "Seconds per model call, by model."),
+    "tool_seconds": ("histogram", "Seconds per tool call, by tool."),
+    "checkpoint_seconds": ("histogram", "Seconds per checkpoint operation, by operation."),
+    "tokens_total": ("counter", "Model tokens, by kind: input, output or cache_read."),
+    "errors_total": ("counter", "Errors, by stage and exception type."),
+    "checkpointer_threads": ("gauge", "Conversation threads held by the checkpointer."),
+    "checkpointer_resident_bytes": ("gauge", "Approximate bytes of checkpoints held in memory."),
+    "checkpointer_evicted_threads_total": ("counter", "Threads evicted to stay within the checkpointer's limits."),
+    "response_cache_lookups_total": ("counter", "Response cache lookups, by result: a tier's name or miss."),
+    "response_cache_hit_ratio": ("gauge", "Share of response cache lookups served from any tier."),
+    "response_cache_saved_seconds_total": ("counter", "Model call seconds avoided by response cache hits."),
+    "prompt_cache_tokens_total": ("counter", "Prompt prefix tokens, by kind: read from or written to the cache."),
+    "prompt_cache_hit_ratio": ("gauge", "Share of cacheable prompt prefix tokens read from the cache."),
+    "coalesced_calls_total": (
+        "counter",
+        "First-turn model calls, by role: sent upstream (leader) or shared (follower).",
+    ),
+    "tool_cache_calls_total": ("counter", "Cached tool calls, by cache and result: hit, shared or miss."),
+    "http_pool_requests_total": ("counter", "Requests sent through the model API connection pool."),
+    "http_pool_in_flight": ("gauge", "Model API requests in flight."),
+    "http_pool_saturated_total": ("counter", "Model API requests sent while the pool was at its connection limit."),
+    "http_pool_connections_opened_total": ("counter", "Model API connections opened."),
+    "model_policy_events_total": ("counter", "Model call policy events, by kind: attempt, retry, timeout, ..."),
+    "router_routes_total": ("counter", "Routed model calls, by route (small or large) and the rule that chose it."),
+    "router_fallbacks_total": ("counter", "Model calls retried on the fallback model."),
+    "admission_admitted_total": ("counter", "Turns admitted."),
+    "admission_rejected_total": ("counter", "Turns rejected with 429, by reason."),
+    "admission_running": ("gauge", "Admitted turns running."),
+    "admission_queued": ("gauge", "Turns waiting for a slot."),
+}
+
+
+@dataclass
+class Sample:
+    """One value of a metric."""
+
+    name: str
+    value: float
+    labels: dict[str, str] = field(default_factory=dict[str, str])
+
+
+class _Shard:
+    """Values recorded by one thread; only that thread writes them."""
+
+    def __init__(self) -> None:
+        self.counters: dict[tuple[str, Labels], float] = {}
+        # Count per bucket, then the count above the last bucket, then the sum
+        self.histograms: dict[tuple[str, Labels], list[float]] = {}
+
+    def add(self, other: "_Shard") -> None:
+        """Add the values of `other` to this shard's."""
+        # Copying a dict or list is atomic, so a thread recording into `other` cannot break the iteration.
+        for key, value in dict(other.counters).items():
+            self.counters[key] = self.counters.get(key, 0.0) + value
+        for key, counts in dict(other.histograms).items():
+            total = self.histograms.setdefault(key, [0.0] * len(counts))
+            for index, count in enumerate(list(counts)):
+                total[index] += count
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name: str, labels: Iterable[tuple[str, str]], value: float) -> str:
+    rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+    number = str(int(value)) if float(value).is_integer() else repr(float(value))
+    return f"{PREFIX}{name}{{{rendered}}} {number}" if rendered else f"{PREFIX}{name} {number}"
+
+
+class Metrics:
+    """Process-wide metrics, recorded without locks and summed when scraped.
+
+    Each thread records into a shard of its own. The shards of threads that have exited are folded into one, so
+    executors that keep replacing their threads do not make scrapes slower.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Record latencies into histograms with the given bucket bounds."""
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: dict[threading.Thread, _Shard] = {}
+        # Values recorded by threads that have exited
+        self._retired = _Shard()
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Once per thread
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._retire_finished()
+                self._shards[threading.current_thread()] = shard
+            return shard
+
+    def _retire_finished(self) -> None:
+        """Fold the shards of threads that have exited into the retired shard; call with the lock held."""
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            self._retired.add(self._shards.pop(thread))
+
+    @property
+    def shard_count(self) -> int:
+        """Number of per-thread shards held, not counting the retired one."""
+        with self._lock:
+            return len(self._shards)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Add `value` to a counter."""
+        counters = self._shard().counters
+        key = (name, tuple(labels.items()))
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record `value` in a histogram."""
+        histograms = self._shard().histograms
+        key = (name, tuple(labels.items()))
+        if (counts := histograms.get(key)) is None:
+            counts = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def collector(self, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Call `collect` on every scrape for values read from elsewhere."""
+        self._collectors.append(collect)
+
+    def export(self, span: Span) -> None:
+        """Record a finished trace span."""
+        stage = span.name.split(".", 1)[0]
+        if span.error is not None:
+            self.inc("errors_total", stage=stage, type=span.error.partition(":")[0])
+        if stage == "agent":
+            self.observe("turn_seconds", span.seconds)
+        elif stage == "model":
+            self.observe("model_seconds", span.seconds, model=str(span.attributes.get("model")))
+            for kind in ("input", "output", "cache_read"):
+                if tokens := span.attributes.get(f"{kind}_tokens"):
+                    self.inc("tokens_total", tokens, kind=kind)
+        elif stage == "tool":
+            self.observe("tool_seconds", span.seconds, tool=str(span.attributes.get("tool")))
+        elif stage == "checkpoint":
+            self.observe("checkpoint_seconds", span.seconds, operation=span.name.partition(".")[2])
+
+    def _totals(self) -> tuple[dict[tuple[str, Labels], float], dict[tuple[str, Labels], list[float]]]:
+        total = _Shard()
+        with self._lock:
+            self._retire_finished()
+            total.add(self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            total.add(shard)
+        return total.counters, total.histograms
+
+    def render(self) -> str:
+        """Return all metrics in Prometheus' text exposition format."""
+        counters, histograms = self._totals()
+        lines: dict[str, list[str]] = {}
+        for (name, labels), value in counters.items():
+            lines.setdefault(name, []).append(_format(name, labels, value))
+        for (name, labels), counts in histograms.items():
+            rendered = lines.setdefault(name, [])
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, float("inf")), counts[:-1], strict=True):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                rendered.append(_format(f"{name}_bucket", (*labels, ("le", le)), cumulative))
+            rendered.append(_format(f"{name}_sum", labels, counts[-1]))
+            rendered.append(_format(f"{name}_count", labels, cumulative))
+        for collect in self._collectors:
+            for sample in collect():
+                lines.setdefault(sample.name, []).append(_format(sample.name, sample.labels.items(), sample.value))
+        output: list[str] = []
+        for name, rendered in lines.items():
+            kind, help_text = METRICS.get(name, ("gauge", name))
+            output += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} {kind}", *rendered]
+        return "\n".join(output) + "\n"
+
+
+def _checkpointer_samples() -> Iterator[Sample]:
+    checkpointer = get_checkpointer()
+    if isinstance(checkpointer, BoundedInMemorySaver):
+        yield Sample("checkpointer_threads", checkpointer.thread_count)
+        yield Sample("checkpointer_resident_bytes", checkpointer.resident_bytes)
+        yield Sample("checkpointer_evicted_threads_total", checkpointer.evicted_threads)
+    elif isinstance(checkpointer, InMemorySaver):
+        yield Sample("checkpointer_threads", len(checkpointer.storage))
+
+
+def _cache_samples() -> Iterator[Sample]:
+    if (response_cache := get_response_cache()) is not None:
+        stats = response_cache.stats
+        for tier, hits in dict(stats.hits).items():
+            yield Sample("response_cache_lookups_total", hits, {"result": tier})
+        yield Sample("response_cache_lookups_total", stats.misses, {"result": "miss"})
+        yield Sample("response_cache_hit_ratio", stats.hit_rate)
+        yield Sample("response_cache_saved_seconds_total", stats.saved_seconds)
+    if (prompt_cache := get_prompt_cache()) is not None:
+        stats = prompt_cache.stats
+        yield Sample("prompt_cache_tokens_total", stats.cache_read_tokens, {"kind": "read"})
+        yield Sample("prompt_cache_tokens_total", stats.cache_write_tokens, {"kind": "write"})
+        yield Sample("prompt_cache_hit_ratio", stats.hit_rate)
+    if (coalescer := get_request_coalescer()) is not None:
+        yield Sample("coalesced_calls_total", coalescer.stats.leaders, {"role": "leader"})
+        yield Sample("coalesced_calls_total", coalescer.stats.followers, {"role": "follower"})
+    for name, tool_cache in dict(TOOL_CACHES).items():
+        for result, calls in (("hit", tool_cache.hits), ("shared", tool_cache.shared), ("miss", tool_cache.misses)):
+            yield Sample("tool_cache_calls_total", calls, {"cache": name, "result": result})
+
+
+def _model_call_samples() -> Iterator[Sample]:
+    # Deferred like in `build_model`: the pool imports the provider SDK, which is slow to import.
+    from healthcare_ai.http_pool import get_http_pool  # noqa: PLC0415
+
+    pool = get_http_pool().metrics.snapshot()
+    yield Sample("http_pool_requests_total", pool["requests"])
+    yield Sample("http_pool_in_flight", pool["in_flight"])
+    yield Sample("http_pool_saturated_total", pool["saturated"])
+    yield Sample("http_pool_connections_opened_total", pool["connections_opened"])
+    policy = get_model_policy().stats
+    for kind in ("attempts", "retries", "timeouts", "hedges", "hedge_wins", "failures"):
+        yield Sample("model_policy_events_total", getattr(policy, kind), {"kind": kind})
+    if (router := get_router()) is not None:
+        for (route, reason), calls in dict(router.stats.reasons).items():
+            yield Sample("router_routes_total", calls, {"route": route, "reason": reason})
+        yield Sample("router_fallbacks_total", router.stats.fallbacks)
+
+
+def _admission_samples() -> Iterator[Sample]:
+    if (admission := get_admission()) is None:
+        return
+    stats = admission.stats
+    yield Sample("admission_admitted_total", stats.admitted)
+    for reason, turns in dict(stats.rejected).items():
+        yield Sample("admission_rejected_total", turns, {"reason": reason})
+    yield Sample("admission_running", stats.running)
+    yield Sample("admission_queued", stats.queued)
+
+
+def collect_components() -> Iterator[Sample]:
+    """Read the counters kept by admission control, the checkpointer, caches, connection pool, policy and router."""
+    yield from _admission_samples()
+    yield from _checkpointer_samples()
+    yield from _cache_samples()
+    yield from _model_call_samples()
+
+
+@cache
+def get_metrics() -> Metrics | None:
+    """Return the process-wide metrics, or `None` when metrics are disabled."""
+    if not get_settings().metrics:
+        return None
+    metrics = Metrics()
+    metrics.collector(collect_components)
+    return metrics
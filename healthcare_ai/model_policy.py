@@ -0,0 +1,314 @@
+"""
+Retry, deadline and hedging policy for model calls.
+
+A single slow or failed upstream call otherwise sets the latency of the whole turn. The policy gives each model
+call a per-attempt and a total deadline, retries retryable failures (timeouts, connection errors, rate limits and
+server errors) with exponential backoff and full jitter, and can hedge: once an attempt has run longer than a
+quantile of recent call latencies, a duplicate request is sent and whichever answers first wins.
+
+A sync attempt with only a deadline runs on the caller's thread and relies on the HTTP client's timeout, which
+`build_model` sets to the attempt deadline. Hedged sync attempts run on a bounded pool of worker threads so the
+policy can stop waiting on them; each attempt's deadline counts from when a worker starts it, so time spent queued
+for a worker is only bounded by the total deadline. An abandoned sync call keeps running in its thread until it
+returns. Hedging and retries can repeat tokens to a client streaming the agent's messages, so they suit
+invoke-style callers best.
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+
+import httpx
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+
+from healthcare_ai.config import get_settings
+
+# HTTP statuses worth retrying: timeout, conflict, rate limit, server errors and Anthropic's "overloaded"
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+# Monotonic time by which the model calls in progress must finish, when set by `call_deadline`
+_call_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("call_deadline", default=None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return whether a failed model call may succeed if repeated."""
+    if isinstance(error, TimeoutError | ConnectionError | httpx.TransportError):
+        return True
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS:
+        return True
+    # Provider SDKs wrap transport errors in their own exception types.
+    return error.__cause__ is not None and is_retryable(error.__cause__)
+
+
+@contextmanager
+def call_deadline(seconds: float | None) -> Iterator[None]:
+    """Give model calls made in the block at most `seconds` in total, retries included, if less than the policy's.
+
+    The router uses it to fall back to another model without waiting out every retry of the routed one.
+    """
+    if seconds is None:
+        yield
+        return
+    current = _call_deadline.get()
+    deadline = time.monotonic() + seconds
+    token = _call_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+
+@dataclass
+class PolicyStats:
+    """Counters of the policy's decisions."""
+
+    # Model requests sent, including retries and hedges
+    attempts: int = 0
+    retries: int = 0
+    # Attempts that hit their deadline
+    timeouts: int = 0
+    # Duplicate requests sent, and how many of them answered first
+    hedges: int = 0
+    hedge_wins: int = 0
+    # Calls that failed after the policy gave up
+    failures: int = 0
+
+
+class ModelPolicyMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Apply deadlines, retries with backoff and optional hedging to every model call."""
+
+    def __init__(  # noqa: PLR0913 - each knob is a separate, independently tuned setting
+        self,
+        *,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        attempt_timeout: float | None = None,
+        total_timeout: float | None = None,
+        hedge_quantile: float | None = None,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+        max_workers: int = 32,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ) -> None:
+        """Configure the policy; `None` disables a deadline or hedging.
+
+        Retry `n` waits a random time up to `min(backoff_max, backoff_base * 2**n)` seconds. Hedging starts once
+        `hedge_min_samples` call latencies have been seen, and uses the last `latency_window` of them. Hedged sync
+        attempts share `max_workers` threads.
+        """
+        super().__init__()
+        if max_attempts < 1:
+            msg = "max_attempts must be at least 1"
+            raise ValueError(msg)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.stats = PolicyStats()
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="model-call")
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            for name, increment in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + increment)
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> float | None:
+        """Return how long an attempt may run before it is hedged, or `None` if it should not be."""
+        if self.hedge_quantile is None:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(self.hedge_quantile * len(latencies)))]
+
+    def backoff(self, retry: int) -> float:
+        """Return the jittered wait before retry number `retry`, counting from 0."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**retry))  # noqa: S311 - not crypto
+
+    def _attempt_timeout(self, deadline: float | None) -> float | None:
+        """Return the time the next attempt may take, bounded by the total deadline."""
+        if deadline is None:
+            return self.attempt_timeout
+        remaining = deadline - time.monotonic()
+        return remaining if self.attempt_timeout is None else min(self.attempt_timeout, remaining)
+
+    def _next_wait(self, error: BaseException, attempt: int, deadline: float | None) -> float:
+        """Return the wait before the next attempt, or re-raise `error` if the policy gives up."""
+        if isinstance(error, TimeoutError):
+            self._count(timeouts=1)
+        wait_seconds = self.backoff(attempt)
+        out_of_time = deadline is not None and time.monotonic() + wait_seconds >= deadline
+        if attempt + 1 >= self.max_attempts or out_of_time or not self.retryable(error):
+            self._count(failures=1)
+            raise error
+        self._count(retries=1)
+        return wait_seconds
+
+    def _deadline(self) -> float | None:
+        deadline = None if self.total_timeout is None else time.monotonic() + self.total_timeout
+        if (caller_deadline := _call_deadline.get()) is None:
+            return deadline
+        return caller_deadline if deadline is None else min(deadline, caller_deadline)
+
+    def _submit(self, call: Callable[[], ModelResponse], started: threading.Event) -> Future[ModelResponse]:
+        """Run `call` on a worker thread, setting `started` when a worker picks it up."""
+        self._count(attempts=1)
+        # Each attempt runs in a copy of the caller's context, which carries the run's config and callbacks.
+        context = contextvars.copy_context()
+
+        def run() -> ModelResponse:
+            started.set()
+            return context.run(call)
+
+        return self._executor.submit(run)
+
+    def _attempt(
+        self, call: Callable[[], ModelResponse], timeout: float | None, deadline: float | None
+    ) -> ModelResponse:
+        """Run one attempt, inline unless it may be hedged, in which case worker threads run it and its hedge."""
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is None:
+            self._count(attempts=1)
+            start = time.monotonic()
+            response = call()
+            self._observe(time.monotonic() - start)
+            return response
+        started = threading.Event()
+        futures = [self._submit(call, started)]
+        try:
+            return self._hedged(call, futures, started, timeout, hedge_delay, deadline)
+        finally:
+            # Attempts still queued for a worker are dropped; running ones are abandoned.
+            for future in futures:
+                future.cancel()
+
+    def _hedged(
+        self,
+        call: Callable[[], ModelResponse],
+        futures: list[Future[ModelResponse]],
+        started: threading.Event,
+        timeout: float | None,
+        hedge_delay: float,
+        deadline: float | None,
+    ) -> ModelResponse:
+        # Time queued for a worker does not count against the attempt's deadline, only against the total one.
+        if not started.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+            raise TimeoutError
+        start = time.monotonic()
+        if timeout is None or hedge_delay < timeout:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                self._count(hedges=1)
+                futures.append(self._submit(call, threading.Event()))
+        pending = set(futures)
+        error: BaseException | None = None
+        while pending:
+            remaining = None if timeout is None else timeout - (time.monotonic() - start)
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if (error := future.exception()) is None:
+                    if future is not futures[0]:
+                        self._count(hedge_wins=1)
+                    self._observe(time.monotonic() - start)
+                    return future.result()
+        if pending or error is None:
+            raise TimeoutError
+        raise error
+
+    async def _aattempt(self, call: Callable[[], Awaitable[ModelResponse]]) -> ModelResponse:
+        """Run one attempt, hedged if it runs long, as tasks that are cancelled once it is decided."""
+        start = time.monotonic()
+        self._count(attempts=1)
+        tasks = [asyncio.ensure_future(call())]
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    self._count(attempts=1, hedges=1)
+                    tasks.append(asyncio.ensure_future(call()))
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if (error := task.exception()) is None:
+                        if task is not tasks[0]:
+                            self._count(hedge_wins=1)
+                        self._observe(time.monotonic() - start)
+                        return task.result()
+            assert error is not None  # noqa: S101 - every task finished and none succeeded
+            raise error
+        finally:
+            # Also reached when the attempt's deadline cancels it.
+            for task in tasks:
+                task.cancel()
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Call the model under the policy."""
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(lambda: handler(request), self._attempt_timeout(deadline), deadline)
+            except Exception as error:  # noqa: BLE001 - classified by the retry policy
+                time.sleep(self._next_wait(error, attempt, deadline))
+            attempt += 1
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Call the model under the policy."""
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            try:
+                async with asyncio.timeout(self._attempt_timeout(deadline)):
+                    return await self._aattempt(lambda: handler(request))
+            except Exception as error:  # noqa: BLE001 - classified by the retry policy
+                await asyncio.sleep(self._next_wait(error, attempt, deadline))
+            attempt += 1
+
+
+@cache
+def get_model_policy() -> ModelPolicyMiddleware:
+    """Return the process-wide model call policy."""
+    settings = get_settings()
+    return ModelPolicyMiddleware(
+        max_attempts=settings.model_max_attempts,
+        backoff_base=settings.model_backoff_base,
+        backoff_max=settings.model_backoff_max,
+        attempt_timeout=settings.model_attempt_timeout or None,
+        total_timeout=settings.model_total_timeout or None,
+        hedge_quantile=settings.model_hedge_quantile or None,
+        max_workers=settings.model_call_workers,
+    )
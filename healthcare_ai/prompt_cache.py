@@ -0,0 +1,134 @@
+"""
+Provider-side prompt caching for the stable prompt prefix.
+
+Every model call starts with the same tool definitions and system prompt, which Anthropic can cache: a request
+whose prefix matches a cached one is billed and processed at a fraction of the cost. The provider hashes the prefix
+in the order tools, system prompt, messages, up to a `cache_control` breakpoint. This middleware sends the system
+prompt as a content block carrying that breakpoint, so tools and system prompt are cached together, and sorts the
+tools by name so the prefix is byte-identical however they were registered. Messages follow the prefix and may
+change freely, for example when the history policy drops old turns.
+
+Each response's cache reads and writes are recorded, so the hit rate can be checked in production.
+"""
+
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from typing import Any, Literal
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.tools import BaseTool
+
+from healthcare_ai.config import get_settings
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Chat models that understand `cache_control` blocks, by their `_llm_type`
+CACHE_CONTROL_MODELS = frozenset({"anthropic-chat", "fake"})
+
+
+@dataclass
+class PromptCacheStats:
+    """Token counts of the model calls seen by the middleware."""
+
+    calls: int = 0
+    input_tokens: int = 0
+    # Prefix tokens served from the provider's cache, and written to it
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of cacheable prefix tokens read from the cache."""
+        cacheable = self.cache_read_tokens + self.cache_write_tokens
+        return self.cache_read_tokens / cacheable if cacheable else 0.0
+
+
+def _tool_name(tool: BaseTool | dict[str, Any]) -> str:
+    if isinstance(tool, BaseTool):
+        return tool.name
+    # Schemas in OpenAI's format nest the name under "function".
+    function = tool.get("function")
+    return str(function.get("name", "") if isinstance(function, dict) else tool.get("name", ""))
+
+
+@lru_cache(maxsize=16)
+def _system_message(prompt: str, ttl: str) -> SystemMessage:
+    """Build the system message carrying the cache breakpoint, once per prompt."""
+    return SystemMessage(content=[{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral", "ttl": ttl}}])
+
+
+def supports_cache_control(model: BaseChatModel) -> bool:
+    """Return whether `model` accepts `cache_control` breakpoints."""
+    return model._llm_type in CACHE_CONTROL_MODELS  # noqa: SLF001  # pyright: ignore[reportPrivateUsage]
+
+
+class PromptCacheMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Mark the tools and system prompt as a cacheable prefix and record cache reads and writes."""
+
+    def __init__(self, *, ttl: Literal["5m", "1h"] = "5m") -> None:
+        """Keep the prefix cached for `ttl` after its last use."""
+        super().__init__()
+        self.ttl = ttl
+        self.stats = PromptCacheStats()
+        self._lock = threading.Lock()
+
+    def prepare(self, request: ModelRequest) -> ModelRequest:
+        """Return the request with a stable tool order and the system prompt as a cache breakpoint."""
+        tools = sorted(request.tools, key=_tool_name)
+        if not request.system_prompt or not supports_cache_control(request.model):
+            return request.override(tools=tools)
+        system = _system_message(request.system_prompt, self.ttl)
+        return request.override(system_prompt=None, messages=[system, *request.messages], tools=tools)
+
+    def record(self, response: ModelResponse) -> None:
+        """Add the cache reads and writes reported for a response."""
+        for message in response.result:
+            if not isinstance(message, AIMessage) or message.usage_metadata is None:
+                continue
+            usage = message.usage_metadata
+            details = usage.get("input_token_details", {})
+            read, written = details.get("cache_read", 0), details.get("cache_creation", 0)
+            with self._lock:
+                self.stats.calls += 1
+                self.stats.input_tokens += usage["input_tokens"]
+                self.stats.cache_read_tokens += read
+                self.stats.cache_write_tokens += written
+            logger.debug("Prompt cache: %d tokens read, %d written of %d", read, written, usage["input_tokens"])
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Call the model with the cacheable prefix."""
+        response = handler(self.prepare(request))
+        self.record(response)
+        return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Call the model with the cacheable prefix."""
+        response = await handler(self.prepare(request))
+        self.record(response)
+        return response
+
+
+@cache
+def get_prompt_cache() -> PromptCacheMiddleware | None:
+    """Return the process-wide prompt cache middleware, or `None` when prompt caching is disabled."""
+    settings = get_settings()
+    if not settings.prompt_cache_ttl:
+        return None
+    if settings.prompt_cache_ttl not in {"5m", "1h"}:
+        msg = f"Unknown prompt cache TTL {settings.prompt_cache_ttl!r}, expected '5m' or '1h'"
+        raise ValueError(msg)
+    return PromptCacheMiddleware(ttl="1h" if settings.prompt_cache_ttl == "1h" else "5m")
@@ -0,0 +1 @@
+"""Retrieval over local documents: ingestion, embedding and vector search."""
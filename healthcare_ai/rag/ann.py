@@ -0,0 +1,226 @@
+"""
+Approximate nearest-neighbor index for large corpora.
+
+Exact search scores every stored vector, which stops scaling past a few million chunks. The IVF index partitions
+the vectors with spherical k-means: each vector goes to the inverted list of its nearest centroid, and a query
+scores only the vectors of its `nprobe` nearest lists. `nprobe` trades recall for latency and can be changed at
+any time; more lists make each probe cheaper but need more probes for the same recall.
+
+Each inverted list is a `VectorIndex`, so deletes, replacement and compaction work as in the exact index. A batch
+of queries is answered list by list, with one matrix product per probed list. Training and assigning large
+batches to lists split the work across a thread pool, since NumPy releases the GIL in matrix products.
+
+Centroids trained on a handful of vectors partition a large corpus badly, so an index filled a batch at a time
+keeps its first vectors in an exact index until there are `train_size` of them, then trains on them. Unless the
+number of lists is fixed, it retrains on all its vectors whenever it has grown `RETRAIN_GROWTH` times since it
+was last trained, so the lists keep up with about 4 sqrt(n) as the corpus grows.
+"""
+
+import heapq
+import math
+import os
+import threading
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import numpy.typing as npt
+
+from healthcare_ai.rag.index import Matrix, VectorIndex, normalize, top_k
+
+NPROBE = 8
+# k-means iterations, and training vectors sampled per list
+TRAIN_ITERATIONS = 10
+TRAIN_SAMPLES_PER_LIST = 64
+# Vectors assigned to lists per task
+ASSIGN_BLOCK = 16_384
+# Rows each inverted list reserves when created
+LIST_CAPACITY = 16
+# Vectors searched exactly before the index trains itself, and the growth after which it retrains
+TRAIN_SIZE = 10_000
+RETRAIN_GROWTH = 4
+
+
+class IVFIndex:
+    """Inverted-file index: cosine search over the vectors of the lists nearest to each query."""
+
+    def __init__(
+        self,
+        dimensions: int,
+        *,
+        lists: int | None = None,
+        nprobe: int = NPROBE,
+        workers: int | None = None,
+        train_size: int = TRAIN_SIZE,
+        seed: int = 0,
+    ) -> None:
+        """Partition vectors of `dimensions` floats into `lists` lists and search `nprobe` of them per query.
+
+        Unless `train` is called first, the index trains itself once `train_size` vectors have been added, by
+        default with about 4 sqrt(n) lists for n vectors, and searches them exactly until then. `workers`
+        threads, by default one per CPU, share training and assignment.
+        """
+        self.dimensions = dimensions
+        self.lists = lists
+        self.nprobe = nprobe
+        self.workers = workers or os.cpu_count() or 1
+        self.train_size = train_size
+        self._fixed_lists = lists is not None
+        self._rng = np.random.default_rng(seed)
+        self._centroids: Matrix | None = None
+        self._lists: list[VectorIndex] = []
+        # List holding each live id
+        self._list_of: dict[str, int] = {}
+        # Vectors added before training, and how many vectors the index held when it was last trained
+        self._pending = VectorIndex(dimensions)
+        self._trained_size = 0
+        # Serializes writes; `_lock` only guards swapping in new lists, so searches never wait for training.
+        self._write_lock = threading.RLock()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of live vectors."""
+        return len(self._list_of) + len(self._pending)
+
+    @property
+    def trained(self) -> bool:
+        """Whether the centroids have been computed."""
+        return self._centroids is not None
+
+    def _assign(self, centroids: Matrix, matrix: Matrix) -> npt.NDArray[np.intp]:
+        """Return the nearest centroid of each row of `matrix`."""
+
+        def nearest(first: int) -> npt.NDArray[np.intp]:
+            return np.argmax(matrix[first : first + ASSIGN_BLOCK] @ centroids.T, axis=1)
+
+        starts = range(0, len(matrix), ASSIGN_BLOCK)
+        if len(starts) <= 1 or self.workers == 1:
+            return np.concatenate([nearest(first) for first in starts] or [np.empty(0, dtype=np.intp)])
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="ivf") as executor:
+            return np.concatenate(list(executor.map(nearest, starts)))
+
+    def train(self, vectors: npt.ArrayLike, *, iterations: int = TRAIN_ITERATIONS) -> Matrix:
+        """Compute and return the lists' centroids by spherical k-means on a sample of `vectors`.
+
+        Vectors added before are reassigned to the new lists.
+        """
+        with self._write_lock:
+            return self._train(normalize(vectors), iterations)
+
+    def _train(self, matrix: Matrix, iterations: int = TRAIN_ITERATIONS) -> Matrix:
+        lists = min(self.lists if self._fixed_lists and self.lists else default_lists(len(matrix)), len(matrix))
+        if lists == 0:
+            message = "Cannot train an IVF index without vectors"
+            raise ValueError(message)
+        samples = min(len(matrix), lists * TRAIN_SAMPLES_PER_LIST)
+        sample = matrix[self._rng.choice(len(matrix), samples, replace=False)]
+        centroids = sample[self._rng.choice(samples, lists, replace=False)]
+        for _ in range(iterations):
+            assignment = self._assign(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            # Lists left empty restart from random samples.
+            empty = np.flatnonzero(~sums.any(axis=1))
+            sums[empty] = sample[self._rng.choice(samples, len(empty))]
+            centroids = normalize(sums)
+        # The vectors already added move to the new lists, which searches see once they are complete.
+        ids, vectors = self._export()
+        new_lists = [VectorIndex(self.dimensions, capacity=LIST_CAPACITY) for _ in range(lists)]
+        list_of: dict[str, int] = {}
+        self._fill(new_lists, list_of, ids, vectors, self._assign(centroids, vectors))
+        with self._lock:
+            self.lists = lists
+            self._centroids = centroids
+            self._lists = new_lists
+            self._list_of = list_of
+            self._pending = VectorIndex(self.dimensions)
+        self._trained_size = max(len(matrix), len(list_of))
+        return centroids
+
+    def _export(self) -> tuple[list[str], Matrix]:
+        """Return every live id and its unit vector."""
+        ids, vectors = self._pending.export()
+        parts = [(ids, vectors), *(vector_list.export() for vector_list in self._lists)]
+        return [id_ for part_ids, _ in parts for id_ in part_ids], np.concatenate([part for _, part in parts])
+
+    @staticmethod
+    def _fill(
+        lists: list[VectorIndex],
+        list_of: dict[str, int],
+        ids: list[str],
+        matrix: Matrix,
+        assignment: npt.NDArray[np.intp],
+    ) -> None:
+        """Add each row of `matrix` to its assigned list."""
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.flatnonzero(np.diff(assignment[order])) + 1
+        for rows in np.split(order, bounds):
+            if len(rows):
+                target = int(assignment[rows[0]])
+                lists[target].add([ids[row] for row in rows], matrix[rows])
+                list_of.update((ids[row], target) for row in rows)
+
+    def add(self, ids: Sequence[str], vectors: npt.ArrayLike) -> None:
+        """Insert vectors under `ids`, replacing the vectors of ids already present."""
+        matrix = normalize(vectors)
+        if matrix.shape != (len(ids), self.dimensions):
+            message = f"Expected {len(ids)} vectors of {self.dimensions} dimensions, got shape {matrix.shape}"
+            raise ValueError(message)
+        # Only the last vector of an id repeated in `ids` is kept.
+        latest = {id_: position for position, id_ in enumerate(ids)}
+        ids, matrix = list(latest), matrix[list(latest.values())]
+        with self._write_lock:
+            if self._centroids is None:
+                self._pending.add(ids, matrix)
+                if len(self._pending) >= self.train_size:
+                    self._train(self._pending.export()[1])
+                return
+            assignment = self._assign(self._centroids, matrix)
+            with self._lock:
+                self._remove(ids)
+                self._fill(self._lists, self._list_of, ids, matrix, assignment)
+            if not self._fixed_lists and len(self) >= RETRAIN_GROWTH * self._trained_size:
+                self._train(self._export()[1])
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove the vectors of `ids` and return how many were present."""
+        with self._write_lock:
+            if self._centroids is None:
+                return self._pending.delete(ids)
+            with self._lock:
+                return self._remove(ids)
+
+    def _remove(self, ids: Iterable[str]) -> int:
+        by_list: dict[int, list[str]] = {}
+        for id_ in ids:
+            if (target := self._list_of.pop(id_, None)) is not None:
+                by_list.setdefault(target, []).append(id_)
+        return sum(self._lists[target].delete(members) for target, members in by_list.items())
+
+    def search(self, query: npt.ArrayLike, k: int = 4) -> list[tuple[str, float]]:
+        """Return the ids and cosine similarities of the `k` vectors most similar to `query`, best first."""
+        return self.search_batch(query, k)[0]
+
+    def search_batch(self, queries: npt.ArrayLike, k: int = 4) -> list[list[tuple[str, float]]]:
+        """Return approximately the `k` most similar vectors to each of `queries`, as `search` does."""
+        matrix = normalize(queries)
+        with self._lock:
+            centroids, lists, pending = self._centroids, self._lists, self._pending
+        if centroids is None:
+            return pending.search_batch(matrix, k)
+        probes, _ = top_k(matrix @ centroids.T, min(self.nprobe, len(lists)))
+        # Queries probing each list
+        askers: dict[int, list[int]] = {}
+        for query, probed in enumerate(probes.tolist()):
+            for target in probed:
+                askers.setdefault(target, []).append(query)
+        candidates: list[list[tuple[str, float]]] = [[] for _ in matrix]
+        for target, members in askers.items():
+            for query, found in zip(members, lists[target].search_batch(matrix[members], k), strict=True):
+                candidates[query].extend(found)
+        return [heapq.nlargest(k, found, key=lambda pair: pair[1]) for found in candidates]
+
+
+def default_lists(size: int) -> int:
+    """Return a number of lists suited to about `size` vectors: about 4 sqrt(size)."""
+    return max(1, 4 * math.isqrt(size))
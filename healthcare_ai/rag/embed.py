@@ -0,0 +1,240 @@
+"""
+Batched, concurrent embedding of document chunks.
+
+Embedding one chunk per call is the slowest part of indexing: every call pays the provider's round trip. The
+embedding stage groups chunks into batches, keeps several batches in flight at once, and yields the vectors in
+input order as they arrive, so it consumes ingestion's chunk stream without holding the corpus in memory.
+
+Vectors are cached on disk in SQLite as float32, keyed on a hash of the embedding model and the chunk's text, so
+re-indexing unchanged documents makes no embedding calls. Fresh vectors are rounded to float32 too, so a chunk's
+vector is the same whether it came from the cache or the embedder. `HashingEmbeddings` is a deterministic local embedder
+for running the pipeline offline.
+"""
+
+import array
+import asyncio
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import batched
+
+from langchain_core.embeddings import Embeddings
+
+from healthcare_ai.rag.ingest import Chunk
+
+BATCH_SIZE = 64
+MAX_CONCURRENCY = 4
+# Keys per cache query, below SQLite's limit on bound parameters (999 before SQLite 3.32)
+_KEYS_PER_QUERY = 500
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(word: str, dimensions: int) -> tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest())
+    return digest % dimensions, 1.0 if digest >> 63 else -1.0
+
+
+def _float32(vector: Iterable[float]) -> list[float]:
+    """Return `vector` rounded to float32, the precision the cache stores."""
+    return array.array("f", vector).tolist()
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic offline embedder: signed feature hashing of the words of a text, L2-normalized.
+
+    Texts sharing words get similar vectors, which is enough to exercise retrieval without a model. Calls can be
+    given a fixed latency to stand in for a remote embedding API.
+    """
+
+    def __init__(self, dimensions: int = 256, *, latency: float = 0.0) -> None:
+        """Produce vectors of `dimensions` floats; each call takes at least `latency` seconds."""
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for word in _WORD.findall(text.lower()):
+            index, sign = _bucket(word, self.dimensions)
+            vector[index] += sign
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts."""
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a search query."""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a search query."""
+        return (await self.aembed_documents([text]))[0]
+
+
+class EmbeddingCache:
+    """On-disk store of float32 vectors keyed on a hash of the embedding model and the text."""
+
+    def __init__(self, path: str) -> None:
+        """Open or create the cache database at `path`."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """Return the cache key of `text` embedded by `model`."""
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, list[float]]:
+        """Return the vectors stored under any of `keys`."""
+        rows: list[tuple[str, bytes]] = []
+        with self._lock:
+            for batch in batched(keys, _KEYS_PER_QUERY, strict=False):
+                placeholders = ",".join("?" * len(batch))
+                rows += self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",  # noqa: S608
+                    batch,
+                ).fetchall()
+        vectors: dict[str, list[float]] = {}
+        for key, blob in rows:
+            vector = array.array("f")
+            vector.frombytes(blob)
+            vectors[key] = vector.tolist()
+        return vectors
+
+    def put_many(self, vectors: dict[str, list[float]]) -> None:
+        """Store vectors under their keys."""
+        rows = [(key, array.array("f", vector).tobytes()) for key, vector in vectors.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+
+@dataclass
+class EmbeddingStats:
+    """Counters of the embedding stage."""
+
+    chunks: int = 0
+    # Chunks answered from the cache, and texts sent to the embedder in how many calls
+    cached: int = 0
+    embedded: int = 0
+    calls: int = 0
+
+
+def model_name(embeddings: Embeddings) -> str:
+    """Return a name identifying an embedder's vectors, for cache keys."""
+    for attribute in ("model", "model_name"):
+        if isinstance(name := getattr(embeddings, attribute, None), str):
+            return f"{type(embeddings).__name__}:{name}"
+    if isinstance(embeddings, HashingEmbeddings):
+        return f"{type(embeddings).__name__}:{embeddings.dimensions}"
+    return type(embeddings).__name__
+
+
+class EmbeddingStage:
+    """Embed a stream of chunks in concurrent batches, through an optional on-disk cache."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        *,
+        cache: EmbeddingCache | None = None,
+        batch_size: int = BATCH_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        """Send batches of up to `batch_size` chunks to `embeddings`, at most `max_concurrency` at a time."""
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.model = model_name(embeddings)
+        self.stats = EmbeddingStats()
+        self._lock = threading.Lock()
+
+    def _lookup(self, texts: Sequence[str]) -> tuple[list[str], dict[str, list[float]], list[str]]:
+        """Return the texts' cache keys, the cached vectors, and the distinct texts left to embed."""
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        found = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = list(dict.fromkeys(text for key, text in zip(keys, texts, strict=True) if key not in found))
+        with self._lock:
+            self.stats.chunks += len(texts)
+            self.stats.cached += sum(key in found for key in keys)
+            self.stats.embedded += len(missing)
+            self.stats.calls += bool(missing)
+        return keys, found, missing
+
+    def _store(
+        self, keys: list[str], found: dict[str, list[float]], missing: list[str], vectors: list[list[float]]
+    ) -> list[list[float]]:
+        """Cache newly embedded vectors and return every text's vector in order."""
+        embedded = {
+            EmbeddingCache.key(self.model, text): _float32(vector)
+            for text, vector in zip(missing, vectors, strict=True)
+        }
+        if self.cache is not None and embedded:
+            self.cache.put_many(embedded)
+        return [found[key] if key in found else embedded[key] for key in keys]
+
+    def embed_batch(self, chunks: Sequence[Chunk]) -> list[list[float]]:
+        """Return the vectors of one batch of chunks."""
+        keys, found, missing = self._lookup([chunk.text for chunk in chunks])
+        vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._store(keys, found, missing, vectors)
+
+    async def aembed_batch(self, chunks: Sequence[Chunk]) -> list[list[float]]:
+        """Return the vectors of one batch of chunks."""
+        keys, found, missing = await asyncio.to_thread(self._lookup, [chunk.text for chunk in chunks])
+        vectors = await self.embeddings.aembed_documents(missing) if missing else []
+        return await asyncio.to_thread(self._store, keys, found, missing, vectors)
+
+    def embed(self, chunks: Iterable[Chunk]) -> Iterator[tuple[Chunk, list[float]]]:
+        """Yield each chunk with its vector, in order, embedding batches on a thread pool."""
+        pending: deque[tuple[tuple[Chunk, ...], Future[list[list[float]]]]] = deque()
+        with ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="embed") as executor:
+            for batch in batched(chunks, self.batch_size, strict=False):
+                pending.append((batch, executor.submit(self.embed_batch, batch)))
+                if len(pending) >= self.max_concurrency:
+                    done, future = pending.popleft()
+                    yield from zip(done, future.result(), strict=True)
+            while pending:
+                done, future = pending.popleft()
+                yield from zip(done, future.result(), strict=True)
+
+    async def aembed(self, chunks: Iterable[Chunk]) -> AsyncIterator[tuple[Chunk, list[float]]]:
+        """Yield each chunk with its vector, in order, embedding batches concurrently."""
+        pending: deque[tuple[tuple[Chunk, ...], asyncio.Task[list[list[float]]]]] = deque()
+        try:
+            for batch in batched(chunks, self.batch_size, strict=False):
+                pending.append((batch, asyncio.ensure_future(self.aembed_batch(batch))))
+                if len(pending) >= self.max_concurrency:
+                    done, task = pending.popleft()
+                    for pair in zip(done, await task, strict=True):
+                        yield pair
+            while pending:
+                done, task = pending.popleft()
+                for pair in zip(done, await task, strict=True):
+                    yield pair
+        finally:
+            for _, task in pending:
+                task.cancel()
@@ -0,0 +1,208 @@
+"""
+In-process vector index with exact top-k search.
+
+Embeddings live in one contiguous float32 matrix, L2-normalized on insert, so cosine similarity against every
+stored vector is a single matrix product; `argpartition` then picks the top k without sorting all scores. Several
+queries are answered with one product, in blocks that bound the size of the score matrix.
+
+Deleted vectors are tombstoned and excluded from results; once they make up a large enough fraction of the matrix
+it is compacted. Re-adding an id replaces its vector. Searches may run concurrently with each other and with
+writes, which are serialized.
+"""
+
+import threading
+from collections.abc import Iterable, Sequence
+from typing import Protocol
+
+import numpy as np
+import numpy.typing as npt
+
+type Matrix = npt.NDArray[np.float32]
+
+# Rows reserved when the index is created; the matrix doubles whenever it fills up
+INITIAL_CAPACITY = 1024
+# Fraction of tombstoned rows that triggers compaction
+COMPACT_RATIO = 0.25
+# Scores computed at once by a batched search, bounding its memory to 4 bytes each
+MAX_SCORES = 1 << 24
+
+
+def normalize(vectors: npt.ArrayLike) -> Matrix:
+    """Return `vectors` as a 2-D float32 array of unit rows; zero rows stay zero."""
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k(scores: Matrix, k: int) -> tuple[npt.NDArray[np.intp], Matrix]:
+    """Return the columns of the `k` highest scores of each row, best first, and those scores."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((len(scores), 0), dtype=np.intp), np.empty((len(scores), 0), dtype=np.float32)
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-best, axis=1)
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(best, order, axis=1)
+
+
+class SearchIndex(Protocol):
+    """Cosine-similarity index over string ids, exact or approximate."""
+
+    dimensions: int
+
+    def __len__(self) -> int:
+        """Return the number of live vectors."""
+        ...
+
+    def add(self, ids: Sequence[str], vectors: npt.ArrayLike) -> None:
+        """Insert vectors under `ids`, replacing the vectors of ids already present."""
+        ...
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove the vectors of `ids` and return how many were present."""
+        ...
+
+    def search(self, query: npt.ArrayLike, k: int = 4) -> list[tuple[str, float]]:
+        """Return the ids and cosine similarities of the `k` vectors most similar to `query`, best first."""
+        ...
+
+    def search_batch(self, queries: npt.ArrayLike, k: int = 4) -> list[list[tuple[str, float]]]:
+        """Return the `k` most similar vectors to each of `queries`, as `search` does."""
+        ...
+
+
+class VectorIndex:
+    """Exact cosine-similarity index over string ids."""
+
+    def __init__(
+        self, dimensions: int, *, capacity: int = INITIAL_CAPACITY, compact_ratio: float = COMPACT_RATIO
+    ) -> None:
+        """Index vectors of `dimensions` floats, compacting once `compact_ratio` of the rows are deleted."""
+        self.dimensions = dimensions
+        self.compact_ratio = compact_ratio
+        self.capacity = max(capacity, 1)
+        self._vectors: Matrix = np.zeros((self.capacity, dimensions), dtype=np.float32)
+        self._alive = np.zeros(len(self._vectors), dtype=np.bool_)
+        # Id of each used row, and the row of each live id
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(cls, ids: list[str], vectors: Matrix) -> "VectorIndex":
+        """Wrap unit `vectors` stored under distinct `ids` without copying them, e.g. a read-only memory map.
+
+        Writes never modify `vectors`: adding copies them into a new matrix, deleting only tombstones rows.
+        """
+        index = cls(vectors.shape[1], capacity=1)
+        index._vectors = vectors
+        index._alive = np.ones(len(vectors), dtype=np.bool_)
+        index._ids = ids
+        index._rows = {id_: row for row, id_ in enumerate(ids)}
+        return index
+
+    def export(self) -> tuple[list[str], Matrix]:
+        """Return the live ids and their unit vectors, in the same order."""
+        with self._lock:
+            used = len(self._ids)
+            if used == len(self._rows):
+                return list(self._ids), self._vectors[:used]
+            keep = np.flatnonzero(self._alive[:used])
+            return [self._ids[row] for row in keep], self._vectors[keep]
+
+    def __len__(self) -> int:
+        """Return the number of live vectors."""
+        return len(self._rows)
+
+    @property
+    def deleted(self) -> int:
+        """Tombstoned rows awaiting compaction."""
+        return len(self._ids) - len(self._rows)
+
+    def add(self, ids: Sequence[str], vectors: npt.ArrayLike) -> None:
+        """Insert vectors under `ids`, replacing the vectors of ids already present."""
+        matrix = normalize(vectors)
+        if matrix.shape != (len(ids), self.dimensions):
+            message = f"Expected {len(ids)} vectors of {self.dimensions} dimensions, got shape {matrix.shape}"
+            raise ValueError(message)
+        # Only the last vector of an id repeated in `ids` is kept.
+        latest = {id_: position for position, id_ in enumerate(ids)}
+        positions = list(latest.values())
+        with self._lock:
+            self._tombstone(latest)
+            start = len(self._ids)
+            self._reserve(start + len(positions))
+            end = start + len(positions)
+            self._vectors[start:end] = matrix[positions]
+            self._alive[start:end] = True
+            self._ids.extend(latest)
+            self._rows.update(zip(latest, range(start, end), strict=True))
+            self._maybe_compact()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove the vectors of `ids` and return how many were present."""
+        with self._lock:
+            removed = self._tombstone(ids)
+            self._maybe_compact()
+        return removed
+
+    def _tombstone(self, ids: Iterable[str]) -> int:
+        rows = [row for id_ in ids if (row := self._rows.pop(id_, None)) is not None]
+        self._alive[rows] = False
+        return len(rows)
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= len(self._vectors):
+            return
+        capacity = max(rows, 2 * len(self._vectors))
+        vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        vectors[: len(self._ids)] = self._vectors[: len(self._ids)]
+        alive = np.zeros(capacity, dtype=np.bool_)
+        alive[: len(self._ids)] = self._alive[: len(self._ids)]
+        # Searches in progress keep the old arrays.
+        self._vectors, self._alive = vectors, alive
+
+    def _maybe_compact(self) -> None:
+        if self._ids and self.deleted > self.compact_ratio * len(self._ids):
+            self._compact()
+
+    def compact(self) -> None:
+        """Drop tombstoned rows from the matrix."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[: len(self._ids)])
+        capacity = max(self.capacity, 2 * len(keep))
+        vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        vectors[: len(keep)] = self._vectors[keep]
+        alive = np.zeros(capacity, dtype=np.bool_)
+        alive[: len(keep)] = True
+        ids = [self._ids[row] for row in keep]
+        self._vectors, self._alive, self._ids = vectors, alive, ids
+        self._rows = {id_: row for row, id_ in enumerate(ids)}
+
+    def search(self, query: npt.ArrayLike, k: int = 4) -> list[tuple[str, float]]:
+        """Return the ids and cosine similarities of the `k` vectors most similar to `query`, best first."""
+        return self.search_batch(query, k)[0]
+
+    def search_batch(self, queries: npt.ArrayLike, k: int = 4) -> list[list[tuple[str, float]]]:
+        """Return the `k` most similar vectors to each of `queries`, as `search` does."""
+        matrix = normalize(queries)
+        with self._lock:
+            used = len(self._ids)
+            vectors, alive, ids = self._vectors[:used], self._alive[:used], self._ids
+            any_deleted = used > len(self._rows)
+        results: list[list[tuple[str, float]]] = []
+        block = max(1, MAX_SCORES // max(used, 1))
+        for first in range(0, len(matrix), block):
+            scores = matrix[first : first + block] @ vectors.T
+            if any_deleted:
+                scores[:, ~alive] = -np.inf
+            columns, best = top_k(scores, k)
+            results.extend(
+                [(ids[column], float(score)) for column, score in zip(row, row_scores, strict=True) if score > -np.inf]
+                for row, row_scores in zip(columns.tolist(), best.tolist(), strict=True)
+            )
+        return results
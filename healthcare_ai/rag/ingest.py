@@ -0,0 +1,150 @@
+"""
+Streaming document ingestion.
+
+Splits text files into overlapping chunks for embedding without ever holding a whole file: files are read in
+fixed-size blocks and chunks are yielded as soon as they are complete, so a multi-GB corpus is indexed in memory
+bounded by the block and chunk sizes. Like LangChain's recursive character splitter, a chunk ends at the last
+paragraph break that fits, else at a line break, a sentence or a word, and only mid-word when there is none; the
+overlap with the previous chunk starts at a word.
+
+Run `python -m healthcare_ai.rag.ingest sample_data.txt --chunk-size 500 --chunk-overlap 100` to print the chunks
+of files as JSON lines.
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Defaults of the README's RAG pipeline
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Characters read from a file at a time
+BLOCK_CHARS = 1 << 16
+# Where a chunk may end, most preferred first
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+# The first character of a word
+_WORD_START = re.compile(r"(?<=\s)\S")
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A piece of a document, as embedded and retrieved."""
+
+    text: str
+    # File the chunk was read from, its position among the file's chunks, and its character offset in the file
+    source: str
+    index: int
+    start: int
+
+
+def read_blocks(path: Path, *, encoding: str = "utf-8", block_chars: int = BLOCK_CHARS) -> Iterator[str]:
+    """Yield the text of a file in blocks of at most `block_chars` characters."""
+    with path.open(encoding=encoding, newline="") as file:
+        while block := file.read(block_chars):
+            yield block
+
+
+def _end(text: str, earliest: int, limit: int) -> int:
+    """Return where a chunk of `text` ends: after the best separator between `earliest` and `limit`."""
+    for separator in SEPARATORS:
+        position = text.rfind(separator, earliest, limit - len(separator) + 1)
+        if position != -1:
+            return position + len(separator)
+    return limit
+
+
+def split_text(
+    blocks: Iterable[str],
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> Iterator[tuple[int, str]]:
+    """Split streamed text into chunks of at most `chunk_size` characters, overlapping by about `chunk_overlap`.
+
+    Yields `(offset, text)` pairs, the offset counting characters from the start of the stream. Chunks are
+    stripped of surrounding whitespace; whitespace-only chunks are skipped.
+    """
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        message = f"Need 0 <= chunk_overlap < chunk_size, got {chunk_overlap} and {chunk_size}"
+        raise ValueError(message)
+    # Text not yet chunked, which starts at `offset` in the stream, and how much of it the last chunk covered
+    buffer = ""
+    offset = 0
+    covered = 0
+    # A chunk ends no earlier than this far into it, so the next one starts after it.
+    shortest = max(chunk_size // 2, chunk_overlap + 1)
+    for block in blocks:
+        buffer += block
+        start = 0
+        # Wait for one more character than a chunk, which may be the separator the chunk ends on.
+        while len(buffer) - start > chunk_size:
+            end = _end(buffer, start + shortest, start + chunk_size)
+            if chunk := _chunk(buffer, start, end, offset):
+                yield chunk
+            covered = end
+            start = _overlap_start(buffer, end - chunk_overlap, end)
+        buffer = buffer[start:]
+        offset += start
+        covered -= start
+    if buffer[max(covered, 0) :].strip() and (chunk := _chunk(buffer, 0, len(buffer), offset)):
+        yield chunk
+
+
+def _overlap_start(text: str, earliest: int, end: int) -> int:
+    """Return where the chunk after one ending at `end` starts: at the first word from `earliest` on."""
+    word = _WORD_START.search(text, earliest, end)
+    return end if word is None else word.start()
+
+
+def _chunk(text: str, start: int, end: int, offset: int) -> tuple[int, str] | None:
+    raw = text[start:end]
+    stripped = raw.strip()
+    if not stripped:
+        return None
+    return offset + start + len(raw) - len(raw.lstrip()), stripped
+
+
+def ingest_file(
+    path: Path,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    encoding: str = "utf-8",
+) -> Iterator[Chunk]:
+    """Yield the chunks of a text file as they are read."""
+    pieces = split_text(read_blocks(path, encoding=encoding), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for index, (start, text) in enumerate(pieces):
+        yield Chunk(text, str(path), index, start)
+
+
+def ingest(
+    paths: Iterable[Path],
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    encoding: str = "utf-8",
+) -> Iterator[Chunk]:
+    """Yield the chunks of text files one file after another; directories contribute their `*.txt` files."""
+    for path in paths:
+        files = sorted(path.rglob("*.txt")) if path.is_dir() else [path]
+        for file in files:
+            yield from ingest_file(file, chunk_size=chunk_size, chunk_overlap=chunk_overlap, encoding=encoding)
+
+
+def main() -> None:
+    """Print the chunks of the given files as JSON lines."""
+    parser = argparse.ArgumentParser(description="Split text files into chunks for embedding.")
+    parser.add_argument("paths", nargs="+", type=Path, help="text files, or directories of *.txt files")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="characters per chunk at most")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="characters shared by neighbours")
+    args = parser.parse_args()
+    for chunk in ingest(args.paths, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap):
+        sys.stdout.write(json.dumps(asdict(chunk)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Persistent vector index with zero-copy loading.
+
+Workers restart often, and re-embedding or reading an index into memory on each start is slow. `save_index`
+writes a `VectorIndex` to a single versioned file that `IndexFile.open` maps with `numpy.memmap` instead of
+reading: startup only decodes the id table, and the vectors are paged in from the page cache on first use, shared
+by every worker process on the node that maps the same file.
+
+Layout, little-endian, each section starting on a 64-byte boundary:
+
+1. header: magic, format version, dimensions, vector count, and the offsets of the sections below
+2. vectors: a `count x dimensions` float32 matrix of unit rows
+3. ids: the ids in row order, UTF-8, separated by NUL bytes
+4. metadata: `count + 1` uint64 offsets into a blob of per-vector JSON objects, for example the chunk each
+   vector was embedded from
+
+Files are written to a temporary name and renamed into place, so a worker never maps a partly written index.
+"""
+
+import json
+import os
+import struct
+import tempfile
+from collections.abc import Callable, Mapping
+from functools import cached_property
+from pathlib import Path
+from typing import IO, Any, Self
+
+import numpy as np
+import numpy.typing as npt
+
+from healthcare_ai.rag.index import Matrix, VectorIndex
+
+MAGIC = b"HCAIVEC\0"
+FORMAT_VERSION = 1
+# Magic, version, dimensions, count, offset and size of the ids, and offsets of the metadata offsets and blob
+_HEADER = struct.Struct("<8sIIQQQQQ")
+_ALIGNMENT = 64
+
+
+def _pad(file: IO[bytes]) -> int:
+    """Pad `file` to the next section boundary and return its position."""
+    position = file.tell()
+    padding = -position % _ALIGNMENT
+    file.write(b"\0" * padding)
+    return position + padding
+
+
+def save_index(
+    index: VectorIndex,
+    path: Path,
+    *,
+    metadata: Mapping[str, dict[str, Any]] | Callable[[str], dict[str, Any] | None] | None = None,
+) -> None:
+    """Write the live vectors of `index` to `path`, with each id's metadata from a mapping or function."""
+    ids, vectors = index.export()
+    if any("\0" in id_ for id_ in ids):
+        message = "Index ids must not contain NUL characters"
+        raise ValueError(message)
+    lookup = metadata.get if isinstance(metadata, Mapping) else metadata
+    blobs = [b"" if lookup is None or (value := lookup(id_)) is None else json.dumps(value).encode() for id_ in ids]
+    offsets = np.zeros(len(ids) + 1, dtype="<u8")
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as file:
+        try:
+            file.write(b"\0" * _HEADER.size)
+            _pad(file)
+            file.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+            ids_offset = _pad(file)
+            ids_size = file.write("\0".join(ids).encode())
+            offsets_offset = _pad(file)
+            file.write(offsets.tobytes())
+            blob_offset = _pad(file)
+            file.writelines(blobs)
+            # The header comes first, but is only complete once the sections are written.
+            file.seek(0)
+            file.write(
+                _HEADER.pack(
+                    MAGIC,
+                    FORMAT_VERSION,
+                    index.dimensions,
+                    len(ids),
+                    ids_offset,
+                    ids_size,
+                    offsets_offset,
+                    blob_offset,
+                )
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            Path(file.name).unlink(missing_ok=True)
+            raise
+    Path(file.name).replace(path)
+
+
+class IndexFile:
+    """A saved index mapped into memory."""
+
+    def __init__(self, path: Path, buffer: npt.NDArray[np.uint8]) -> None:
+        """Read the header and map the sections of a file mapped as `buffer`; use `open`."""
+        if len(buffer) < _HEADER.size:
+            message = f"{path} is too short to be a vector index"
+            raise ValueError(message)
+        magic, version, dimensions, count, ids_offset, ids_size, offsets_offset, blob_offset = _HEADER.unpack(
+            buffer[: _HEADER.size].tobytes()
+        )
+        if magic != MAGIC:
+            message = f"{path} is not a vector index"
+            raise ValueError(message)
+        if version != FORMAT_VERSION:
+            message = f"{path} has index format version {version}, this code reads version {FORMAT_VERSION}"
+            raise ValueError(message)
+        self.path = path
+        self.version: int = version
+        self.dimensions: int = dimensions
+        self.vectors: Matrix = (
+            buffer[_ALIGNMENT : _ALIGNMENT + 4 * count * dimensions].view("<f4").reshape(count, dimensions)
+        )
+        self.ids: list[str] = buffer[ids_offset : ids_offset + ids_size].tobytes().decode().split("\0") if count else []
+        self._offsets = buffer[offsets_offset : offsets_offset + 8 * (count + 1)].view("<u8")
+        self._blob = buffer[blob_offset:]
+
+    @classmethod
+    def open(cls, path: Path) -> Self:
+        """Map the index file at `path` read-only."""
+        return cls(path, np.memmap(path, dtype=np.uint8, mode="r"))
+
+    def __len__(self) -> int:
+        """Return the number of vectors."""
+        return len(self.ids)
+
+    @cached_property
+    def _rows(self) -> dict[str, int]:
+        return {id_: row for row, id_ in enumerate(self.ids)}
+
+    def metadata(self, id_: str) -> dict[str, Any] | None:
+        """Return the metadata saved for `id_`, if any."""
+        if (row := self._rows.get(id_)) is None:
+            return None
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._blob[start:end].tobytes()) if end > start else None
+
+    def index(self) -> VectorIndex:
+        """Return a searchable index over the mapped vectors, without copying them."""
+        return VectorIndex.from_arrays(list(self.ids), self.vectors)
+
+
+def load_index(path: Path) -> VectorIndex:
+    """Open the index saved at `path`, mapping its vectors rather than reading them."""
+    return IndexFile.open(path).index()
@@ -0,0 +1,136 @@
+"""
+Incremental streaming of the structured response.
+
+The agent answers with a `ResponseFormat` tool call, whose arguments the model streams as fragments of JSON, so
+the parsed response would otherwise only exist once the whole answer has been generated. The parser reads the
+fragments as they arrive: the text of incremental fields such as `punny_response` is passed on as it grows, and
+every field is reported once its value is complete, which is how `weather_conditions` reaches clients.
+
+Only the first structured response of a turn is parsed. A retried or hedged model call can start another one; the
+final response, taken from the agent's state, is authoritative.
+"""
+
+import json
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, cast
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.utils.json import parse_partial_json
+
+from healthcare_ai.response import ResponseFormat
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+    from healthcare_ai.app import Agent
+    from healthcare_ai.tools import Context
+
+# Fields whose text is streamed as it is generated; the others are sent once complete
+INCREMENTAL_FIELDS = ("punny_response",)
+
+
+@dataclass(frozen=True)
+class FieldEvent:
+    """Progress of one field of the structured response."""
+
+    field: str
+    # New text of an incremental field, or the whole value once the field is complete
+    value: Any
+    done: bool
+
+
+class ResponseStreamParser:
+    """Parse a structured response tool call from the message chunks of a streaming model."""
+
+    def __init__(self, name: str = ResponseFormat.__name__, *, incremental: Iterable[str] = INCREMENTAL_FIELDS) -> None:
+        """Parse calls of the tool `name`, streaming the text of the `incremental` fields."""
+        self.name = name
+        self.incremental = frozenset(incremental)
+        # The tool call being parsed, by message id and chunk index, and its arguments so far
+        self._call: tuple[str | None, int | None] | None = None
+        self._names: dict[tuple[str | None, int | None], str] = {}
+        self._arguments = ""
+        self._sent: dict[str, str] = {}
+        self._done: set[str] = set()
+
+    def _accepts(self, message: AIMessageChunk, index: int | None, name: str | None) -> bool:
+        """Return whether a chunk of tool call `index` belongs to the response being parsed."""
+        key = (message.id, index)
+        if name:
+            self._names[key] = name
+        if self._call is None and self._names.get(key) == self.name:
+            self._call = key
+        return key == self._call
+
+    def feed(self, message: AIMessageChunk) -> list[FieldEvent]:
+        """Add a message chunk and return the field events it completes."""
+        grew = False
+        for chunk in message.tool_call_chunks:
+            if self._accepts(message, chunk.get("index"), chunk.get("name")) and chunk.get("args"):
+                self._arguments += chunk["args"] or ""
+                grew = True
+        return self._events() if grew else []
+
+    def _events(self) -> list[FieldEvent]:
+        parsed = parse_partial_json(self._arguments)
+        if not isinstance(parsed, dict):
+            return []
+        fields = cast("dict[str, Any]", parsed)
+        finished = self._finished()
+        names = list(fields)
+        events: list[FieldEvent] = []
+        for position, field in enumerate(names):
+            if field in self._done:
+                continue
+            value = fields[field]
+            if field in self.incremental and isinstance(value, str):
+                sent = self._sent.get(field, "")
+                # A fragment ending inside an escape sequence can parse shorter; wait for the rest.
+                if value.startswith(sent) and len(value) > len(sent):
+                    events.append(FieldEvent(field, value[len(sent) :], done=False))
+                    self._sent[field] = value
+            # A field is complete once a later one has started, or the arguments are.
+            if finished or position < len(names) - 1:
+                self._done.add(field)
+                events.append(FieldEvent(field, value, done=True))
+        return events
+
+    def _finished(self) -> bool:
+        if not self._arguments.rstrip().endswith("}"):
+            return False
+        try:
+            json.loads(self._arguments)
+        except ValueError:
+            return False
+        return True
+
+
+async def astream_response(
+    agent: "Agent",
+    agent_input: dict[str, Any],
+    config: "RunnableConfig",
+    context: "Context",
+) -> AsyncIterator[tuple[str, Any]]:
+    """Run one turn and yield `(event, data)` pairs as the response is generated.
+
+    Events are `token` for plain text, `delta` with new text of an incremental field, `field` with a complete
+    field, and finally `response` with the whole structured response.
+    """
+    parser = ResponseStreamParser()
+    async for mode, chunk in agent.astream(
+        agent_input, config=config, context=context, stream_mode=["messages", "updates"]
+    ):
+        if mode == "messages":
+            message, _ = chunk
+            if isinstance(message, AIMessageChunk):
+                for event in parser.feed(message):
+                    data = {"field": event.field, "value": event.value}
+                    yield ("field", data) if event.done else ("delta", data)
+            if isinstance(message, AIMessage) and message.text:
+                yield "token", message.text
+        else:
+            updates = cast("dict[str, dict[str, Any] | None]", chunk)
+            for update in updates.values():
+                if update and (structured_response := update.get("structured_response")) is not None:
+                    yield "response", asdict(structured_response)
@@ -0,0 +1,210 @@
+"""
+Model routing for the healthcare AI assistant.
+
+Most turns do not need the large model: a short "thank you!" is answered as well, faster and cheaper, by a
+smaller one. The router picks a model for every model call from a few rules, in order:
+
+1. latency budget: when less of the turn's budget remains than the large model usually takes, use the small one
+2. tool use: turns that already called tools, or whose message suggests they will, use the large model
+3. message length: long messages use the large model, short ones the small model
+
+When the routed model times out or fails transiently, the call is retried once on the fallback model. The router
+sits outside the model call policy, so with a fallback model the routed call gets a deadline of its own,
+`routed_timeout`, shorter than the policy's total: the fallback then starts once the routed model has had that
+long, instead of after every retry. Every decision is counted by route and rule so the thresholds can be tuned
+against cost and latency.
+"""
+
+import re
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Annotated, Any, NotRequired
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult, PrivateStateAttr
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, ToolMessage
+from langgraph.channels.untracked_value import UntrackedValue
+from langgraph.runtime import Runtime
+
+from healthcare_ai.config import build_model, get_model, get_settings
+from healthcare_ai.model_policy import call_deadline, is_retryable
+
+SMALL = "small"
+LARGE = "large"
+# Weight of the newest call in each model's moving average latency
+LATENCY_SMOOTHING = 0.2
+
+
+class RouterState(AgentState[Any]):
+    """Agent state with the start time of the current turn, which is neither checkpointed nor returned."""
+
+    turn_started_at: NotRequired[Annotated[float, UntrackedValue, PrivateStateAttr]]
+
+
+@dataclass
+class RoutingStats:
+    """Counters of the router's decisions."""
+
+    # Model calls per route, and per route and rule that decided it
+    routes: dict[str, int] = field(default_factory=dict[str, int])
+    reasons: dict[tuple[str, str], int] = field(default_factory=dict[tuple[str, str], int])
+    # Calls retried on the fallback model, and how many of those failed too
+    fallbacks: int = 0
+    fallback_failures: int = 0
+    # Moving average seconds per call of each route
+    latency: dict[str, float] = field(default_factory=dict[str, float])
+
+
+def _current_turn(messages: list[AnyMessage]) -> list[AnyMessage]:
+    """Return the messages from the latest user message on."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index:]
+    return messages
+
+
+class ModelRouterMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Send each model call to the small or the large model, falling back to a secondary model on failure."""
+
+    state_schema = RouterState
+
+    def __init__(  # noqa: PLR0913 - each rule has its own threshold
+        self,
+        large: BaseChatModel,
+        *,
+        small: BaseChatModel | None = None,
+        fallback: BaseChatModel | None = None,
+        small_max_chars: int = 200,
+        tool_keywords: Iterable[str] = (),
+        latency_budget: float | None = None,
+        routed_timeout: float | None = None,
+        should_fall_back: Callable[[BaseException], bool] = is_retryable,
+    ) -> None:
+        """Route between `large` and `small`; without `small` every call goes to `large`.
+
+        With a `fallback` model, the routed model gets at most `routed_timeout` seconds, retries included, before
+        the call falls back; `None` leaves it the policy's total deadline.
+        """
+        super().__init__()
+        self.models = {LARGE: large} if small is None else {LARGE: large, SMALL: small}
+        self.fallback = fallback
+        self.small_max_chars = small_max_chars
+        self.tool_keywords = frozenset(keyword.lower() for keyword in tool_keywords)
+        self.latency_budget = latency_budget
+        self.routed_timeout = routed_timeout if fallback is not None else None
+        self.should_fall_back = should_fall_back
+        self.stats = RoutingStats()
+        self._lock = threading.Lock()
+
+    def before_agent(self, state: AgentState[Any], runtime: Runtime[Any]) -> dict[str, Any] | None:  # noqa: ARG002
+        """Start the turn's latency budget."""
+        return {"turn_started_at": time.monotonic()}
+
+    def route(self, request: ModelRequest) -> tuple[str, str]:
+        """Return the route for a model call and the rule that chose it."""
+        if SMALL not in self.models:
+            return LARGE, "no small model"
+        if self.latency_budget is not None and (started := request.state.get("turn_started_at")) is not None:
+            remaining = self.latency_budget - (time.monotonic() - started)
+            with self._lock:
+                large_latency = self.stats.latency.get(LARGE)
+            if large_latency is not None and remaining < large_latency:
+                return SMALL, "latency budget"
+        turn = _current_turn(request.messages)
+        if any(isinstance(message, ToolMessage) for message in turn):
+            return LARGE, "tools used"
+        text = turn[0].text if turn else ""
+        if self.tool_keywords.intersection(re.findall(r"[a-z']+", text.lower())):
+            return LARGE, "tools likely"
+        if len(text) > self.small_max_chars:
+            return LARGE, "long message"
+        return SMALL, "short message"
+
+    def _decided(self, route: str, reason: str) -> None:
+        with self._lock:
+            self.stats.routes[route] = self.stats.routes.get(route, 0) + 1
+            self.stats.reasons[route, reason] = self.stats.reasons.get((route, reason), 0) + 1
+
+    def _observe(self, route: str, seconds: float) -> None:
+        with self._lock:
+            previous = self.stats.latency.get(route)
+            self.stats.latency[route] = (
+                seconds if previous is None else previous + LATENCY_SMOOTHING * (seconds - previous)
+            )
+
+    def _falling_back(self, error: Exception) -> BaseChatModel:
+        """Return the fallback model for a failed call, or re-raise `error` if there is none to try."""
+        if self.fallback is None or not self.should_fall_back(error):
+            raise error
+        with self._lock:
+            self.stats.fallbacks += 1
+        return self.fallback
+
+    def _fallback_failed(self) -> None:
+        with self._lock:
+            self.stats.fallback_failures += 1
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Call the routed model, then the fallback model if it fails."""
+        route, reason = self.route(request)
+        self._decided(route, reason)
+        start = time.monotonic()
+        try:
+            with call_deadline(self.routed_timeout):
+                response = handler(request.override(model=self.models[route]))
+        except Exception as error:  # noqa: BLE001 - classified by `should_fall_back`
+            fallback = self._falling_back(error)
+            try:
+                return handler(request.override(model=fallback))
+            except Exception:
+                self._fallback_failed()
+                raise
+        self._observe(route, time.monotonic() - start)
+        return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Call the routed model, then the fallback model if it fails."""
+        route, reason = self.route(request)
+        self._decided(route, reason)
+        start = time.monotonic()
+        try:
+            with call_deadline(self.routed_timeout):
+                response = await handler(request.override(model=self.models[route]))
+        except Exception as error:  # noqa: BLE001 - classified by `should_fall_back`
+            fallback = self._falling_back(error)
+            try:
+                return await handler(request.override(model=fallback))
+            except Exception:
+                self._fallback_failed()
+                raise
+        self._observe(route, time.monotonic() - start)
+        return response
+
+
+@cache
+def get_router() -> ModelRouterMiddleware | None:
+    """Return the process-wide model router, or `None` when no small or fallback model is configured."""
+    settings = get_settings()
+    if not settings.small_model and not settings.fallback_model:
+        return None
+    return ModelRouterMiddleware(
+        get_model(),
+        small=build_model(settings.small_model) if settings.small_model else None,
+        fallback=build_model(settings.fallback_model) if settings.fallback_model else None,
+        small_max_chars=settings.route_small_max_chars,
+        tool_keywords=filter(None, (keyword.strip() for keyword in settings.route_tool_keywords.split(","))),
+        latency_budget=settings.route_latency_budget or None,
+        routed_timeout=settings.route_timeout or None,
+    )
@@ -0,0 +1,143 @@
+"""
+HTTP serving layer for the healthcare AI assistant.
+
+Exposes the agent over an async FastAPI app so that many conversations can share one worker without blocking the
+event loop on model I/O. Run it with `fastapi run healthcare_ai/server.py`.
+"""
+
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel
+from starlette.types import Receive, Scope, Send
+
+from healthcare_ai.admission import AdmissionController, AdmissionRejectedError, get_admission
+from healthcare_ai.app import get_agent
+from healthcare_ai.http_pool import get_http_pool
+from healthcare_ai.metrics import get_metrics
+from healthcare_ai.response import ResponseFormat
+from healthcare_ai.response_stream import astream_response
+from healthcare_ai.tools import Context
+
+
+class AgentRequest(BaseModel):
+    """A single user turn in a conversation."""
+
+    # The user's message
+    message: str
+    # Identifies the conversation, turns with the same `thread_id` share memory
+    thread_id: str
+    # Passed to the tools as `Context.user_id`
+    user_id: str
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Build the agent before the first request is accepted, and close pooled connections on shutdown."""
+    get_agent()
+    yield
+    await get_http_pool().aclose()
+
+
+app = FastAPI(title="Healthcare AI assistant", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """Count each request and time it until its response starts, which for `/stream` is the first event."""
+    if (metrics := get_metrics()) is None:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    except Exception as error:
+        metrics.inc("errors_total", stage="http", type=type(error).__name__)
+        raise
+    finally:
+        # The route's template rather than the raw path, so unknown paths do not add label values.
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "other")
+        metrics.inc("http_requests_total", endpoint=endpoint, status=str(status))
+        metrics.observe("http_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+    return response
+
+
+@app.exception_handler(AdmissionRejectedError)
+async def reject(_: Request, error: AdmissionRejectedError) -> Response:
+    """Answer a turn that was not admitted with 429 and when to retry."""
+    return JSONResponse(
+        {"detail": str(error), "reason": error.reason},
+        status_code=429,
+        headers={"Retry-After": error.retry_after_header},
+    )
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response that ends its turn's admission however the stream ends, including a disconnect."""
+
+    def __init__(self, content: AsyncIterator[str], admission: AdmissionController) -> None:
+        super().__init__(content, media_type="text/event-stream")
+        self._admission = admission
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._admission.release()
+
+
+def _agent_args(request: AgentRequest) -> tuple[dict[str, Any], RunnableConfig, Context]:
+    """Translate a request into agent input, config and runtime context."""
+    agent_input = {"messages": [{"role": "user", "content": request.message}]}
+    config: RunnableConfig = {"configurable": {"thread_id": request.thread_id}}
+    return agent_input, config, Context(user_id=request.user_id)
+
+
+def _sse(event: str, data: object) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/invoke")
+async def invoke(request: AgentRequest) -> ResponseFormat:
+    """Run one conversation turn and return the structured response."""
+    agent_input, config, context = _agent_args(request)
+    if (admission := get_admission()) is None:
+        response = await get_agent().ainvoke(agent_input, config=config, context=context)
+    else:
+        async with admission.admit(request.user_id):
+            response = await get_agent().ainvoke(agent_input, config=config, context=context)
+    return response["structured_response"]
+
+
+async def _stream_events(request: AgentRequest) -> AsyncIterator[str]:
+    """Yield the turn as server-sent events: response fields as they are generated, then the whole response."""
+    agent_input, config, context = _agent_args(request)
+    async for event, data in astream_response(get_agent(), agent_input, config, context):
+        yield _sse(event, data)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Serve the metrics in Prometheus' text format."""
+    if (recorded := get_metrics()) is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(recorded.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/stream")
+async def stream(request: AgentRequest) -> StreamingResponse:
+    """Run one conversation turn and stream it back as server-sent events."""
+    if (admission := get_admission()) is None:
+        return StreamingResponse(_stream_events(request), media_type="text/event-stream")
+    # Admitted before the response starts, so a rejection can still be answered with 429.
+    await admission.acquire(request.user_id)
+    return _AdmittedStreamingResponse(_stream_events(request), admission)
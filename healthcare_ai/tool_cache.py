@@ -0,0 +1,159 @@
+"""
+Result cache for tools.
+
+Tools are re-executed on every agent step even when the same lookup ran seconds earlier, and real backends are
+slow and rate-limited. `ttl_cache` memoizes a tool's result for a fixed time, keyed on its normalized arguments or
+a custom key, and lets concurrent identical calls share a single backend request. It works on both sync and async
+implementations, which can share one cache by name.
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, cast
+
+
+class ToolResultCache[R]:
+    """Time-bounded LRU store with single-flight computation of missing entries."""
+
+    def __init__(self, name: str, ttl: float, max_entries: int) -> None:
+        """Keep at most `max_entries` results for `ttl` seconds each."""
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Calls answered from the cache, by waiting on an identical call in flight, or by the backend
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, R]] = OrderedDict()
+        self._in_flight: dict[Hashable, Future[R]] = {}
+        # Tasks can only be awaited on their own loop, so each loop computes a missing entry separately.
+        self._tasks: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task[R]] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key: Hashable) -> tuple[bool, R | None]:
+        """Look up a fresh entry; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def _store(self, key: Hashable, value: R) -> None:
+        """Store a result; call with the lock held."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], R]) -> R:
+        """Return the fresh result stored under `key`, computing it at most once across threads."""
+        with self._lock:
+            found, value = self._fresh(key)
+            if found:
+                return cast("R", value)
+            future = self._in_flight.get(key)
+            owner = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            self._store(key, value)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[R]]) -> R:
+        """Return the fresh result stored under `key`, computing it at most once per event loop."""
+        slot = (asyncio.get_running_loop(), key)
+        with self._lock:
+            found, value = self._fresh(key)
+            if found:
+                return cast("R", value)
+            task = self._tasks.get(slot)
+            if task is None:
+                task = self._tasks[slot] = asyncio.ensure_future(compute())
+                task.add_done_callback(lambda done: self._finish(slot, done))
+                self.misses += 1
+            else:
+                self.shared += 1
+        # Shielded so that a cancelled caller does not cancel the call other callers are waiting on.
+        return await asyncio.shield(task)
+
+    def _finish(self, slot: tuple[asyncio.AbstractEventLoop, Hashable], task: asyncio.Task[R]) -> None:
+        with self._lock:
+            if not task.cancelled() and task.exception() is None:
+                self._store(slot[1], task.result())
+            del self._tasks[slot]
+
+
+# Function name -> cache, so the caches can be inspected and reported on
+TOOL_CACHES: dict[str, ToolResultCache[Any]] = {}
+
+
+def _normalize(value: object) -> Hashable:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, Hashable):
+        return value
+    return repr(value)
+
+
+def _arguments_key(*args: object, **kwargs: object) -> Hashable:
+    """Key on the arguments, with strings normalized for whitespace and case."""
+    return tuple(_normalize(arg) for arg in args), tuple(sorted((k, _normalize(v)) for k, v in kwargs.items()))
+
+
+def ttl_cache[**P, R](
+    ttl: float,
+    *,
+    key: Callable[P, Hashable] | None = None,
+    max_entries: int = 1024,
+    name: str | None = None,
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Cache a function's results for `ttl` seconds.
+
+    Apply it below `@tool`, or to the functions given to `StructuredTool.from_function`, so the tool keeps the
+    function's signature. Results are keyed on the normalized arguments unless `key` is given, which receives the
+    same arguments as the function. Functions decorated with the same `name` share one cache, which is how a
+    tool's sync and async implementations see each other's results.
+    """
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        cache_name = name or func.__name__
+        cache: ToolResultCache[Any] = TOOL_CACHES.setdefault(cache_name, ToolResultCache(cache_name, ttl, max_entries))
+        key_of: Callable[..., Hashable] = key or _arguments_key
+
+        if inspect.iscoroutinefunction(func):
+            coroutine = cast("Callable[P, Awaitable[Any]]", func)
+
+            @wraps(func)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> object:
+                return await cache.aget_or_compute(key_of(*args, **kwargs), lambda: coroutine(*args, **kwargs))
+
+            return cast("Callable[P, R]", async_wrapper)
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            return cache.get_or_compute(key_of(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
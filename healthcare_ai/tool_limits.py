@@ -0,0 +1,105 @@
+"""
+Concurrency limits for tool calls.
+
+When the model asks for several tools in one step, the agent runs them concurrently: the sync agent in a thread
+pool and the async agent as tasks on the event loop. Across many conversations that can put an unbounded number
+of requests on one backend, so each tool gets a process-wide cap on the calls in flight: its own limit if one is
+configured, the default otherwise. Calls beyond the cap wait for a slot rather than fail.
+"""
+
+import asyncio
+import threading
+import weakref
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.tools.tool_node import ToolCallRequest
+from langchain_core.messages import ToolMessage
+from langgraph.types import Command
+
+from healthcare_ai.config import get_settings
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Cap the calls of each tool that run at once across all conversations in the process."""
+
+    def __init__(self, *, default: int | None = None, limits: Mapping[str, int | None] | None = None) -> None:
+        """Allow `limits[name]` concurrent calls of each named tool and `default` of any other; `None` is no limit."""
+        super().__init__()
+        self.default = default
+        self.limits = dict(limits or {})
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        # asyncio semaphores belong to one event loop, so each loop gets its own set.
+        self._async_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def limit(self, name: str) -> int | None:
+        """Return the number of concurrent calls allowed for the tool `name`."""
+        return self.limits.get(name, self.default)
+
+    def semaphore(self, name: str) -> threading.BoundedSemaphore | None:
+        """Return the semaphore guarding sync calls of `name`, or `None` if it is unlimited."""
+        if (limit := self.limit(name)) is None:
+            return None
+        with self._lock:
+            if name not in self._semaphores:
+                self._semaphores[name] = threading.BoundedSemaphore(limit)
+            return self._semaphores[name]
+
+    def async_semaphore(self, name: str) -> asyncio.Semaphore | None:
+        """Return the semaphore guarding async calls of `name` on the running loop, or `None` if it is unlimited."""
+        if (limit := self.limit(name)) is None:
+            return None
+        with self._lock:
+            semaphores = self._async_semaphores.setdefault(asyncio.get_running_loop(), {})
+            if name not in semaphores:
+                semaphores[name] = asyncio.Semaphore(limit)
+            return semaphores[name]
+
+    def wrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], ToolMessage | Command[Any]],
+    ) -> ToolMessage | Command[Any]:
+        """Run the tool once a slot for it is free."""
+        semaphore = self.semaphore(request.tool_call["name"])
+        if semaphore is None:
+            return handler(request)
+        with semaphore:
+            return handler(request)
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command[Any]]],
+    ) -> ToolMessage | Command[Any]:
+        """Run the tool once a slot for it is free."""
+        semaphore = self.async_semaphore(request.tool_call["name"])
+        if semaphore is None:
+            return await handler(request)
+        async with semaphore:
+            return await handler(request)
+
+
+def parse_limits(spec: str) -> dict[str, int | None]:
+    """Parse per-tool limits written as "name=limit,name=limit"; a limit of 0 is no limit."""
+    limits: dict[str, int | None] = {}
+    for item in filter(None, (item.strip() for item in spec.split(","))):
+        name, _, limit = item.partition("=")
+        if not name.strip() or not limit.strip().isdigit():
+            msg = f"Tool concurrency limit {item!r} is not of the form name=limit"
+            raise ValueError(msg)
+        limits[name.strip()] = int(limit) or None
+    return limits
+
+
+def get_tool_limits() -> list[AgentMiddleware[AgentState[Any], Any]]:
+    """Build the configured tool concurrency limits; limits of 0 in the settings disable them."""
+    settings = get_settings()
+    limits = parse_limits(settings.tool_concurrency_limits)
+    if not settings.tool_concurrency and not any(limits.values()):
+        return []
+    return [ToolConcurrencyMiddleware(default=settings.tool_concurrency or None, limits=limits)]
@@ -0,0 +1,49 @@
+"""
+Precompiled tool schemas.
+
+Binding tools to the model converts each one to a JSON schema, and for a `StructuredTool` that means building a
+pydantic model of its arguments: about a millisecond per tool on every model call. The schemas never change once
+the agent is built, so they are converted once and the model is handed the finished dictionaries, which it binds
+almost for free. The tools themselves are still executed by the agent's tool node.
+"""
+
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import ModelCallResult
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class ToolSchemaMiddleware(AgentMiddleware[AgentState[Any], Any]):
+    """Hand the model schemas converted once at build time instead of converting the tools on every call."""
+
+    def __init__(self, tools: Sequence[BaseTool]) -> None:
+        """Convert the schemas of `tools`; other tools in a request are passed through unchanged."""
+        super().__init__()
+        self.schemas = {tool.name: (tool, convert_to_openai_tool(tool)) for tool in tools}
+
+    def precompile(self, request: ModelRequest) -> ModelRequest:
+        """Return the request with each known tool replaced by its schema."""
+        tools: list[BaseTool | dict[str, Any]] = []
+        for tool in request.tools:
+            known = self.schemas.get(tool.name) if isinstance(tool, BaseTool) else None
+            tools.append(known[1] if known is not None and known[0] is tool else tool)
+        return request.override(tools=tools)
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelCallResult:
+        """Call the model with precompiled tool schemas."""
+        return handler(self.precompile(request))
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelCallResult:
+        """Call the model with precompiled tool schemas."""
+        return await handler(self.precompile(request))
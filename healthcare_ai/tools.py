@@ -6,19 +6,51 @@ context and also interact with agent memory.
 
 It should be well-documented: their name, description, and argument names become part of the model's prompt.
 LangChain's @tool decorator adds metadata and enables runtime injection via the ToolRuntime parameter.
+
+Each tool has one implementation, served to sync and async agents alike with one result cache between them. The
+implementations do not block, so the async agent runs them on the event loop rather than in worker threads, and
+the calls of one model step run concurrently.
 """
 
+from collections.abc import Callable, Hashable
 from dataclasses import dataclass
+from functools import wraps
+
+from langchain.tools import ToolRuntime
+from langchain_core.tools import StructuredTool
+
+from healthcare_ai.tool_cache import ttl_cache
+
+# How long tool results stay fresh, in seconds
+WEATHER_TTL = 300.0
+LOCATION_TTL = 3600.0
+
+
+def _cached_tool[**P](
+    func: Callable[P, str], name: str, *, ttl: float, key: Callable[P, Hashable] | None = None
+) -> StructuredTool:
+    """Build the tool `name` from a non-blocking implementation, caching its results for `ttl` seconds.
+
+    The tool's coroutine calls `func` directly on the event loop, and both paths share one cache. An implementation
+    that blocks on I/O needs an async version of its own instead.
+    """
 
-from langchain.tools import ToolRuntime, tool
+    @wraps(func)
+    async def coroutine(*args: P.args, **kwargs: P.kwargs) -> str:
+        return func(*args, **kwargs)
 
+    cache = ttl_cache(ttl, key=key, name=name)
+    return StructuredTool.from_function(cache(func), coroutine=cache(coroutine), name=name)
 
-@tool
-def get_weather_for_location(city: str) -> str:
+
+def _get_weather_for_location(city: str) -> str:
     """Get weather for a given city."""
     return f"It's always sunny in {city}!"
 
 
+get_weather_for_location = _cached_tool(_get_weather_for_location, "get_weather_for_location", ttl=WEATHER_TTL)
+
+
 @dataclass
 class Context:
     """Custom runtime context schema."""
@@ -26,8 +58,15 @@ class Context:
     user_id: str
 
 
-@tool
-def get_user_location(runtime: ToolRuntime[Context, str]) -> str:
+def _user_key(runtime: ToolRuntime[Context, str]) -> str:
+    """Cache user lookups per user rather than per runtime object."""
+    return runtime.context.user_id
+
+
+def _get_user_location(runtime: ToolRuntime[Context, str]) -> str:
     """Retrieve user information based on user ID."""
     user_id = runtime.context.user_id
     return "Florida" if user_id == "1" else "SF"
+
+
+get_user_location = _cached_tool(_get_user_location, "get_user_location", ttl=LOCATION_TTL, key=_user_key)
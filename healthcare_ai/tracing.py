@@ -0,0 +1,453 @@
+"""
+Tracing for agent turns.
+
+Shows where the time of an `agent.invoke` goes. Each turn is a trace of OpenTelemetry-style spans: one for the
+turn, one per graph step, model call (with its token counts) and tool call, and one per checkpoint read or write.
+Finished spans go to an exporter; the in-memory one keeps them for tests and benchmarks, the console one writes
+them as JSON lines, and anything with an `export(span)` method can forward them elsewhere.
+
+Steps, model calls and tool calls are traced by a callback handler, which `get_agent` attaches when tracing or
+metrics are enabled and which can also be passed in a single call's config. Checkpoint operations are traced by
+wrapping the checkpointer in `TracingSaver`; it records into every trace active in the calling context, one per
+handler tracing the turn, and costs one context variable lookup when there is none.
+"""
+
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import cache
+from typing import Any, Protocol, TextIO
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+from healthcare_ai.config import get_settings
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    # Wall clock nanoseconds, as OpenTelemetry records them
+    start_time_ns: int
+    end_time_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict[str, Any])
+    # "ok" or "error", and the error's type and message
+    status: str = "ok"
+    error: str | None = None
+
+    @property
+    def seconds(self) -> float:
+        """Duration of the span, 0 while it is open."""
+        return 0.0 if self.end_time_ns is None else (self.end_time_ns - self.start_time_ns) / 1e9
+
+
+class SpanExporter(Protocol):
+    """Receives every span when it ends."""
+
+    def export(self, span: Span) -> None:
+        """Handle a finished span; called on the traced code's thread, so it should be quick."""
+        ...
+
+
+class InMemorySpanExporter:
+    """Keep the most recent finished spans in memory."""
+
+    def __init__(self, max_spans: int = 10_000) -> None:
+        """Keep up to `max_spans` spans, dropping the oldest."""
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        """Keep `span`."""
+        self._spans.append(span)
+
+    @property
+    def spans(self) -> list[Span]:
+        """The kept spans, in the order they ended."""
+        return list(self._spans)
+
+    def clear(self) -> None:
+        """Drop the kept spans."""
+        self._spans.clear()
+
+
+class ConsoleSpanExporter:
+    """Write each finished span as a line of JSON."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        """Write to `stream`, standard error by default."""
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Write `span`."""
+        line = json.dumps({**asdict(span), "seconds": span.seconds}, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+
+
+class Tracer:
+    """Start and end spans and hand the finished ones to exporters."""
+
+    def __init__(self, *exporters: SpanExporter) -> None:
+        """Export finished spans to each of `exporters`."""
+        self.exporters = exporters
+        self.handler = TracingCallbackHandler(self)
+
+    def start(self, name: str, *, parent: Span | None, span_id: str | None = None, **attributes: Any) -> Span:  # noqa: ANN401
+        """Open a span, in the trace of `parent` or in a new trace."""
+        span_id = span_id or uuid.uuid4().hex
+        return Span(
+            name=name,
+            trace_id=span_id if parent is None else parent.trace_id,
+            span_id=span_id,
+            parent_id=None if parent is None else parent.span_id,
+            start_time_ns=time.time_ns(),
+            attributes=attributes,
+        )
+
+    def end(self, span: Span, error: BaseException | None = None, **attributes: Any) -> None:  # noqa: ANN401
+        """Close `span` and export it."""
+        span.end_time_ns = time.time_ns()
+        span.attributes.update(attributes)
+        if error is not None:
+            span.status = "error"
+            span.error = f"{type(error).__name__}: {error}"
+        for exporter in self.exporters:
+            exporter.export(span)
+
+
+# The tracer and turn span of each handler tracing the turn running in the current context
+_active: ContextVar[tuple[tuple[Tracer, Span], ...]] = ContextVar("active_traces", default=())
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Trace agent runs from their callbacks: the turn, its graph steps, model calls and tool calls."""
+
+    # Called in the traced code's own context, which is where checkpoint operations find the turn.
+    run_inline = True
+
+    def __init__(self, tracer: Tracer) -> None:
+        """Record into `tracer`."""
+        self.tracer = tracer
+        # Open spans by run id; runs that are not traced themselves map to their nearest traced ancestor. Each
+        # operation is a single dictionary access, which is atomic, so concurrent runs need no lock.
+        self._spans: dict[UUID, Span] = {}
+        self._ancestors: dict[UUID, Span | None] = {}
+
+    def _parent(self, parent_run_id: UUID | None) -> Span | None:
+        if parent_run_id is None:
+            return None
+        return self._spans.get(parent_run_id) or self._ancestors.get(parent_run_id)
+
+    def _open(self, run_id: UUID, name: str, parent_run_id: UUID | None, **attributes: Any) -> Span:  # noqa: ANN401
+        span = self.tracer.start(name, parent=self._parent(parent_run_id), span_id=run_id.hex, **attributes)
+        self._spans[run_id] = span
+        return span
+
+    def _close(self, run_id: UUID, error: BaseException | None = None, **attributes: Any) -> None:  # noqa: ANN401
+        if (span := self._spans.pop(run_id, None)) is not None:
+            self.tracer.end(span, error, **attributes)
+            if span.parent_id is None:
+                # Only this handler's turn ends; other handlers may still be tracing it.
+                _active.set(tuple(active for active in _active.get() if active[1] is not span))
+        else:
+            self._ancestors.pop(run_id, None)
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,  # noqa: ARG002
+        inputs: dict[str, Any],  # noqa: ARG002
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Open the turn's span for the outermost run and a step span for each graph node."""
+        metadata = metadata or {}
+        name = kwargs.get("name")
+        parent = self._parent(parent_run_id)
+        if parent is None:
+            span = self._open(run_id, "agent", parent_run_id, thread_id=metadata.get("thread_id"))
+            _active.set((*_active.get(), (self.tracer, span)))
+        elif name is not None and name == metadata.get("langgraph_node"):
+            self._open(run_id, "step", parent_run_id, node=name, step=metadata.get("langgraph_step"))
+        else:
+            self._ancestors[run_id] = parent
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Close the run's span."""
+        self._close(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Close the run's span with its error."""
+        self._close(run_id, error)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any] | None,
+        messages: list[list[BaseMessage]],  # noqa: ARG002
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Open a model call span."""
+        model = (metadata or {}).get("ls_model_name") or kwargs.get("name") or (serialized or {}).get("name")
+        self._open(run_id, "model", parent_run_id, model=model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Close a model call span with its token counts."""
+        usage: dict[str, Any] = {}
+        for generation in (generation for generations in response.generations for generation in generations):
+            message = getattr(generation, "message", None)
+            if message is not None and (metadata := getattr(message, "usage_metadata", None)) is not None:
+                details = metadata.get("input_token_details", {})
+                usage = {
+                    "input_tokens": metadata["input_tokens"],
+                    "output_tokens": metadata["output_tokens"],
+                    "cache_read_tokens": details.get("cache_read", 0),
+                }
+        self._close(run_id, **usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Close a model call span with its error."""
+        self._close(run_id, error)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any] | None,
+        input_str: str,  # noqa: ARG002
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Open a tool call span."""
+        self._open(run_id, "tool", parent_run_id, tool=kwargs.get("name") or (serialized or {}).get("name"))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Close a tool call span."""
+        self._close(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Close a tool call span with its error."""
+        self._close(run_id, error)
+
+
+class TracingSaver(BaseCheckpointSaver[str]):
+    """Checkpointer that traces the operations of another one in the active turn's trace."""
+
+    def __init__(self, saver: BaseCheckpointSaver[str]) -> None:
+        """Trace the operations of `saver`."""
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+
+    @property
+    def config_specs(self) -> list[Any]:
+        """The wrapped saver's configurable fields."""
+        return self.saver.config_specs
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        """Delegate version numbering to the wrapped saver."""
+        return self.saver.get_next_version(current, channel)
+
+    @staticmethod
+    def _start(operation: str, config: RunnableConfig) -> list[tuple[Tracer, Span]]:
+        if not (active := _active.get()):
+            return []
+        thread_id = config.get("configurable", {}).get("thread_id")
+        return [
+            (tracer, tracer.start(f"checkpoint.{operation}", parent=turn, thread_id=thread_id))
+            for tracer, turn in active
+        ]
+
+    @staticmethod
+    def _end(started: list[tuple[Tracer, Span]], error: BaseException | None = None) -> None:
+        for tracer, span in started:
+            tracer.end(span, error)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Read a checkpoint."""
+        started = self._start("get", config)
+        try:
+            result = self.saver.get_tuple(config)
+        except BaseException as error:
+            self._end(started, error)
+            raise
+        self._end(started)
+        return result
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002 - the base class's name
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints; listing is not traced."""
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Write a checkpoint."""
+        started = self._start("put", config)
+        try:
+            result = self.saver.put(config, checkpoint, metadata, new_versions)
+        except BaseException as error:
+            self._end(started, error)
+            raise
+        self._end(started)
+        return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Write a step's pending writes."""
+        started = self._start("put_writes", config)
+        try:
+            self.saver.put_writes(config, writes, task_id, task_path)
+        except BaseException as error:
+            self._end(started, error)
+            raise
+        self._end(started)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete a thread."""
+        self.saver.delete_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Read a checkpoint."""
+        started = self._start("get", config)
+        try:
+            result = await self.saver.aget_tuple(config)
+        except BaseException as error:
+            self._end(started, error)
+            raise
+        self._end(started)
+        return result
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002 - the base class's name
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List checkpoints; listing is not traced."""
+        async for item in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Write a checkpoint."""
+        started = self._start("put", config)
+        try:
+            result = await self.saver.aput(config, checkpoint, metadata, new_versions)
+        except BaseException as error:
+            self._end(started, error)
+            raise
+        self._end(started)
+        return result
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Write a step's pending writes."""
+        started = self._start("put_writes", config)
+        try:
+            await self.saver.aput_writes(config, writes, task_id, task_path)
+        except BaseException as error:
+            self._end(started, error)
+            raise
+        self._end(started)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete a thread."""
+        await self.saver.adelete_thread(thread_id)
+
+
+def timing_record(spans: Sequence[Span]) -> dict[str, Any]:
+    """Summarize the spans of one turn: seconds per stage, call counts and tokens.
+
+    `overhead_seconds` is the turn's time outside model calls, tool calls and checkpoint operations, which is
+    mostly the graph itself.
+    """
+    turn = next((span for span in spans if span.name == "agent"), None)
+    by_stage: dict[str, list[Span]] = {"model": [], "tool": [], "checkpoint": [], "step": []}
+    for span in spans:
+        stage = span.name.split(".", 1)[0]
+        if stage in by_stage:
+            by_stage[stage].append(span)
+    record: dict[str, Any] = {
+        "trace_id": None if turn is None else turn.trace_id,
+        "thread_id": None if turn is None else turn.attributes.get("thread_id"),
+        "status": "error" if any(span.status == "error" for span in spans) else "ok",
+        "seconds": 0.0 if turn is None else turn.seconds,
+        "steps": len(by_stage["step"]),
+    }
+    for stage in ("model", "tool", "checkpoint"):
+        record[f"{stage}_calls"] = len(by_stage[stage])
+        record[f"{stage}_seconds"] = sum(span.seconds for span in by_stage[stage])
+    record["overhead_seconds"] = record["seconds"] - sum(
+        record[f"{s}_seconds"] for s in ("model", "tool", "checkpoint")
+    )
+    for tokens in ("input_tokens", "output_tokens", "cache_read_tokens"):
+        record[tokens] = sum(span.attributes.get(tokens, 0) for span in by_stage["model"])
+    return record
+
+
+@cache
+def get_span_exporter() -> SpanExporter | None:
+    """Return the process-wide span exporter, or `None` when tracing is disabled."""
+    settings = get_settings()
+    if not settings.tracing:
+        return None
+    if settings.tracing == "console":
+        return ConsoleSpanExporter()
+    if settings.tracing == "memory":
+        return InMemorySpanExporter()
+    msg = f"Unknown span exporter {settings.tracing!r}, expected 'console' or 'memory'"
+    raise ValueError(msg)
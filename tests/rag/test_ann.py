@@ -0,0 +1,106 @@
+"""Tests of the IVF index's training as it is filled a batch at a time."""
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from healthcare_ai.rag.ann import RETRAIN_GROWTH, IVFIndex, default_lists
+from healthcare_ai.rag.index import VectorIndex
+
+DIMENSIONS = 16
+TRAIN_SIZE = 512
+BATCH = 32
+
+
+def _vectors(size: int, seed: int = 0) -> npt.NDArray[np.float32]:
+    return np.random.default_rng(seed).standard_normal((size, DIMENSIONS), dtype=np.float32)
+
+
+def _fill(index: IVFIndex | VectorIndex, vectors: npt.NDArray[np.float32], first: int = 0) -> None:
+    for start in range(first, len(vectors), BATCH):
+        stop = min(start + BATCH, len(vectors))
+        index.add([str(row) for row in range(start, stop)], vectors[start:stop])
+
+
+def _ids(found: list[tuple[str, float]]) -> list[str]:
+    return [id_ for id_, _ in found]
+
+
+def test_single_vector_is_searched_exactly_until_there_are_enough_to_train() -> None:
+    index = IVFIndex(DIMENSIONS, train_size=TRAIN_SIZE)
+    index.add(["only"], np.ones((1, DIMENSIONS)))
+    assert not index.trained
+    assert len(index) == 1
+    assert _ids(index.search(np.ones(DIMENSIONS), 4)) == ["only"]
+
+
+def test_trains_on_the_first_train_size_vectors_of_a_stream() -> None:
+    vectors = _vectors(TRAIN_SIZE)
+    index, exact = IVFIndex(DIMENSIONS, train_size=TRAIN_SIZE), VectorIndex(DIMENSIONS)
+    _fill(index, vectors[: TRAIN_SIZE - 1])
+    _fill(exact, vectors)
+    assert not index.trained
+    assert index.lists is None
+    queries = _vectors(10, seed=1)
+    index.add([str(TRAIN_SIZE - 1)], vectors[-1:])
+    assert index.trained
+    # Sized for all the vectors seen, not for the first batch of 32 or a single vector
+    assert index.lists == default_lists(TRAIN_SIZE)
+    assert len(index) == TRAIN_SIZE
+    # Probing every list is exact search, so every vector added before training is still found.
+    index.nprobe = default_lists(TRAIN_SIZE)
+    assert [_ids(found) for found in index.search_batch(queries, 5)] == [
+        _ids(found) for found in exact.search_batch(queries, 5)
+    ]
+
+
+def test_retrains_as_the_index_grows() -> None:
+    size = RETRAIN_GROWTH * TRAIN_SIZE
+    vectors = _vectors(size)
+    index, exact = IVFIndex(DIMENSIONS, train_size=TRAIN_SIZE), VectorIndex(DIMENSIONS)
+    _fill(index, vectors[: size - 1])
+    assert index.lists == default_lists(TRAIN_SIZE)
+    index.add([str(size - 1)], vectors[-1:])
+    assert index.lists == default_lists(size)
+    assert len(index) == size
+    _fill(exact, vectors)
+    index.nprobe = default_lists(size)
+    queries = _vectors(10, seed=1)
+    assert [_ids(found) for found in index.search_batch(queries, 5)] == [
+        _ids(found) for found in exact.search_batch(queries, 5)
+    ]
+
+
+def test_fixed_number_of_lists_is_kept() -> None:
+    index = IVFIndex(DIMENSIONS, lists=8, train_size=TRAIN_SIZE)
+    _fill(index, _vectors(RETRAIN_GROWTH * TRAIN_SIZE + BATCH))
+    assert index.lists == 8
+
+
+def test_explicit_training_keeps_vectors_added_before() -> None:
+    vectors = _vectors(100)
+    index = IVFIndex(DIMENSIONS, lists=4, train_size=TRAIN_SIZE)
+    _fill(index, vectors)
+    index.train(_vectors(1_000, seed=2))
+    assert index.trained
+    assert len(index) == 100
+    index.nprobe = 4
+    assert _ids(index.search(vectors[7], 1)) == ["7"]
+
+
+def test_delete_before_and_after_training() -> None:
+    vectors = _vectors(TRAIN_SIZE)
+    index = IVFIndex(DIMENSIONS, train_size=TRAIN_SIZE)
+    _fill(index, vectors[:100])
+    assert index.delete(["0", "1", "missing"]) == 2
+    _fill(index, vectors, first=100)
+    assert not index.trained
+    index.add(["0", "1"], vectors[:2])
+    assert index.trained
+    assert index.delete(["0", "2"]) == 2
+    assert len(index) == TRAIN_SIZE - 2
+
+
+def test_training_needs_vectors() -> None:
+    with pytest.raises(ValueError, match="without vectors"):
+        IVFIndex(DIMENSIONS).train(np.empty((0, DIMENSIONS)))
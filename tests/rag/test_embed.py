@@ -0,0 +1,129 @@
+"""Tests of the batched embedding stage and its on-disk cache."""
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from healthcare_ai.rag.embed import EmbeddingCache, EmbeddingStage, HashingEmbeddings
+from healthcare_ai.rag.ingest import Chunk
+
+WORDS = ["sun", "rain", "fog", "wind", "snow", "hail", "heat", "frost"]
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    """Hashing embedder that records the batches it is sent and how many run at once."""
+
+    def __init__(self, *, latency: float = 0.0) -> None:
+        """Embed into 16 dimensions, taking `latency` seconds a call."""
+        super().__init__(16, latency=latency)
+        self.batches: list[list[str]] = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Record the batch, then embed it."""
+        with self._lock:
+            self.batches.append(texts)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            return super().embed_documents(texts)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Record the batch, then embed it."""
+        self.batches.append(texts)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            return await super().aembed_documents(texts)
+        finally:
+            self.running -= 1
+
+
+def _chunks(count: int) -> list[Chunk]:
+    return [
+        Chunk(text=f"{WORDS[i % len(WORDS)]} {WORDS[i // len(WORDS) % len(WORDS)]} {i}", source="doc", index=i, start=i)
+        for i in range(count)
+    ]
+
+
+def _aembed(stage: EmbeddingStage, chunks: list[Chunk]) -> list[tuple[Chunk, list[float]]]:
+    async def collect() -> list[tuple[Chunk, list[float]]]:
+        return [pair async for pair in stage.aembed(chunks)]
+
+    return asyncio.run(collect())
+
+
+def test_cache_round_trips_vectors_at_float32(tmp_path: Path) -> None:
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    keys = [EmbeddingCache.key("model", str(i)) for i in range(1_200)]
+    cache.put_many({key: [i / 3, -1.0] for i, key in enumerate(keys)})
+
+    # More keys than SQLite binds in one statement, some of them absent.
+    found = cache.get_many([*keys, EmbeddingCache.key("model", "absent")])
+
+    assert found.keys() == set(keys)
+    assert found[keys[1]] == pytest.approx([1 / 3, -1.0], rel=1e-7)
+    assert found[keys[1]] != [1 / 3, -1.0]
+    assert cache.get_many([]) == {}
+
+
+def test_keys_depend_on_model_and_text() -> None:
+    assert EmbeddingCache.key("a", "sun") == EmbeddingCache.key("a", "sun")
+    assert EmbeddingCache.key("a", "sun") != EmbeddingCache.key("b", "sun")
+    assert EmbeddingCache.key("a", "sun") != EmbeddingCache.key("a", "rain")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_yields_vectors_in_order_in_concurrent_batches(*, use_async: bool) -> None:
+    embeddings = CountingEmbeddings(latency=0.02)
+    stage = EmbeddingStage(embeddings, batch_size=4, max_concurrency=3)
+    chunks = _chunks(30)
+
+    pairs = _aembed(stage, chunks) if use_async else list(stage.embed(chunks))
+
+    assert [chunk for chunk, _ in pairs] == chunks
+    expected = HashingEmbeddings(16).embed_documents([chunk.text for chunk in chunks])
+    for (_, vector), exact in zip(pairs, expected, strict=True):
+        assert vector == pytest.approx(exact, rel=1e-6)
+    assert [len(batch) for batch in embeddings.batches] == [4] * 7 + [2]
+    assert 1 < embeddings.peak <= 3
+    assert (stage.stats.chunks, stage.stats.embedded, stage.stats.calls) == (30, 30, 8)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_cached_vectors_equal_fresh_ones(tmp_path: Path, *, use_async: bool) -> None:
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    chunks = _chunks(10)
+
+    def run() -> tuple[CountingEmbeddings, EmbeddingStage, list[list[float]]]:
+        embeddings = CountingEmbeddings()
+        stage = EmbeddingStage(embeddings, cache=cache, batch_size=4)
+        pairs = _aembed(stage, chunks) if use_async else list(stage.embed(chunks))
+        return embeddings, stage, [vector for _, vector in pairs]
+
+    _, first, fresh = run()
+    embeddings, second, cached = run()
+
+    assert cached == fresh
+    assert embeddings.batches == []
+    assert (first.stats.cached, first.stats.embedded) == (0, 10)
+    assert (second.stats.cached, second.stats.embedded, second.stats.calls) == (10, 0, 0)
+
+
+def test_repeated_texts_are_embedded_once_per_batch() -> None:
+    embeddings = CountingEmbeddings()
+    stage = EmbeddingStage(embeddings, batch_size=8)
+    chunks = [Chunk(text="sun", source="doc", index=i, start=i) for i in range(6)]
+
+    vectors = [vector for _, vector in stage.embed(chunks)]
+
+    assert embeddings.batches == [["sun"]]
+    assert all(vector == vectors[0] for vector in vectors)
+    assert (stage.stats.chunks, stage.stats.embedded) == (6, 1)
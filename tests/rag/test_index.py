@@ -0,0 +1,139 @@
+"""Tests of the exact vector index against brute-force search."""
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from healthcare_ai.rag import index as index_module
+from healthcare_ai.rag.index import COMPACT_RATIO, Matrix, VectorIndex, normalize
+
+DIMENSIONS = 16
+
+
+def _vectors(size: int, seed: int = 0) -> npt.NDArray[np.float32]:
+    return np.random.default_rng(seed).standard_normal((size, DIMENSIONS), dtype=np.float32)
+
+
+def _index(vectors: npt.NDArray[np.float32], compact_ratio: float = COMPACT_RATIO) -> VectorIndex:
+    index = VectorIndex(DIMENSIONS, capacity=4, compact_ratio=compact_ratio)
+    index.add([f"doc-{row}" for row in range(len(vectors))], vectors)
+    return index
+
+
+def _brute_force(ids: list[str], vectors: npt.ArrayLike, query: npt.ArrayLike, k: int) -> list[tuple[str, float]]:
+    """Score the query against every vector and sort all the scores."""
+    scores = normalize(vectors) @ normalize(query)[0]
+    return sorted(zip(ids, scores.tolist(), strict=True), key=lambda pair: -pair[1])[:k]
+
+
+def _assert_same_results(found: list[tuple[str, float]], expected: list[tuple[str, float]]) -> None:
+    assert [id_ for id_, _ in found] == [id_ for id_, _ in expected]
+    np.testing.assert_allclose([score for _, score in found], [score for _, score in expected], rtol=1e-5)
+
+
+@pytest.mark.parametrize("k", [1, 5, 200, 300])
+def test_top_k_matches_brute_force(k: int) -> None:
+    vectors = _vectors(200)
+    index = _index(vectors)
+    ids = [f"doc-{row}" for row in range(200)]
+    for query in _vectors(10, seed=1):
+        _assert_same_results(index.search(query, k), _brute_force(ids, vectors, query, k))
+    assert len(index) == 200
+
+
+def test_rejects_vectors_of_the_wrong_shape() -> None:
+    index = VectorIndex(DIMENSIONS)
+    with pytest.raises(ValueError, match="Expected 2 vectors of 16 dimensions"):
+        index.add(["a", "b"], _vectors(3))
+
+
+def test_re_adding_an_id_replaces_its_vector() -> None:
+    vectors = _vectors(20)
+    index = _index(vectors, compact_ratio=1.0)
+    index.add(["doc-3", "doc-3"], [vectors[7], vectors[9]])
+
+    assert len(index) == 20
+    assert index.deleted == 1
+    # Only the last vector given for an id is kept.
+    found = index.search(vectors[9], 2)
+    assert {id_ for id_, _ in found} == {"doc-3", "doc-9"}
+    assert found[0][1] == pytest.approx(1.0)
+    # Its old vector is gone.
+    assert index.search(vectors[3], 1)[0][1] < 0.99
+
+
+def test_deleted_ids_are_excluded_from_results() -> None:
+    vectors = _vectors(40)
+    index = _index(vectors, compact_ratio=1.0)
+
+    assert index.delete(["doc-0", "doc-1", "missing"]) == 2
+    assert index.delete(["doc-0"]) == 0
+
+    assert len(index) == 38
+    assert index.deleted == 2
+    found = index.search(vectors[0], 40)
+    assert len(found) == 38
+    assert not {"doc-0", "doc-1"} & {id_ for id_, _ in found}
+    live = [f"doc-{row}" for row in range(2, 40)]
+    _assert_same_results(found, _brute_force(live, vectors[2:], vectors[0], 40))
+
+
+def test_deleting_enough_rows_compacts_the_matrix() -> None:
+    vectors = _vectors(40)
+    index = _index(vectors, compact_ratio=0.25)
+    ids = [f"doc-{row}" for row in range(40)]
+
+    index.delete(ids[:10])
+    assert index.deleted == 10
+    # Crossing the ratio drops every tombstoned row.
+    index.delete(ids[10:11])
+    assert index.deleted == 0
+    assert len(index) == 29
+
+    live_ids, live_vectors = index.export()
+    assert live_ids == ids[11:]
+    np.testing.assert_allclose(live_vectors, normalize(vectors[11:]))
+    _assert_same_results(index.search(vectors[20], 5), _brute_force(ids[11:], vectors[11:], vectors[20], 5))
+
+
+def test_compact_keeps_results() -> None:
+    vectors = _vectors(30)
+    index = _index(vectors, compact_ratio=1.0)
+    index.delete([f"doc-{row}" for row in range(0, 30, 3)])
+    queries = _vectors(5, seed=1)
+    before = index.search_batch(queries, 6)
+
+    index.compact()
+
+    assert index.deleted == 0
+    for found, expected in zip(index.search_batch(queries, 6), before, strict=True):
+        _assert_same_results(found, expected)
+
+
+def test_search_batch_splits_queries_into_blocks(monkeypatch: pytest.MonkeyPatch) -> None:
+    vectors = _vectors(50)
+    index = _index(vectors)
+    queries = _vectors(9, seed=1)
+    expected = index.search_batch(queries, 3)
+    blocks: list[int] = []
+
+    def top_k(scores: Matrix, k: int) -> tuple[npt.NDArray[np.intp], Matrix]:
+        blocks.append(len(scores))
+        return real_top_k(scores, k)
+
+    real_top_k = index_module.top_k
+    # Two queries' scores fit in a block.
+    monkeypatch.setattr(index_module, "MAX_SCORES", 100)
+    monkeypatch.setattr(index_module, "top_k", top_k)
+    found = index.search_batch(queries, 3)
+
+    assert blocks == [2, 2, 2, 2, 1]
+    assert len(found) == 9
+    for block_found, whole in zip(found, expected, strict=True):
+        _assert_same_results(block_found, whole)
+
+
+def test_empty_index_finds_nothing() -> None:
+    index = VectorIndex(DIMENSIONS)
+    assert index.search(np.ones(DIMENSIONS)) == []
+    assert index.search_batch(_vectors(3), 2) == [[], [], []]
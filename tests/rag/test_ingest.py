@@ -0,0 +1,91 @@
+"""Property-style tests of streaming chunking over randomly generated documents."""
+
+import random
+from collections.abc import Iterator
+from itertools import pairwise
+from pathlib import Path
+
+import pytest
+
+from healthcare_ai.rag.ingest import ingest_file, split_text
+
+SEEDS = range(20)
+WORDS = ["a", "to", "sun", "rain", "cloudy", "forecast", "humidity", "Boston."]
+
+
+def _document(seed: int, words: int = 2_000) -> str:
+    """Return random text of short words, with sentence, line and paragraph breaks."""
+    rng = random.Random(seed)  # noqa: S311 - reproducible test data
+    separators = [" "] * 12 + ["\n", "\n\n", "  ", " \t"]
+    return "".join(rng.choice(WORDS) + rng.choice(separators) for _ in range(words))
+
+
+def _blocks(text: str, size: int) -> Iterator[str]:
+    return (text[first : first + size] for first in range(0, len(text), size))
+
+
+def _split(text: str, size: int, chunk_size: int = 300, chunk_overlap: int = 60) -> list[tuple[int, str]]:
+    return list(split_text(_blocks(text, size), chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_chunks_are_slices_of_the_text(seed: int) -> None:
+    text = _document(seed)
+    chunks = _split(text, 97)
+    assert chunks
+    for start, chunk in chunks:
+        assert chunk == text[start : start + len(chunk)]
+        assert chunk == chunk.strip()
+        assert 0 < len(chunk) <= 300
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_consecutive_chunks_overlap_by_the_configured_amount(seed: int) -> None:
+    text = _document(seed)
+    chunks = _split(text, 97)
+    longest_word = max(map(len, WORDS))
+    for (start, chunk), (next_start, _) in pairwise(chunks):
+        overlap = start + len(chunk) - next_start
+        # The overlap starts at a word, and the previous chunk's trailing whitespace is stripped.
+        assert 60 - longest_word - 4 <= overlap <= 60
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_every_word_is_in_a_chunk(seed: int) -> None:
+    text = _document(seed)
+    covered = [False] * len(text)
+    for start, chunk in _split(text, 97):
+        covered[start : start + len(chunk)] = [True] * len(chunk)
+    assert all(covered[position] or character.isspace() for position, character in enumerate(text))
+
+
+@pytest.mark.parametrize("seed", SEEDS[:5])
+@pytest.mark.parametrize("block_size", [1, 2, 7, 299, 300, 301, 4096])
+def test_chunks_do_not_depend_on_where_blocks_end(seed: int, block_size: int) -> None:
+    text = _document(seed, words=500)
+    assert _split(text, block_size) == _split(text, len(text))
+
+
+def test_text_without_separators_is_cut_at_the_chunk_size() -> None:
+    text = "x" * 1_000
+    assert _split(text, 64, chunk_size=300, chunk_overlap=60) == [
+        (0, "x" * 300),
+        (300, "x" * 300),
+        (600, "x" * 300),
+        (900, "x" * 100),
+    ]
+
+
+def test_rejects_overlap_not_smaller_than_chunk() -> None:
+    with pytest.raises(ValueError, match="chunk_overlap < chunk_size"):
+        _split("text", 10, chunk_size=100, chunk_overlap=100)
+
+
+def test_ingest_file_numbers_chunks_and_reports_offsets(tmp_path: Path) -> None:
+    text = _document(0)
+    path = tmp_path / "notes.txt"
+    path.write_text(text, encoding="utf-8", newline="")
+    chunks = list(ingest_file(path, chunk_size=300, chunk_overlap=60))
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk.source == str(path) for chunk in chunks)
+    assert [(chunk.start, chunk.text) for chunk in chunks] == _split(text, len(text))
@@ -0,0 +1,114 @@
+"""Round-trip tests of the persistent vector index file."""
+
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from healthcare_ai.rag.index import VectorIndex
+from healthcare_ai.rag.storage import FORMAT_VERSION, IndexFile, load_index, save_index
+
+DIMENSIONS = 16
+
+
+def _index(size: int, seed: int = 0) -> VectorIndex:
+    index = VectorIndex(DIMENSIONS, capacity=4)
+    rng = np.random.default_rng(seed)
+    index.add([f"doc-{row}" for row in range(size)], rng.standard_normal((size, DIMENSIONS)))
+    return index
+
+
+def _assert_same_results(found: list[tuple[str, float]], expected: list[tuple[str, float]]) -> None:
+    # Scores of the same vectors can differ in the last bits when computed over a differently shaped matrix.
+    assert [id_ for id_, _ in found] == [id_ for id_, _ in expected]
+    np.testing.assert_allclose([score for _, score in found], [score for _, score in expected], rtol=1e-5)
+
+
+def test_save_then_load_returns_the_same_index(tmp_path: Path) -> None:
+    index = _index(100)
+    path = tmp_path / "nested" / "index.vec"
+    save_index(index, path, metadata=lambda id_: {"source": f"{id_}.txt"} if id_ != "doc-7" else None)
+    loaded = load_index(path)
+    ids, vectors = index.export()
+    loaded_ids, loaded_vectors = loaded.export()
+    assert loaded_ids == ids
+    np.testing.assert_array_equal(loaded_vectors, vectors)
+    query = np.ones(DIMENSIONS)
+    _assert_same_results(loaded.search(query, 10), index.search(query, 10))
+    mapped = IndexFile.open(path)
+    assert (len(mapped), mapped.dimensions, mapped.version) == (100, DIMENSIONS, FORMAT_VERSION)
+    assert mapped.metadata("doc-3") == {"source": "doc-3.txt"}
+    assert mapped.metadata("doc-7") is None
+    assert mapped.metadata("missing") is None
+
+
+def test_loaded_index_is_mapped_and_accepts_writes(tmp_path: Path) -> None:
+    path = tmp_path / "index.vec"
+    save_index(_index(10), path, metadata={"doc-1": {"page": 2}})
+    loaded = load_index(path)
+    loaded.delete(["doc-0"])
+    loaded.add(["new"], np.ones((1, DIMENSIONS)))
+    assert len(loaded) == 10
+    assert loaded.search(np.ones(DIMENSIONS), 1)[0][0] == "new"
+    # Writes do not reach the file.
+    assert len(load_index(path)) == 10
+    assert IndexFile.open(path).metadata("doc-1") == {"page": 2}
+
+
+def test_deleted_rows_are_not_saved(tmp_path: Path) -> None:
+    index = _index(100)
+    deleted = [f"doc-{row}" for row in range(0, 100, 10)]
+    index.delete(deleted)
+    # Fewer than the compaction ratio, so the rows are still tombstoned in the matrix.
+    assert index.deleted == len(deleted)
+    path = tmp_path / "index.vec"
+    save_index(index, path)
+    loaded = load_index(path)
+    assert len(loaded) == 90
+    assert loaded.deleted == 0
+    assert not set(deleted) & set(loaded.export()[0])
+    query = np.ones(DIMENSIONS)
+    _assert_same_results(loaded.search(query, 90), index.search(query, 90))
+
+
+def test_empty_index_round_trips(tmp_path: Path) -> None:
+    path = tmp_path / "index.vec"
+    save_index(VectorIndex(DIMENSIONS), path)
+    loaded = load_index(path)
+    assert len(loaded) == 0
+    assert loaded.search(np.ones(DIMENSIONS)) == []
+
+
+def test_rejects_bad_magic(tmp_path: Path) -> None:
+    path = tmp_path / "index.vec"
+    save_index(_index(3), path)
+    with path.open("r+b") as file:
+        file.write(b"NOTANIDX")
+    with pytest.raises(ValueError, match="is not a vector index"):
+        IndexFile.open(path)
+
+
+def test_rejects_unknown_version(tmp_path: Path) -> None:
+    path = tmp_path / "index.vec"
+    save_index(_index(3), path)
+    with path.open("r+b") as file:
+        file.seek(8)
+        file.write(struct.pack("<I", FORMAT_VERSION + 1))
+    with pytest.raises(ValueError, match=f"version {FORMAT_VERSION + 1}"):
+        load_index(path)
+
+
+def test_rejects_truncated_file(tmp_path: Path) -> None:
+    path = tmp_path / "index.vec"
+    path.write_bytes(b"HCAIVEC")
+    with pytest.raises(ValueError, match="too short"):
+        load_index(path)
+
+
+def test_rejects_ids_with_nul(tmp_path: Path) -> None:
+    index = VectorIndex(DIMENSIONS)
+    index.add(["bad\0id"], np.ones((1, DIMENSIONS)))
+    with pytest.raises(ValueError, match="NUL"):
+        save_index(index, tmp_path / "index.vec")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,155 @@
+"""Tests of admission control: the per-user token bucket, the bounded queue and release on disconnect."""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+from starlette.requests import ClientDisconnect
+from starlette.types import Message
+
+from healthcare_ai.admission import (
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    USER_RATE,
+    AdmissionController,
+    AdmissionRejectedError,
+    TokenBucket,
+)
+from healthcare_ai.server import _AdmittedStreamingResponse  # pyright: ignore[reportPrivateUsage]
+
+
+def test_token_bucket_allows_a_burst_then_refills_at_rate() -> None:
+    bucket = TokenBucket(rate=2, burst=3)
+    bucket.updated = 0.0
+    assert [bucket.take(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    # A quarter second refills half a token: half of one is still missing.
+    assert bucket.take(0.25) == pytest.approx(0.25)
+    assert bucket.take(0.5) == 0.0
+    # A long idle period refills only up to the burst.
+    assert [bucket.take(100.0) for _ in range(4)] == [0.0, 0.0, 0.0, pytest.approx(0.5)]
+
+
+def test_user_over_rate_is_rejected_with_retry_delay() -> None:
+    admission = AdmissionController(user_rate=1, user_burst=2)
+    admission.check_user("alice")
+    admission.check_user("alice")
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        admission.check_user("alice")
+    assert rejected.value.reason == USER_RATE
+    assert 0 < rejected.value.retry_after <= 1
+    assert rejected.value.retry_after_header == "1"
+    # Other users have buckets of their own.
+    admission.check_user("bob")
+    assert admission.stats.rejected == {USER_RATE: 1}
+
+
+def test_full_queue_rejects_at_once() -> None:
+    async def run() -> AdmissionController:
+        admission = AdmissionController(max_concurrent=1, max_queue=1)
+        await admission.acquire("a")
+        waiting = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+        assert admission.stats.queued == 1
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await admission.acquire("c")
+        assert rejected.value.reason == QUEUE_FULL
+        admission.release()
+        await waiting
+        return admission
+
+    stats = asyncio.run(run()).stats
+    assert (stats.admitted, stats.running, stats.queued, stats.peak_queued) == (2, 1, 0, 1)
+    assert stats.rejected == {QUEUE_FULL: 1}
+
+
+def test_queued_turn_times_out() -> None:
+    async def run() -> AdmissionController:
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        await admission.acquire("a")
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await admission.acquire("b")
+        assert rejected.value.reason == QUEUE_TIMEOUT
+        return admission
+
+    stats = asyncio.run(run()).stats
+    assert (stats.admitted, stats.running, stats.queued) == (1, 1, 0)
+    assert stats.rejected == {QUEUE_TIMEOUT: 1}
+
+
+def test_turns_rejected_by_the_queue_keep_their_user_tokens() -> None:
+    async def run() -> AdmissionController:
+        admission = AdmissionController(user_rate=0.001, user_burst=2, max_concurrent=1, queue_timeout=0.01)
+        await admission.acquire("a")
+        for max_queue, reason in [(0, QUEUE_FULL), (0, QUEUE_FULL), (1, QUEUE_TIMEOUT)]:
+            admission.max_queue = max_queue
+            with pytest.raises(AdmissionRejectedError) as rejected:
+                await admission.acquire("alice")
+            assert rejected.value.reason == reason
+        admission.release()
+        # Both of alice's tokens are left for turns that run.
+        await admission.acquire("alice")
+        admission.release()
+        await admission.acquire("alice")
+        admission.release()
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await admission.acquire("alice")
+        assert rejected.value.reason == USER_RATE
+        return admission
+
+    stats = asyncio.run(run()).stats
+    assert stats.admitted == 3
+    assert stats.rejected == {QUEUE_FULL: 2, QUEUE_TIMEOUT: 1, USER_RATE: 1}
+
+
+def test_refund_is_capped_at_the_burst() -> None:
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.refund()
+    assert bucket.tokens == 2
+    bucket.take(bucket.updated)
+    bucket.refund()
+    assert bucket.tokens == 2
+
+
+async def _events() -> AsyncIterator[str]:
+    """Yield two events, then wait forever as a turn still generating would."""
+    yield "event: token\ndata: {}\n\n"
+    await asyncio.sleep(0.01)
+    yield "event: token\ndata: {}\n\n"
+    await asyncio.Event().wait()
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+def test_stream_releases_its_slot_when_the_client_disconnects(spec_version: str) -> None:
+    async def run() -> AdmissionController:
+        admission = AdmissionController(max_concurrent=1, max_queue=0)
+        await admission.acquire("a")
+        sent: list[Message] = []
+        first_event = asyncio.Event()
+
+        async def send(message: Message) -> None:
+            if len(sent) == 2:
+                # Servers implementing ASGI 2.4 report a disconnect by failing the next send.
+                raise OSError
+            sent.append(message)
+            if message["type"] == "http.response.body":
+                first_event.set()
+
+        async def receive() -> Message:
+            await first_event.wait()
+            return {"type": "http.disconnect"}
+
+        response = _AdmittedStreamingResponse(_events(), admission)
+        scope = {"type": "http", "asgi": {"spec_version": spec_version}}
+        try:
+            await asyncio.wait_for(response(scope, receive, send), timeout=5)
+        except ClientDisconnect:
+            assert spec_version == "2.4"
+        assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+        # The slot is free again: with no queue, a turn would otherwise be rejected.
+        await admission.acquire("b")
+        return admission
+
+    stats = asyncio.run(run()).stats
+    assert (stats.admitted, stats.running) == (2, 1)
+    assert stats.rejected == {}
@@ -0,0 +1,106 @@
+"""Tests of reading batch input, answering prompts and resuming an interrupted batch."""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+from healthcare_ai.batch import BatchStats, read_items, run_batch
+from healthcare_ai.response import ResponseFormat
+
+if TYPE_CHECKING:
+    from healthcare_ai.app import Agent
+
+
+class StubAgent:
+    """Answers every prompt but "fail", for which it returns no structured response."""
+
+    def __init__(self) -> None:
+        """Start with no prompts answered."""
+        self.messages: list[str] = []
+
+    async def ainvoke(self, state: dict[str, Any], **_: object) -> dict[str, Any]:
+        message = state["messages"][0]["content"]
+        self.messages.append(message)
+        if message == "fail":
+            return {"messages": []}
+        return {"structured_response": ResponseFormat(punny_response=message, weather_conditions="sunny")}
+
+
+def _write(path: Path, *lines: str) -> Path:
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+    return path
+
+
+def _prompt(item_id: str, message: str) -> str:
+    return json.dumps({"id": item_id, "message": message})
+
+
+def _results(path: Path) -> dict[str, dict[str, Any]]:
+    return {record["id"]: record for record in map(json.loads, path.read_text(encoding="utf-8").splitlines())}
+
+
+def _run(agent: StubAgent, input_path: Path, output: Path) -> BatchStats:
+    return asyncio.run(run_batch(cast("Agent", agent), read_items(input_path), output, max_concurrency=2))
+
+
+def test_answers_every_prompt_and_records_failures(tmp_path: Path) -> None:
+    prompts = _write(tmp_path / "prompts.jsonl", _prompt("a", "hello"), "", _prompt("b", "fail"), _prompt("c", "hi"))
+    output = tmp_path / "results.jsonl"
+
+    stats = _run(StubAgent(), prompts, output)
+
+    assert stats == BatchStats(succeeded=2, failed=1, skipped=0)
+    results = _results(output)
+    assert results["a"]["status"] == "ok"
+    assert results["a"]["response"]["punny_response"] == "hello"
+    assert results["b"]["status"] == "error"
+    assert results["b"]["error"].startswith("KeyError")
+    assert all(record["seconds"] >= 0 for record in results.values())
+
+
+def test_invalid_input_lines_become_error_records(tmp_path: Path) -> None:
+    prompts = _write(
+        tmp_path / "prompts.jsonl",
+        _prompt("a", "hello"),
+        json.dumps({"id": "no-message"}),
+        "[1, 2]",
+        # A last line cut short by whatever wrote the file
+        '{"id": "c", "mess',
+    )
+    output = tmp_path / "results.jsonl"
+    agent = StubAgent()
+
+    stats = _run(agent, prompts, output)
+
+    assert stats == BatchStats(succeeded=1, failed=3, skipped=0)
+    assert agent.messages == ["hello"]
+    results = _results(output)
+    assert "'message'" in results["no-message"]["error"]
+    assert "not a JSON object" in results["3"]["error"]
+    assert "not valid JSON" in results["4"]["error"]
+
+
+def test_resume_skips_answered_prompts_and_retries_failed_ones(tmp_path: Path) -> None:
+    prompts = _write(tmp_path / "prompts.jsonl", *(_prompt(str(i), f"prompt {i}") for i in range(5)))
+    output = tmp_path / "results.jsonl"
+    # An earlier run answered 0 and 1, failed 2, and crashed while writing the result of 3.
+    earlier = [
+        {"id": "0", "status": "ok"},
+        {"id": "1", "status": "ok"},
+        {"id": "2", "status": "error", "error": "RuntimeError: boom"},
+    ]
+    output.write_text("".join(json.dumps(record) + "\n" for record in earlier) + '{"id": "3", "sta')
+    agent = StubAgent()
+
+    stats = _run(agent, prompts, output)
+
+    assert stats == BatchStats(succeeded=3, failed=0, skipped=2)
+    assert sorted(agent.messages) == ["prompt 2", "prompt 3", "prompt 4"]
+    # The cut-short line was terminated, so every new result is on a line of its own.
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert lines[3] == '{"id": "3", "sta'
+    assert [json.loads(line)["status"] for line in lines[4:]] == ["ok"] * 3
+
+    # Running again has nothing left to do.
+    assert _run(StubAgent(), prompts, output) == BatchStats(skipped=5)
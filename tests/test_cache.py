@@ -0,0 +1,251 @@
+"""Tests of the response cache tiers, request keys and the caching middleware."""
+
+import asyncio
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+
+from healthcare_ai.cache import (
+    CachedResponse,
+    MemoryCache,
+    ResponseCacheMiddleware,
+    SemanticCache,
+    SQLiteCache,
+    request_key,
+    with_fresh_ids,
+)
+from healthcare_ai.fake_model import FakeChatModel
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+    from langgraph.runtime import Runtime
+
+
+def _request(*messages: AnyMessage, system_prompt: str | None = None) -> ModelRequest:
+    return ModelRequest(
+        model=FakeChatModel(),
+        system_prompt=system_prompt,
+        messages=list(messages),
+        tool_choice=None,
+        tools=[],
+        response_format=None,
+        state={"messages": list(messages)},
+        runtime=cast("Runtime[Any]", None),
+    )
+
+
+def _response(text: str) -> ModelResponse:
+    return ModelResponse(result=[AIMessage(text, id="original")])
+
+
+class CountingModel:
+    """A model handler that answers with the number of times it was called."""
+
+    def __init__(self) -> None:
+        """Start with no calls."""
+        self.calls = 0
+
+    def __call__(self, _: ModelRequest) -> ModelResponse:
+        self.calls += 1
+        return _response(f"answer {self.calls}")
+
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        return self(request)
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embed a text as the count of each keyword in it, so texts sharing keywords are similar."""
+
+    KEYWORDS = ("weather", "sunny", "rain", "tomorrow")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(text.count(keyword)) for keyword in self.KEYWORDS]
+
+
+def _text(response: object) -> str:
+    assert isinstance(response, ModelResponse)
+    return response.result[0].text
+
+
+def test_request_key_ignores_whitespace_case_and_ids() -> None:
+    key = request_key(_request(HumanMessage("What is the weather?", id="a")))
+    assert request_key(_request(HumanMessage("  what is   the WEATHER?", id="b"))) == key
+    assert request_key(_request(HumanMessage("What is the weather?"), system_prompt="Be brief.")) != key
+    assert request_key(_request(HumanMessage("What is the rain?"))) != key
+
+
+def test_request_key_ignores_tool_call_ids() -> None:
+    def conversation(call_id: str) -> ModelRequest:
+        return _request(
+            HumanMessage("weather?"),
+            AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}, "id": call_id}]),
+            ToolMessage("sunny", name="get_weather", tool_call_id=call_id),
+        )
+
+    assert request_key(conversation("call_1")) == request_key(conversation("call_2"))
+
+
+def test_with_fresh_ids_renames_tool_calls_consistently() -> None:
+    cached = ModelResponse(
+        result=[
+            AIMessage("", id="ai", tool_calls=[{"name": "get_weather", "args": {}, "id": "call_1"}]),
+            ToolMessage("sunny", id="tool", tool_call_id="call_1"),
+        ]
+    )
+    first, second = with_fresh_ids(cached), with_fresh_ids(cached)
+
+    for fresh in (first, second):
+        ai, tool = fresh.result
+        assert isinstance(ai, AIMessage)
+        assert isinstance(tool, ToolMessage)
+        assert ai.id is None
+        assert tool.id is None
+        assert ai.tool_calls[0]["id"] not in {None, "call_1"}
+        assert tool.tool_call_id == ai.tool_calls[0]["id"]
+        assert ai.response_metadata["cache_hit"] is True
+    assert (
+        cast("AIMessage", first.result[0]).tool_calls[0]["id"]
+        != cast("AIMessage", second.result[0]).tool_calls[0]["id"]
+    )
+    # The cached response itself is untouched.
+    assert cast("AIMessage", cached.result[0]).tool_calls[0]["id"] == "call_1"
+
+
+def test_memory_tier_evicts_least_recently_used() -> None:
+    tier = MemoryCache(max_entries=2)
+    tier.put("a", CachedResponse(_response("a"), 1.0))
+    tier.put("b", CachedResponse(_response("b"), 1.0))
+    assert tier.get("a") is not None
+    tier.put("c", CachedResponse(_response("c"), 1.0))
+    assert tier.get("b") is None
+    assert tier.get("a") is not None
+    assert tier.get("c") is not None
+
+
+def test_sqlite_tier_persists_across_instances(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteCache(path).put("key", CachedResponse(_response("stored"), 2.5))
+
+    entry = SQLiteCache(path).get("key")
+    assert entry is not None
+    assert entry.latency == 2.5
+    assert _text(entry.response) == "stored"
+    assert SQLiteCache(path).get("other") is None
+
+
+def test_middleware_serves_repeats_and_promotes_from_sqlite(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    model = CountingModel()
+    request = _request(HumanMessage("what is the weather?"))
+
+    first = ResponseCacheMiddleware([MemoryCache(10), SQLiteCache(path)])
+    assert _text(first.wrap_model_call(request, model)) == "answer 1"
+    assert _text(first.wrap_model_call(request, model)) == "answer 1"
+    assert first.stats.hits == {"memory": 1}
+    assert first.stats.misses == 1
+
+    # A new process starts with an empty memory tier and fills it from SQLite.
+    second = ResponseCacheMiddleware([MemoryCache(10), SQLiteCache(path)])
+    assert _text(second.wrap_model_call(request, model)) == "answer 1"
+    assert _text(second.wrap_model_call(request, model)) == "answer 1"
+    assert second.stats.hits == {"sqlite": 1, "memory": 1}
+    assert second.stats.misses == 0
+    assert model.calls == 1
+    assert second.stats.saved_seconds >= 0
+    assert second.stats.hit_rate == 1.0
+
+
+def test_semantic_tier_matches_similar_messages_in_the_same_context() -> None:
+    cache = ResponseCacheMiddleware([], SemanticCache(KeywordEmbeddings(), threshold=0.9))
+    model = CountingModel()
+
+    assert _text(cache.wrap_model_call(_request(HumanMessage("weather tomorrow?")), model)) == "answer 1"
+    assert _text(cache.wrap_model_call(_request(HumanMessage("the weather for tomorrow")), model)) == "answer 1"
+    # Dissimilar, and similar but in another context.
+    assert _text(cache.wrap_model_call(_request(HumanMessage("rain?")), model)) == "answer 2"
+    other_context = _request(HumanMessage("weather tomorrow?"), system_prompt="Be brief.")
+    assert _text(cache.wrap_model_call(other_context, model)) == "answer 3"
+    assert cache.stats.hits == {"semantic": 1}
+    assert cache.stats.misses == 3
+
+
+def test_semantic_tier_picks_the_most_similar_entry() -> None:
+    cache = SemanticCache(KeywordEmbeddings(), threshold=0.5)
+    cache.put("context", "weather", CachedResponse(_response("weather"), 1.0))
+    cache.put("context", "weather sunny", CachedResponse(_response("sunny"), 1.0))
+    cache.put("context", "rain", CachedResponse(_response("rain"), 1.0))
+
+    best = cache.get("context", "sunny weather sunny")
+    assert best is not None
+    assert _text(best.response) == "sunny"
+    assert cache.get("context", "tomorrow") is None
+    assert cache.get("other", "weather") is None
+
+
+def test_semantic_tier_replaces_and_evicts_entries() -> None:
+    cache = SemanticCache(KeywordEmbeddings(), threshold=0.99, max_entries=2)
+    cache.put("a", "weather", CachedResponse(_response("old"), 1.0))
+    cache.put("a", "weather", CachedResponse(_response("new"), 1.0))
+    entry = cache.get("a", "weather")
+    assert entry is not None
+    assert _text(entry.response) == "new"
+
+    cache.put("b", "rain", CachedResponse(_response("rain"), 1.0))
+    cache.put("a", "sunny", CachedResponse(_response("sunny"), 1.0))
+    # "weather" was stored first, so it is evicted and the other entries of its context remain.
+    assert cache.get("a", "weather") is None
+    assert cache.get("a", "sunny") is not None
+    assert cache.get("b", "rain") is not None
+
+
+def test_async_calls_use_the_memory_tier_on_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def no_threads(*_: object) -> None:
+        pytest.fail("a memory-only cache must not use a worker thread")
+
+    monkeypatch.setattr(asyncio, "to_thread", no_threads)
+    cache = ResponseCacheMiddleware([MemoryCache(10)])
+    model = CountingModel()
+    request = _request(HumanMessage("what is the weather?"))
+    handler: Callable[[ModelRequest], Awaitable[ModelResponse]] = model.acall
+
+    async def calls() -> list[str]:
+        return [_text(await cache.awrap_model_call(request, handler)) for _ in range(3)]
+
+    assert asyncio.run(calls()) == ["answer 1"] * 3
+    assert model.calls == 1
+    assert cache.stats.hits == {"memory": 2}
+    assert cache.stats.misses == 1
+
+
+def test_async_calls_reach_sqlite_only_on_a_memory_miss(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    request = _request(HumanMessage("what is the weather?"))
+    model = CountingModel()
+    ResponseCacheMiddleware([SQLiteCache(path)]).wrap_model_call(request, model)
+
+    threaded: list[object] = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(function: Callable[..., object], /, *args: object) -> object:
+        threaded.append(function)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", counting_to_thread)
+    cache = ResponseCacheMiddleware([MemoryCache(10), SQLiteCache(path)])
+
+    async def calls() -> list[str]:
+        return [_text(await cache.awrap_model_call(request, model.acall)) for _ in range(3)]
+
+    assert asyncio.run(calls()) == ["answer 1"] * 3
+    assert model.calls == 1
+    assert cache.stats.hits == {"sqlite": 1, "memory": 2}
+    assert len(threaded) == 1
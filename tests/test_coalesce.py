@@ -0,0 +1,177 @@
+"""Tests of coalescing identical first-turn model calls."""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from healthcare_ai.app import build_agent
+from healthcare_ai.coalesce import RequestCoalescingMiddleware
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.tools import Context
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+    from langgraph.runtime import Runtime
+
+QUESTION = "what is the weather outside?"
+
+
+def _request(*messages: AnyMessage) -> ModelRequest:
+    messages = messages or (HumanMessage(QUESTION),)
+    return ModelRequest(
+        model=FakeChatModel(),
+        system_prompt=None,
+        messages=list(messages),
+        tool_choice=None,
+        tools=[],
+        response_format=None,
+        state={"messages": list(messages)},
+        runtime=cast("Runtime[Any]", None),
+    )
+
+
+def _response() -> ModelResponse:
+    return ModelResponse(
+        result=[AIMessage("", id="answer", tool_calls=[{"name": "get_user_location", "args": {}, "id": "call_1"}])]
+    )
+
+
+def _tool_call_id(response: object) -> str | None:
+    assert isinstance(response, ModelResponse)
+    message = response.result[0]
+    assert isinstance(message, AIMessage)
+    return message.tool_calls[0]["id"]
+
+
+def _wait_for_followers(coalescer: RequestCoalescingMiddleware, followers: int) -> None:
+    deadline = time.monotonic() + 5
+    while coalescer.stats.followers < followers:
+        assert time.monotonic() < deadline, "followers never arrived"
+        time.sleep(0.001)
+
+
+def test_followers_share_the_leader_call() -> None:
+    coalescer = RequestCoalescingMiddleware()
+    calls = 0
+
+    def handler(_: ModelRequest) -> ModelResponse:
+        nonlocal calls
+        calls += 1
+        _wait_for_followers(coalescer, 3)
+        return _response()
+
+    with ThreadPoolExecutor(4) as callers:
+        responses = list(callers.map(lambda _: coalescer.wrap_model_call(_request(), handler), range(4)))
+
+    assert calls == 1
+    assert (coalescer.stats.leaders, coalescer.stats.followers) == (1, 3)
+    ids = [_tool_call_id(response) for response in responses]
+    # The leader keeps its response; each follower gets a copy with fresh ids.
+    assert "call_1" in ids
+    assert len(set(ids)) == 4
+
+
+def test_leader_error_reaches_every_follower() -> None:
+    coalescer = RequestCoalescingMiddleware()
+
+    def handler(_: ModelRequest) -> ModelResponse:
+        _wait_for_followers(coalescer, 2)
+        msg = "upstream overloaded"
+        raise RuntimeError(msg)
+
+    def call(_: int) -> str:
+        with pytest.raises(RuntimeError) as raised:
+            coalescer.wrap_model_call(_request(), handler)
+        return str(raised.value)
+
+    with ThreadPoolExecutor(3) as callers:
+        assert list(callers.map(call, range(3))) == ["upstream overloaded"] * 3
+    # Nothing is left in flight, so the next call goes upstream.
+    assert _tool_call_id(coalescer.wrap_model_call(_request(), lambda _: _response())) == "call_1"
+    assert coalescer.stats.leaders == 2
+
+
+def test_async_followers_share_the_leader_call_and_its_error() -> None:
+    coalescer = RequestCoalescingMiddleware()
+    calls = 0
+
+    async def answer(_: ModelRequest) -> ModelResponse:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return _response()
+
+    async def fail(_: ModelRequest) -> ModelResponse:
+        await asyncio.sleep(0.05)
+        msg = "upstream overloaded"
+        raise RuntimeError(msg)
+
+    async def calls_of(handler: Callable[[ModelRequest], Awaitable[ModelResponse]], count: int) -> list[object]:
+        return await asyncio.gather(
+            *(coalescer.awrap_model_call(_request(), handler) for _ in range(count)), return_exceptions=True
+        )
+
+    responses = asyncio.run(calls_of(answer, 3))
+    assert calls == 1
+    assert len({_tool_call_id(response) for response in responses}) == 3
+
+    errors = asyncio.run(calls_of(fail, 3))
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert (coalescer.stats.leaders, coalescer.stats.followers) == (2, 4)
+
+
+def test_only_first_turns_are_coalesced() -> None:
+    coalescer = RequestCoalescingMiddleware()
+    later_turn = _request(HumanMessage("hi"), AIMessage("hello"), HumanMessage(QUESTION))
+    calls = 0
+
+    def handler(_: ModelRequest) -> ModelResponse:
+        nonlocal calls
+        calls += 1
+        time.sleep(0.05)
+        return _response()
+
+    with ThreadPoolExecutor(3) as callers:
+        list(callers.map(lambda _: coalescer.wrap_model_call(later_turn, handler), range(3)))
+
+    assert calls == 3
+    assert (coalescer.stats.leaders, coalescer.stats.followers) == (0, 0)
+
+
+def _turns(coalescer: RequestCoalescingMiddleware, *, stream: bool) -> None:
+    """Run the same first turn in three conversations at once, streaming messages or not."""
+    agent = build_agent(FakeChatModel(latency=0.05), checkpointer=InMemorySaver(), middleware=[coalescer])
+    question = {"messages": [{"role": "user", "content": QUESTION}]}
+
+    async def turn(thread_id: str) -> None:
+        config: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+        if stream:
+            async for _ in agent.astream(question, config, stream_mode="messages", context=Context(user_id="1")):
+                pass
+        else:
+            await agent.ainvoke(question, config, context=Context(user_id="1"))
+
+    async def turns() -> None:
+        await asyncio.gather(*(turn(str(i)) for i in range(3)))
+
+    asyncio.run(turns())
+
+
+def test_agent_turns_share_model_calls() -> None:
+    coalescer = RequestCoalescingMiddleware()
+    _turns(coalescer, stream=False)
+    # Three model calls per turn; the tools resolve the same way in every conversation.
+    assert (coalescer.stats.leaders, coalescer.stats.followers) == (3, 6)
+
+
+def test_streaming_turns_are_not_coalesced() -> None:
+    coalescer = RequestCoalescingMiddleware()
+    _turns(coalescer, stream=True)
+    assert (coalescer.stats.leaders, coalescer.stats.followers) == (0, 0)
@@ -0,0 +1,65 @@
+"""Tests of the conversation history policy."""
+
+from collections.abc import Sequence
+
+from langchain.agents.middleware import SummarizationMiddleware
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.history import HistoryMiddleware, is_summary
+
+
+def _count(messages: Sequence[AnyMessage]) -> int:
+    """Count one token per message, so budgets are easy to follow."""
+    return len(messages)
+
+
+def _turn(number: int) -> list[AnyMessage]:
+    return [
+        HumanMessage(f"question {number}"),
+        AIMessage("", tool_calls=[{"name": "get_weather", "args": {}, "id": f"call-{number}"}]),
+        ToolMessage("sunny", tool_call_id=f"call-{number}"),
+        AIMessage(f"answer {number}"),
+    ]
+
+
+def _summary() -> HumanMessage:
+    """Return the summary message exactly as `SummarizationMiddleware` builds it."""
+    middleware = SummarizationMiddleware(model=FakeChatModel())
+    (message,) = middleware._build_new_messages("Asked about the weather in Boston.")  # noqa: SLF001 # pyright: ignore[reportPrivateUsage]
+    return message
+
+
+def test_recognizes_the_summarization_middleware_summary() -> None:
+    assert is_summary(_summary())
+    assert not is_summary(HumanMessage("question"))
+    assert not is_summary(AIMessage(_summary().text))
+
+
+def test_keeps_the_most_recent_whole_turns() -> None:
+    messages = [message for number in range(5) for message in _turn(number)]
+    assert HistoryMiddleware(max_turns=2).trim(messages) == messages[-8:]
+    assert HistoryMiddleware(max_tokens=9, token_counter=_count).trim(messages) == messages[-8:]
+    # The current turn is sent even when it alone is over the budget.
+    assert HistoryMiddleware(max_tokens=1, token_counter=_count).trim(messages) == messages[-4:]
+
+
+def test_summary_is_kept_and_not_counted_as_a_turn() -> None:
+    summary = _summary()
+    turns = [message for number in range(5) for message in _turn(number)]
+    assert HistoryMiddleware(max_turns=2).trim([summary, *turns]) == [summary, *turns[-8:]]
+    assert HistoryMiddleware(max_turns=1).trim([summary, *turns[-4:]]) == [summary, *turns[-4:]]
+
+
+def test_summary_counts_against_the_token_budget() -> None:
+    summary = _summary()
+    turns = [message for number in range(5) for message in _turn(number)]
+    # The summary and two turns are 9 messages; a third turn would not fit.
+    assert HistoryMiddleware(max_tokens=12, token_counter=_count).trim([summary, *turns]) == [summary, *turns[-8:]]
+    assert HistoryMiddleware(max_tokens=1, token_counter=_count).trim([summary, *turns]) == [summary, *turns[-4:]]
+
+
+def test_summary_followed_by_a_partial_turn() -> None:
+    summary = _summary()
+    preserved = [*_turn(0)[2:], *_turn(1)]
+    assert HistoryMiddleware(max_turns=1).trim([summary, *preserved]) == [summary, *preserved[2:]]
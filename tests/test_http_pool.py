@@ -0,0 +1,105 @@
+"""Tests of routing model API calls through the shared HTTP pool, with and without a proxy."""
+
+import asyncio
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import AIMessage
+
+from healthcare_ai.http_pool import HttpPool
+
+# Never resolved: requests only reach it through the proxy
+API_URL = "http://api.anthropic.test"
+MESSAGE = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-test",
+    "content": [{"type": "text", "text": "Sunny."}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 3, "output_tokens": 2},
+}
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Answer every request as the Messages API would, recording the request target it was sent for."""
+
+    targets: list[str]
+
+    def do_POST(self) -> None:
+        """Record the request and answer with a fixed message."""
+        self.targets.append(self.path)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(MESSAGE).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002 - named by BaseHTTPRequestHandler
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def proxy() -> Iterator[tuple[str, list[str]]]:
+    """Serve a local stand-in for an HTTP proxy; yield its URL and the request targets it received."""
+    targets: list[str] = []
+    handler = type("Handler", (ProxyHandler,), {"targets": targets})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", targets
+    server.shutdown()
+    server.server_close()
+
+
+def _model(proxy_url: str | None) -> ChatAnthropic:
+    return ChatAnthropic(
+        model_name="claude-test",
+        api_key="test-key",  # pyright: ignore[reportArgumentType]
+        base_url=API_URL,
+        anthropic_proxy=proxy_url,
+        max_retries=0,
+        timeout=5,
+        stop=None,
+    )
+
+
+def test_attached_model_sends_requests_through_its_proxy(proxy: tuple[str, list[str]]) -> None:
+    proxy_url, targets = proxy
+    pool = HttpPool(http2=False)
+    model = pool.attach(_model(proxy_url))
+
+    reply = model.invoke("weather?")
+    areply = asyncio.run(model.ainvoke("weather?"))
+
+    assert isinstance(reply, AIMessage)
+    assert reply.text == areply.text == "Sunny."
+    # A proxy receives the absolute URL of the API.
+    assert targets == [f"{API_URL}/v1/messages"] * 2
+    assert pool.metrics.snapshot()["requests"] == 2
+    assert pool.metrics.snapshot()["in_flight"] == 0
+    asyncio.run(pool.aclose())
+
+
+def test_models_share_clients_by_proxy() -> None:
+    pool = HttpPool()
+    direct = pool.attach(_model(None))
+    proxied = pool.attach(_model("http://proxy.test:3128"))
+    again = pool.attach(_model("http://proxy.test:3128"))
+
+    def http_client(model: object) -> object:
+        return model.__dict__["_client"]._client  # noqa: SLF001
+
+    assert http_client(direct) is pool.client()
+    assert http_client(proxied) is pool.client("http://proxy.test:3128")
+    assert http_client(again) is http_client(proxied)
+    assert pool.client() is not pool.client("http://proxy.test:3128")
+    assert direct.__dict__["_async_client"]._client is pool.async_client()  # noqa: SLF001
+    assert proxied.__dict__["_async_client"]._client is pool.async_client("http://proxy.test:3128")  # noqa: SLF001
+    asyncio.run(pool.aclose())
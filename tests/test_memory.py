@@ -0,0 +1,184 @@
+"""Tests of the bounded in-memory and pooled SQLite checkpointers."""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple, empty_checkpoint
+
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.memory import BoundedInMemorySaver, PooledSqliteSaver
+from healthcare_ai.tools import Context
+
+
+def _config(thread_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _put(saver: BoundedInMemorySaver, thread_id: str, **values: str) -> RunnableConfig:
+    """Save a checkpoint of `values`, giving every channel whose value changed a new version."""
+    latest = saver.get_tuple(_config(thread_id))
+    previous = latest.checkpoint if latest else empty_checkpoint()
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_versions"] = dict(previous["channel_versions"])
+    new_versions = {}
+    for channel, value in values.items():
+        if latest is None or previous["channel_values"].get(channel) != value:
+            current = previous["channel_versions"].get(channel)
+            new_versions[channel] = saver.get_next_version(None if current is None else str(current), None)
+    checkpoint["channel_versions"].update(new_versions)
+    checkpoint["channel_values"] = dict(values)
+    return saver.put(_config(thread_id), checkpoint, {}, new_versions)
+
+
+def test_evicts_least_recently_used_thread() -> None:
+    saver = BoundedInMemorySaver(max_threads=2)
+    _put(saver, "a", messages="hi")
+    _put(saver, "b", messages="hi")
+    # Reading "a" makes "b" the least recently used.
+    assert saver.get_tuple(_config("a")) is not None
+    _put(saver, "c", messages="hi")
+    assert saver.get_tuple(_config("b")) is None
+    assert saver.get_tuple(_config("a")) is not None
+    assert saver.get_tuple(_config("c")) is not None
+    assert saver.thread_count == 2
+    assert saver.evicted_threads == 1
+
+
+def test_evicts_threads_idle_past_ttl() -> None:
+    saver = BoundedInMemorySaver(ttl=0.05)
+    _put(saver, "idle", messages="hi")
+    time.sleep(0.1)
+    _put(saver, "active", messages="hi")
+    assert saver.get_tuple(_config("idle")) is None
+    assert saver.get_tuple(_config("active")) is not None
+    assert saver.evicted_threads == 1
+
+
+def test_pruning_keeps_the_latest_checkpoints_and_their_blobs() -> None:
+    saver = BoundedInMemorySaver(max_checkpoints_per_thread=2)
+    configs = [_put(saver, "t", system="unchanged", messages=str(turn)) for turn in range(5)]
+    latest = saver.get_tuple(_config("t"))
+    assert latest is not None
+    assert latest.checkpoint["id"] == configs[-1].get("configurable", {})["checkpoint_id"]
+    assert latest.checkpoint["channel_values"] == {"system": "unchanged", "messages": "4"}
+    assert len(saver.storage["t"][""]) == 2
+    assert saver.evicted_checkpoints == 3
+    # The unchanged channel's first blob is still referenced; only the last two "messages" blobs remain.
+    assert sorted(channel for _, _, channel, _ in saver.blobs) == ["messages", "messages", "system"]
+
+
+def test_rejects_keeping_no_checkpoints() -> None:
+    with pytest.raises(ValueError, match="at least the latest"):
+        BoundedInMemorySaver(max_checkpoints_per_thread=0)
+
+
+def test_resident_bytes_track_what_is_held() -> None:
+    saver = BoundedInMemorySaver(max_checkpoints_per_thread=1)
+    assert saver.resident_bytes == 0
+    _put(saver, "t", messages="x" * 10_000)
+    large = saver.resident_bytes
+    assert large > 10_000
+    _put(saver, "t", messages="x")
+    assert 0 < saver.resident_bytes < large - 9_000
+    saver.delete_thread("t")
+    assert saver.resident_bytes == 0
+    assert saver.thread_count == 0
+
+
+def test_sqlite_saver_reuses_the_connection_a_thread_holds(tmp_path: Path) -> None:
+    saver = PooledSqliteSaver(str(tmp_path / "checkpoints.db"), pool_size=1)
+    try:
+        for thread_id in ("a", "b"):
+            saver.put(_config(thread_id), empty_checkpoint(), {}, {})
+
+        found: list[str] = []
+
+        def nested() -> None:
+            # `list` holds its connection until the generator finishes.
+            for checkpoint in saver.list(None):
+                config = checkpoint.config.get("configurable", {})
+                latest = saver.get_tuple(_config(config["thread_id"]))
+                assert latest is not None
+                found.append(config["thread_id"])
+
+        # A daemon thread, so that a deadlock fails the test instead of hanging it.
+        thread = threading.Thread(target=nested, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert sorted(found) == ["a", "b"]
+        # The connection went back to the pool.
+        assert saver.get_tuple(_config("a")) is not None
+    finally:
+        saver.close()
+
+
+def test_sqlite_saver_async_methods(tmp_path: Path) -> None:
+    saver = PooledSqliteSaver(str(tmp_path / "checkpoints.db"), pool_size=2)
+
+    async def round_trip() -> tuple[CheckpointTuple | None, list[CheckpointTuple], list[CheckpointTuple]]:
+        first = await saver.aput(_config("a"), empty_checkpoint(), {"step": 1}, {})
+        await saver.aput_writes(first, [("messages", "hi")], task_id="task")
+        await saver.aput(first, empty_checkpoint(), {"step": 2}, {})
+        await saver.aput(_config("b"), empty_checkpoint(), {"step": 1}, {})
+        latest = await saver.aget_tuple(_config("a"))
+        # `first` names its checkpoint, so its writes come back with it.
+        written = await saver.aget_tuple(first)
+        assert written is not None
+        assert written.pending_writes == [("task", "messages", "hi")]
+        listed = [checkpoint async for checkpoint in saver.alist(_config("a"))]
+        await saver.adelete_thread("a")
+        remaining = [checkpoint async for checkpoint in saver.alist(None, filter={"step": 1}, limit=5)]
+        return latest, listed, remaining
+
+    try:
+        latest, listed, remaining = asyncio.run(round_trip())
+    finally:
+        saver.close()
+
+    assert latest is not None
+    assert latest.metadata.get("step") == 2
+    assert [checkpoint.metadata.get("step") for checkpoint in listed] == [2, 1]
+    assert [checkpoint.config.get("configurable", {})["thread_id"] for checkpoint in remaining] == ["b"]
+
+
+def test_sqlite_saver_serves_concurrent_ainvoke_turns(tmp_path: Path) -> None:
+    path = str(tmp_path / "checkpoints.db")
+    saver = PooledSqliteSaver(path, pool_size=2)
+    agent = build_agent(FakeChatModel(latency=0.01), checkpointer=saver)
+    threads = [str(i) for i in range(8)]
+
+    async def turn(thread_id: str) -> int:
+        config: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+        question = {"messages": [{"role": "user", "content": f"weather for conversation {thread_id}?"}]}
+        first = await agent.ainvoke(question, config, context=Context(user_id=thread_id))
+        second = await agent.ainvoke(question, config, context=Context(user_id=thread_id))
+        assert len(second["messages"]) == 2 * len(first["messages"])
+        return len(second["messages"])
+
+    async def turns() -> list[int]:
+        return await asyncio.gather(*(turn(thread_id) for thread_id in threads))
+
+    try:
+        lengths = asyncio.run(turns())
+    finally:
+        saver.close()
+
+    # A new saver on the same file finds every conversation.
+    reopened = PooledSqliteSaver(path)
+    try:
+        for thread_id, length in zip(threads, lengths, strict=True):
+            latest = reopened.get_tuple(_config(thread_id))
+            assert latest is not None
+            messages = latest.checkpoint["channel_values"]["messages"]
+            assert len(messages) == length
+            questions = [message.text for message in messages if isinstance(message, HumanMessage)]
+            assert questions == [f"weather for conversation {thread_id}?"] * 2
+    finally:
+        reopened.close()
@@ -0,0 +1,70 @@
+"""Tests of the metrics read from the components' counters."""
+
+import threading
+from collections.abc import Iterator
+
+import pytest
+
+from healthcare_ai.cache import get_response_cache
+from healthcare_ai.config import get_settings
+from healthcare_ai.metrics import Metrics, Sample, collect_components
+
+
+@pytest.fixture(autouse=True)
+def fresh_components(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setenv("HEALTHCARE_AI_MODEL", "fake")
+    monkeypatch.setenv("HEALTHCARE_AI_RESPONSE_CACHE_SIZE", "16")
+    get_settings.cache_clear()
+    get_response_cache.cache_clear()
+    yield
+    get_settings.cache_clear()
+    get_response_cache.cache_clear()
+
+
+def test_response_cache_saved_seconds_are_exported() -> None:
+    response_cache = get_response_cache()
+    assert response_cache is not None
+    response_cache.stats.saved_seconds = 2.5
+    samples = {sample.name: sample for sample in collect_components()}
+    assert samples["response_cache_saved_seconds_total"].value == 2.5
+
+
+def test_shards_of_finished_threads_are_folded() -> None:
+    metrics = Metrics()
+
+    def record() -> None:
+        metrics.inc("requests_total", endpoint="/invoke")
+        metrics.observe("turn_seconds", 0.2)
+
+    for _ in range(50):
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Only the shards of live threads, including the new one, are kept apart.
+        assert metrics.shard_count <= 5
+    rendered = metrics.render()
+    assert 'healthcare_ai_requests_total{endpoint="/invoke"} 200' in rendered
+    assert "healthcare_ai_turn_seconds_count 200" in rendered
+    assert metrics.shard_count == 0
+
+
+def test_values_recorded_by_live_and_finished_threads_are_summed() -> None:
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.inc("requests_total", 2)
+    thread = threading.Thread(target=metrics.observe, args=("turn_seconds", 0.5))
+    thread.start()
+    thread.join()
+    metrics.observe("turn_seconds", 5.0)
+    metrics.collector(lambda: [Sample("admission_running", 3)])
+    rendered = metrics.render().splitlines()
+    assert "healthcare_ai_requests_total 2" in rendered
+    assert [line for line in rendered if line.startswith("healthcare_ai_turn_seconds")] == [
+        'healthcare_ai_turn_seconds_bucket{le="0.1"} 0',
+        'healthcare_ai_turn_seconds_bucket{le="1"} 1',
+        'healthcare_ai_turn_seconds_bucket{le="+Inf"} 2',
+        "healthcare_ai_turn_seconds_sum 5.5",
+        "healthcare_ai_turn_seconds_count 2",
+    ]
+    assert "healthcare_ai_admission_running 3" in rendered
@@ -0,0 +1,275 @@
+"""Tests of the model call policy: retries, deadlines, hedging, and concurrent sync callers."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, cast
+
+import httpx
+import pytest
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage
+
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.model_policy import ModelPolicyMiddleware, call_deadline, is_retryable
+
+if TYPE_CHECKING:
+    from langgraph.runtime import Runtime
+
+CALLERS = 64
+
+
+def _request(model: FakeChatModel | None = None) -> ModelRequest:
+    return ModelRequest(
+        model=model or FakeChatModel(),
+        system_prompt=None,
+        messages=[HumanMessage("what is the weather?")],
+        tool_choice=None,
+        tools=[],
+        response_format=None,
+        state={"messages": []},
+        runtime=cast("Runtime[Any]", None),
+    )
+
+
+def _call_concurrently(policy: ModelPolicyMiddleware, seconds: float, callers: int) -> list[bool]:
+    """Call the model through `policy` from `callers` threads at once; return whether each call ran inline."""
+    request = _request()
+
+    def call(_: int) -> bool:
+        caller = threading.current_thread()
+
+        def handler(_: ModelRequest) -> ModelResponse:
+            time.sleep(seconds)
+            return ModelResponse(result=[AIMessage(str(threading.current_thread() is caller))])
+
+        response = policy.wrap_model_call(request, handler)
+        assert isinstance(response, ModelResponse)
+        return response.result[0].content == "True"
+
+    with ThreadPoolExecutor(callers) as callers_pool:
+        return list(callers_pool.map(call, range(callers)))
+
+
+def test_calls_with_only_a_deadline_run_inline() -> None:
+    policy = ModelPolicyMiddleware(max_attempts=1, attempt_timeout=0.5, max_workers=1)
+    inline = _call_concurrently(policy, 0.2, CALLERS)
+    assert all(inline)
+    assert policy.stats.attempts == CALLERS
+    assert policy.stats.timeouts == policy.stats.failures == 0
+
+
+def test_time_queued_for_a_worker_does_not_count_against_the_attempt_deadline() -> None:
+    policy = ModelPolicyMiddleware(
+        max_attempts=1, attempt_timeout=0.3, hedge_quantile=0.99, hedge_min_samples=1, max_workers=4
+    )
+    _call_concurrently(policy, 0.1, 1)
+    # 16 calls of 0.1 s on 4 workers queue for up to 0.4 s, longer than the attempt deadline.
+    inline = _call_concurrently(policy, 0.1, 16)
+    assert not any(inline)
+    assert policy.stats.timeouts == policy.stats.failures == 0
+
+
+class StatusError(Exception):
+    """An API error carrying an HTTP status, as provider SDKs raise them."""
+
+    def __init__(self, status_code: int) -> None:
+        """Fail with `status_code`."""
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class Outcomes:
+    """Latency for the fake model that plays back one outcome per call: seconds to take, or an error to raise.
+
+    Once the outcomes run out every call takes `then` seconds.
+    """
+
+    def __init__(self, *outcomes: float | Exception, then: float = 0.0) -> None:
+        """Play back `outcomes`, then `then`."""
+        self._outcomes = deque(outcomes)
+        self.then = then
+        self.calls = 0
+
+    def __call__(self) -> float:
+        self.calls += 1
+        outcome = self._outcomes.popleft() if self._outcomes else self.then
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _model_request(outcomes: Outcomes) -> ModelRequest:
+    return _request(FakeChatModel(latency=outcomes))
+
+
+def _call(policy: ModelPolicyMiddleware, request: ModelRequest) -> ModelResponse:
+    def handler(request: ModelRequest) -> ModelResponse:
+        return ModelResponse(result=[request.model.invoke(request.messages)])
+
+    response = policy.wrap_model_call(request, handler)
+    assert isinstance(response, ModelResponse)
+    return response
+
+
+def _acall(policy: ModelPolicyMiddleware, request: ModelRequest) -> ModelResponse:
+    async def handler(request: ModelRequest) -> ModelResponse:
+        return ModelResponse(result=[await request.model.ainvoke(request.messages)])
+
+    response = asyncio.run(policy.awrap_model_call(request, handler))
+    assert isinstance(response, ModelResponse)
+    return response
+
+
+def test_classifies_retryable_errors() -> None:
+    assert is_retryable(TimeoutError())
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(httpx.ReadTimeout("slow"))
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(529))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError("bad request"))
+    wrapped = RuntimeError("provider error")
+    wrapped.__cause__ = httpx.ConnectError("refused")
+    assert is_retryable(wrapped)
+
+
+def test_backoff_is_jittered_below_its_cap() -> None:
+    policy = ModelPolicyMiddleware(backoff_base=0.5, backoff_max=3.0)
+    for retry, cap in enumerate([0.5, 1.0, 2.0, 3.0, 3.0]):
+        waits = [policy.backoff(retry) for _ in range(200)]
+        assert all(0 <= wait <= cap for wait in waits)
+        assert max(waits) > cap / 2
+
+
+def test_retries_retryable_errors_with_backoff() -> None:
+    outcomes = Outcomes(StatusError(529), ConnectionError("reset"))
+    policy = ModelPolicyMiddleware(max_attempts=3, backoff_base=0.05, backoff_max=0.05)
+    start = time.monotonic()
+
+    response = _call(policy, _model_request(outcomes))
+
+    assert isinstance(response.result[0], AIMessage)
+    assert outcomes.calls == 3
+    assert policy.stats.attempts == 3
+    assert policy.stats.retries == 2
+    assert policy.stats.failures == 0
+    assert time.monotonic() - start < 1
+
+
+def test_gives_up_after_max_attempts() -> None:
+    outcomes = Outcomes(*(StatusError(503) for _ in range(5)))
+    policy = ModelPolicyMiddleware(max_attempts=3, backoff_base=0.01)
+
+    with pytest.raises(StatusError):
+        _call(policy, _model_request(outcomes))
+    assert outcomes.calls == 3
+    assert policy.stats.retries == 2
+    assert policy.stats.failures == 1
+
+
+def test_does_not_retry_errors_that_cannot_succeed() -> None:
+    outcomes = Outcomes(StatusError(400))
+    policy = ModelPolicyMiddleware(max_attempts=5, backoff_base=0.01)
+
+    with pytest.raises(StatusError):
+        _call(policy, _model_request(outcomes))
+    with pytest.raises(StatusError):
+        _acall(policy, _model_request(Outcomes(StatusError(401))))
+    assert policy.stats.attempts == 2
+    assert policy.stats.retries == 0
+    assert policy.stats.failures == 2
+
+
+def test_total_deadline_stops_retrying() -> None:
+    outcomes = Outcomes(*(ConnectionError("reset") for _ in range(1000)))
+    policy = ModelPolicyMiddleware(max_attempts=1000, backoff_base=0.05, backoff_max=0.05, total_timeout=0.3)
+    start = time.monotonic()
+
+    with pytest.raises(ConnectionError):
+        _call(policy, _model_request(outcomes))
+    assert time.monotonic() - start < 0.5
+    assert 1 < outcomes.calls < 1000
+    assert policy.stats.failures == 1
+
+
+def test_caller_deadline_shortens_the_total_deadline() -> None:
+    outcomes = Outcomes(*(ConnectionError("reset") for _ in range(1000)))
+    policy = ModelPolicyMiddleware(max_attempts=1000, backoff_base=0.05, backoff_max=0.05, total_timeout=30)
+    start = time.monotonic()
+
+    with call_deadline(0.2), pytest.raises(ConnectionError):
+        _call(policy, _model_request(outcomes))
+    assert time.monotonic() - start < 0.4
+
+
+def test_async_attempt_timeout_is_retried() -> None:
+    outcomes = Outcomes(1.0, then=0.0)
+    policy = ModelPolicyMiddleware(max_attempts=2, backoff_base=0.01, attempt_timeout=0.1)
+    start = time.monotonic()
+
+    response = _acall(policy, _model_request(outcomes))
+
+    assert isinstance(response.result[0], AIMessage)
+    assert time.monotonic() - start < 0.5
+    assert policy.stats.timeouts == 1
+    assert policy.stats.retries == 1
+    assert policy.stats.attempts == 2
+
+
+def test_async_total_deadline_cancels_a_slow_call() -> None:
+    policy = ModelPolicyMiddleware(max_attempts=3, total_timeout=0.2)
+    start = time.monotonic()
+
+    with pytest.raises(TimeoutError):
+        _acall(policy, _model_request(Outcomes(then=5.0)))
+    assert time.monotonic() - start < 0.5
+    assert policy.stats.timeouts == 1
+    assert policy.stats.failures == 1
+
+
+def _hedging_policy() -> ModelPolicyMiddleware:
+    """A policy that hedges attempts running longer than the 0.1 s call it is primed with."""
+    policy = ModelPolicyMiddleware(max_attempts=1, hedge_quantile=0.5, hedge_min_samples=1, attempt_timeout=2)
+    _call(policy, _model_request(Outcomes(0.1)))
+    assert (policy.hedge_delay() or 0) >= 0.1
+    return policy
+
+
+def test_hedge_answers_when_the_first_attempt_is_slow() -> None:
+    policy = _hedging_policy()
+    # The first attempt takes 0.6 s; its hedge, sent after 0.1 s, answers at once.
+    outcomes = Outcomes(0.6, 0.0)
+    start = time.monotonic()
+
+    response = _call(policy, _model_request(outcomes))
+
+    assert isinstance(response.result[0], AIMessage)
+    assert time.monotonic() - start < 0.4
+    assert outcomes.calls == 2
+    assert policy.stats.hedges == 1
+    assert policy.stats.hedge_wins == 1
+
+
+def test_fast_attempt_is_not_hedged() -> None:
+    policy = _hedging_policy()
+    outcomes = Outcomes(0.0)
+
+    _call(policy, _model_request(outcomes))
+    assert outcomes.calls == 1
+    assert policy.stats.hedges == 0
+
+
+def test_async_hedge_answers_when_the_first_attempt_is_slow() -> None:
+    policy = _hedging_policy()
+    outcomes = Outcomes(1.0, 0.0)
+    start = time.monotonic()
+
+    response = _acall(policy, _model_request(outcomes))
+
+    assert isinstance(response.result[0], AIMessage)
+    assert time.monotonic() - start < 0.5
+    assert policy.stats.hedges == 1
+    assert policy.stats.hedge_wins == 1
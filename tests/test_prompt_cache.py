@@ -0,0 +1,148 @@
+"""Tests of the cacheable prompt prefix and the prompt cache statistics."""
+
+import asyncio
+from collections.abc import Iterator, Sequence
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.language_models import BaseChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.ai import InputTokenDetails, UsageMetadata
+from langchain_core.tools import BaseTool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from healthcare_ai.app import build_agent
+from healthcare_ai.config import get_settings
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.prompt_cache import PromptCacheMiddleware, get_prompt_cache
+from healthcare_ai.tools import Context, get_user_location, get_weather_for_location
+
+if TYPE_CHECKING:
+    from langgraph.runtime import Runtime
+
+SEARCH_SCHEMA = {"type": "function", "function": {"name": "search", "description": "Search.", "parameters": {}}}
+
+
+def _request(model: BaseChatModel, tools: Sequence[BaseTool | dict[str, Any]]) -> ModelRequest:
+    messages = [HumanMessage("what is the weather?")]
+    return ModelRequest(
+        model=model,
+        system_prompt="You are a forecaster.",
+        messages=list(messages),
+        tool_choice=None,
+        tools=list(tools),
+        response_format=None,
+        state={"messages": list(messages)},
+        runtime=cast("Runtime[Any]", None),
+    )
+
+
+def _tool_names(request: ModelRequest) -> list[str]:
+    return [tool["function"]["name"] if isinstance(tool, dict) else tool.name for tool in request.tools]
+
+
+def test_system_prompt_becomes_a_cache_breakpoint() -> None:
+    prompt_cache = PromptCacheMiddleware(ttl="1h")
+    request = prompt_cache.prepare(_request(FakeChatModel(), []))
+
+    assert request.system_prompt is None
+    system, question = request.messages
+    assert isinstance(system, SystemMessage)
+    assert system.content == [
+        {"type": "text", "text": "You are a forecaster.", "cache_control": {"type": "ephemeral", "ttl": "1h"}}
+    ]
+    assert isinstance(question, HumanMessage)
+    # The same prompt reuses one message, so the prefix is built once.
+    assert prompt_cache.prepare(_request(FakeChatModel(), [])).messages[0] is system
+
+
+def test_tool_order_does_not_depend_on_registration() -> None:
+    prompt_cache = PromptCacheMiddleware()
+    orders = [
+        [get_weather_for_location, SEARCH_SCHEMA, get_user_location],
+        [SEARCH_SCHEMA, get_user_location, get_weather_for_location],
+        [get_user_location, get_weather_for_location, SEARCH_SCHEMA],
+    ]
+    prepared = [_tool_names(prompt_cache.prepare(_request(FakeChatModel(), order))) for order in orders]
+    assert prepared == [["get_user_location", "get_weather_for_location", "search"]] * 3
+
+
+def test_models_without_cache_control_keep_the_system_prompt() -> None:
+    prompt_cache = PromptCacheMiddleware()
+    model = GenericFakeChatModel(messages=iter([]))
+    request = prompt_cache.prepare(_request(model, [get_weather_for_location, get_user_location]))
+
+    assert request.system_prompt == "You are a forecaster."
+    assert [message.type for message in request.messages] == ["human"]
+    assert _tool_names(request) == ["get_user_location", "get_weather_for_location"]
+
+
+def test_records_cache_reads_and_writes() -> None:
+    prompt_cache = PromptCacheMiddleware()
+
+    def answer(read: int, written: int) -> ModelResponse:
+        usage = UsageMetadata(
+            input_tokens=100,
+            output_tokens=5,
+            total_tokens=105,
+            input_token_details=InputTokenDetails(cache_read=read, cache_creation=written),
+        )
+        return ModelResponse(result=[AIMessage("", usage_metadata=usage)])
+
+    request = _request(FakeChatModel(), [])
+    prompt_cache.wrap_model_call(request, lambda _: answer(0, 80))
+    prompt_cache.wrap_model_call(request, lambda _: answer(80, 0))
+
+    async def aanswer(_: ModelRequest) -> ModelResponse:
+        return answer(80, 0)
+
+    asyncio.run(prompt_cache.awrap_model_call(request, aanswer))
+    # A response without usage is not counted.
+    prompt_cache.wrap_model_call(request, lambda _: ModelResponse(result=[AIMessage("")]))
+
+    stats = prompt_cache.stats
+    assert (stats.calls, stats.input_tokens) == (3, 300)
+    assert (stats.cache_read_tokens, stats.cache_write_tokens) == (160, 80)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_agent_turns_read_the_cached_prefix() -> None:
+    prompt_cache = PromptCacheMiddleware()
+    agent = build_agent(FakeChatModel(), checkpointer=InMemorySaver(), middleware=[prompt_cache])
+    for thread_id in ("1", "2"):
+        agent.invoke(
+            {"messages": [{"role": "user", "content": "what is the weather outside?"}]},
+            {"configurable": {"thread_id": thread_id}},
+            context=Context(user_id="1"),
+        )
+
+    stats = prompt_cache.stats
+    # Three model calls per turn; only the first writes the prefix.
+    assert stats.calls == 6
+    assert stats.cache_write_tokens > 0
+    assert stats.cache_read_tokens == 5 * stats.cache_write_tokens
+
+
+@pytest.fixture
+def prompt_cache_settings() -> Iterator[None]:
+    get_settings.cache_clear()
+    get_prompt_cache.cache_clear()
+    yield
+    get_settings.cache_clear()
+    get_prompt_cache.cache_clear()
+
+
+@pytest.mark.usefixtures("prompt_cache_settings")
+@pytest.mark.parametrize(("ttl", "expected"), [("1h", "1h"), ("5m", "5m"), ("", None)])
+def test_settings_choose_the_ttl(monkeypatch: pytest.MonkeyPatch, ttl: str, expected: str | None) -> None:
+    monkeypatch.setenv("HEALTHCARE_AI_PROMPT_CACHE_TTL", ttl)
+    prompt_cache = get_prompt_cache()
+    assert (prompt_cache and prompt_cache.ttl) == expected
+
+
+@pytest.mark.usefixtures("prompt_cache_settings")
+def test_unknown_ttl_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HEALTHCARE_AI_PROMPT_CACHE_TTL", "10m")
+    with pytest.raises(ValueError, match="10m"):
+        get_prompt_cache()
@@ -0,0 +1,118 @@
+"""Tests of incremental parsing of the structured response from split tool call chunks."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, Any, cast
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.messages.tool import tool_call_chunk
+
+from healthcare_ai.response import ResponseFormat
+from healthcare_ai.response_stream import FieldEvent, ResponseStreamParser, astream_response
+
+if TYPE_CHECKING:
+    from healthcare_ai.app import Agent
+    from healthcare_ai.tools import Context
+
+NAME = ResponseFormat.__name__
+
+
+def _chunk(*calls: tuple[int, str | None, str], message_id: str = "run-1", content: str = "") -> AIMessageChunk:
+    """Return a message chunk carrying `(index, name, args)` fragments of tool calls."""
+    return AIMessageChunk(
+        content=content,
+        id=message_id,
+        tool_call_chunks=[tool_call_chunk(name=name, args=args, id=None, index=index) for index, name, args in calls],
+    )
+
+
+def _feed(fragments: list[str]) -> list[list[FieldEvent]]:
+    parser = ResponseStreamParser()
+    names = [NAME] + [None] * (len(fragments) - 1)
+    return [parser.feed(_chunk((0, name, fragment))) for name, fragment in zip(names, fragments, strict=True)]
+
+
+def test_fragments_split_inside_strings_and_escapes() -> None:
+    fragments = [
+        '{"pun',
+        'ny_response": "Su',
+        "n\\",
+        '"ny \\u00',
+        "e9",
+        '", "weather',
+        '_conditions": "cl',
+        'ear"}',
+    ]
+    assert _feed(fragments) == [
+        [],
+        [FieldEvent("punny_response", "Su", done=False)],
+        # The dangling backslash is not sent until the escape is complete.
+        [FieldEvent("punny_response", "n", done=False)],
+        [],
+        [FieldEvent("punny_response", '"ny é', done=False)],
+        [],
+        [FieldEvent("punny_response", 'Sun"ny é', done=True)],
+        [FieldEvent("weather_conditions", "clear", done=True)],
+    ]
+
+
+def test_fields_in_any_order() -> None:
+    fragments = ['{"weather_conditions": "fog', 'gy", "punny_', 'response": "Mist', 'ake"}']
+    assert _feed(fragments) == [
+        [],
+        [],
+        [FieldEvent("weather_conditions", "foggy", done=True), FieldEvent("punny_response", "Mist", done=False)],
+        [FieldEvent("punny_response", "ake", done=False), FieldEvent("punny_response", "Mistake", done=True)],
+    ]
+
+
+def test_interleaved_tool_calls_are_told_apart_by_index() -> None:
+    parser = ResponseStreamParser()
+    first = parser.feed(_chunk((0, "get_weather", '{"city": "Bos'), (1, NAME, '{"punny_response": "Hi')))
+    second = parser.feed(_chunk((1, None, " there"), (0, None, 'ton"}')))
+    third = parser.feed(_chunk((0, None, ""), (1, None, '"}')))
+    assert first == [FieldEvent("punny_response", "Hi", done=False)]
+    assert second == [FieldEvent("punny_response", " there", done=False)]
+    assert third == [FieldEvent("punny_response", "Hi there", done=True)]
+
+
+def test_only_the_first_structured_response_is_parsed() -> None:
+    parser = ResponseStreamParser()
+    parser.feed(_chunk((0, NAME, '{"punny_response": "One"}')))
+    assert parser.feed(_chunk((0, NAME, '{"punny_response": "Two"}'), message_id="run-2")) == []
+
+
+class _Agent:
+    """Stands in for the agent, replaying a turn's stream."""
+
+    def __init__(self, chunks: list[tuple[str, Any]]) -> None:
+        self.chunks = chunks
+
+    async def astream(self, *_: object, **__: object) -> AsyncIterator[tuple[str, Any]]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_astream_response_events() -> None:
+    response = ResponseFormat("Hi there", "sunny")
+    agent = _Agent(
+        [
+            ("messages", (_chunk(content="Let me check."), {})),
+            ("messages", (_chunk((0, NAME, '{"punny_response": "Hi')), {})),
+            ("messages", (_chunk((0, None, ' there", "weather_conditions": "sunny"}')), {})),
+            ("updates", {"model": {"structured_response": response}}),
+        ]
+    )
+
+    async def collect() -> list[tuple[str, Any]]:
+        stream = astream_response(cast("Agent", agent), {"messages": []}, {}, cast("Context", None))
+        return [event async for event in stream]
+
+    assert asyncio.run(collect()) == [
+        ("token", "Let me check."),
+        ("delta", {"field": "punny_response", "value": "Hi"}),
+        ("delta", {"field": "punny_response", "value": " there"}),
+        ("field", {"field": "punny_response", "value": "Hi there"}),
+        ("field", {"field": "weather_conditions", "value": "sunny"}),
+        ("response", {"punny_response": "Hi there", "weather_conditions": "sunny"}),
+    ]
@@ -0,0 +1,106 @@
+"""Tests of the model router's fallback under the model call policy."""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, cast
+
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage
+
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.model_policy import ModelPolicyMiddleware
+from healthcare_ai.routing import LARGE, SMALL, ModelRouterMiddleware
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langgraph.runtime import Runtime
+
+LARGE_MODEL, SMALL_MODEL, FALLBACK_MODEL = FakeChatModel(), FakeChatModel(), FakeChatModel()
+
+
+def _request(message: str) -> ModelRequest:
+    return ModelRequest(
+        model=LARGE_MODEL,
+        system_prompt=None,
+        messages=[HumanMessage(message)],
+        tool_choice=None,
+        tools=[],
+        response_format=None,
+        state={"messages": [HumanMessage(message)]},
+        runtime=cast("Runtime[Any]", None),
+    )
+
+
+def _router(routed_timeout: float | None) -> ModelRouterMiddleware:
+    return ModelRouterMiddleware(
+        LARGE_MODEL,
+        small=SMALL_MODEL,
+        fallback=FALLBACK_MODEL,
+        tool_keywords=["weather"],
+        routed_timeout=routed_timeout,
+    )
+
+
+def _policy() -> ModelPolicyMiddleware:
+    # Enough attempts and backoff that waiting out every retry would take seconds.
+    return ModelPolicyMiddleware(max_attempts=10, backoff_base=0.2, total_timeout=30)
+
+
+def test_falls_back_once_the_routed_call_has_had_its_deadline() -> None:
+    router, policy = _router(routed_timeout=0.3), _policy()
+    models: list[BaseChatModel] = []
+
+    def model_call(request: ModelRequest) -> ModelResponse:
+        models.append(request.model)
+        if request.model is not FALLBACK_MODEL:
+            raise ConnectionError
+        return ModelResponse(result=[AIMessage("from the fallback")])
+
+    start = time.monotonic()
+    response = router.wrap_model_call(
+        _request("thanks!"), lambda request: cast("ModelResponse", policy.wrap_model_call(request, model_call))
+    )
+    assert time.monotonic() - start < 1
+    assert isinstance(response, ModelResponse)
+    assert response.result[0].text == "from the fallback"
+    assert models[-1] is FALLBACK_MODEL
+    assert all(model is SMALL_MODEL for model in models[:-1])
+    assert len(models) < 10
+    assert router.stats.fallbacks == 1
+
+
+def test_async_falls_back_once_the_routed_call_has_had_its_deadline() -> None:
+    router, policy = _router(routed_timeout=0.3), _policy()
+    models: list[BaseChatModel] = []
+
+    async def model_call(request: ModelRequest) -> ModelResponse:
+        models.append(request.model)
+        if request.model is not FALLBACK_MODEL:
+            await asyncio.sleep(10)
+        return ModelResponse(result=[AIMessage("from the fallback")])
+
+    async def policy_call(request: ModelRequest) -> ModelResponse:
+        return cast("ModelResponse", await policy.awrap_model_call(request, model_call))
+
+    async def call() -> object:
+        return await router.awrap_model_call(_request("what is the weather?"), policy_call)
+
+    start = time.monotonic()
+    response = asyncio.run(call())
+    assert time.monotonic() - start < 1
+    assert isinstance(response, ModelResponse)
+    assert response.result[0].text == "from the fallback"
+    assert models == [LARGE_MODEL, FALLBACK_MODEL]
+    assert policy.stats.timeouts == 1
+
+
+def test_decisions_are_counted_by_route_and_rule() -> None:
+    router = _router(routed_timeout=None)
+
+    def model_call(_: ModelRequest) -> ModelResponse:
+        return ModelResponse(result=[AIMessage("ok")])
+
+    for message in ["thanks!", "what is the weather?", "thanks again!"]:
+        router.wrap_model_call(_request(message), model_call)
+    assert router.stats.routes == {SMALL: 2, LARGE: 1}
+    assert router.stats.reasons == {(SMALL, "short message"): 2, (LARGE, "tools likely"): 1}
@@ -0,0 +1,150 @@
+"""Tests of the HTTP endpoints, served by the offline fake model."""
+
+import json
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from healthcare_ai.admission import QUEUE_FULL, USER_RATE, get_admission
+from healthcare_ai.app import get_agent
+from healthcare_ai.cache import get_response_cache
+from healthcare_ai.coalesce import get_request_coalescer
+from healthcare_ai.config import get_model, get_settings
+from healthcare_ai.memory import get_checkpointer
+from healthcare_ai.metrics import get_metrics
+from healthcare_ai.server import app
+
+RESPONSE = {
+    "punny_response": "It's a 'sun-believable' day in Florida!",
+    "weather_conditions": "It's always sunny in Florida!",
+}
+COMPONENTS: list[Callable[..., Any]] = [
+    get_settings,
+    get_model,
+    get_agent,
+    get_admission,
+    get_metrics,
+    get_response_cache,
+    get_request_coalescer,
+    get_checkpointer,
+]
+
+
+@pytest.fixture
+def configure(monkeypatch: pytest.MonkeyPatch) -> Iterator[Callable[..., TestClient]]:
+    """Return a function that applies settings, as `HEALTHCARE_AI_*` names, and opens a client on the app."""
+    with ExitStack() as clients:
+
+        def client(**settings: object) -> TestClient:
+            monkeypatch.setenv("HEALTHCARE_AI_MODEL", "fake")
+            for name, value in settings.items():
+                monkeypatch.setenv(f"HEALTHCARE_AI_{name.upper()}", str(value))
+            for component in COMPONENTS:
+                component.cache_clear()  # pyright: ignore[reportFunctionMemberAccess]
+            return clients.enter_context(TestClient(app))
+
+        yield client
+    for component in COMPONENTS:
+        component.cache_clear()  # pyright: ignore[reportFunctionMemberAccess]
+
+
+def _turn(thread_id: str = "1", user_id: str = "1") -> dict[str, str]:
+    return {"message": "what is the weather outside?", "thread_id": thread_id, "user_id": user_id}
+
+
+def _events(body: str) -> list[tuple[str, Any]]:
+    events: list[tuple[str, Any]] = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_invoke_returns_the_structured_response(configure: Callable[..., TestClient]) -> None:
+    client = configure()
+    response = client.post("/invoke", json=_turn())
+    assert response.status_code == 200
+    assert response.json() == RESPONSE
+
+
+def test_invoke_rejects_an_incomplete_request(configure: Callable[..., TestClient]) -> None:
+    client = configure()
+    assert client.post("/invoke", json={"message": "hi"}).status_code == 422
+
+
+def test_stream_sends_fields_then_the_response(configure: Callable[..., TestClient]) -> None:
+    client = configure()
+    response = client.post("/stream", json=_turn())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    names = [event for event, _ in events]
+    assert names[-1] == "response"
+    assert events[-1][1] == RESPONSE
+    assert names.count("response") == 1
+    # The incremental field arrives as deltas before it is complete; the other field arrives whole.
+    first_field = names.index("field")
+    assert "delta" in names[:first_field]
+    deltas = "".join(data["value"] for event, data in events if event == "delta")
+    assert deltas == RESPONSE["punny_response"]
+    fields = {data["field"]: data["value"] for event, data in events if event == "field"}
+    assert fields == RESPONSE
+
+
+def test_user_over_rate_is_answered_with_429(configure: Callable[..., TestClient]) -> None:
+    client = configure(admission_user_rate=0.01, admission_user_burst=1)
+    assert client.post("/invoke", json=_turn(user_id="alice")).status_code == 200
+
+    for endpoint in ("/invoke", "/stream"):
+        rejected = client.post(endpoint, json=_turn(user_id="alice"))
+        assert rejected.status_code == 429
+        assert rejected.json()["reason"] == USER_RATE
+        assert int(rejected.headers["Retry-After"]) > 1
+    # Another user is not affected.
+    assert client.post("/stream", json=_turn(user_id="bob")).status_code == 200
+
+
+def test_full_queue_is_answered_with_429(configure: Callable[..., TestClient]) -> None:
+    client = configure(admission_user_rate=0, admission_max_concurrent=1, admission_max_queue=0, fake_model_latency=0.1)
+
+    def post(index: int) -> httpx.Response:
+        return client.post("/invoke", json=_turn(thread_id=str(index), user_id=str(index)))
+
+    with ThreadPoolExecutor(4) as callers:
+        responses = list(callers.map(post, range(4)))
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses[0] == 200
+    assert statuses[-1] == 429
+    for response in responses:
+        if response.status_code == 429:
+            assert response.json()["reason"] == QUEUE_FULL
+            assert response.headers["Retry-After"] == "1"
+    admission = get_admission()
+    assert admission is not None
+    assert admission.stats.running == 0
+
+
+def test_metrics_count_requests(configure: Callable[..., TestClient]) -> None:
+    client = configure(metrics=True)
+    client.post("/invoke", json=_turn())
+    client.post("/stream", json=_turn(thread_id="2"))
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert 'healthcare_ai_http_requests_total{endpoint="/invoke",status="200"} 1' in lines
+    assert 'healthcare_ai_http_requests_total{endpoint="/stream",status="200"} 1' in lines
+
+
+def test_metrics_endpoint_is_missing_when_disabled(configure: Callable[..., TestClient]) -> None:
+    client = configure(metrics=False)
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,169 @@
+"""Tests of the tool result cache on its sync (Future) and async (Task) paths."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from healthcare_ai.tool_cache import TOOL_CACHES, ToolResultCache, ttl_cache
+
+CALLERS = 16
+
+
+class BackendError(Exception):
+    pass
+
+
+def test_concurrent_sync_callers_compute_once() -> None:
+    cache: ToolResultCache[str] = ToolResultCache("sync", ttl=60, max_entries=8)
+    calls = 0
+    release = threading.Event()
+
+    def compute() -> str:
+        nonlocal calls
+        calls += 1
+        release.wait()
+        return "sunny"
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = [pool.submit(cache.get_or_compute, "city", compute) for _ in range(CALLERS)]
+        while cache.misses + cache.shared < CALLERS:
+            time.sleep(0.01)
+        release.set()
+        assert [result.result() for result in results] == ["sunny"] * CALLERS
+    assert calls == 1
+    assert (cache.misses, cache.shared) == (1, CALLERS - 1)
+    assert cache.get_or_compute("city", lambda: "rainy") == "sunny"
+    assert cache.hits == 1
+
+
+def test_sync_error_reaches_every_waiter_and_is_not_cached() -> None:
+    cache: ToolResultCache[str] = ToolResultCache("sync-error", ttl=60, max_entries=8)
+    release = threading.Event()
+
+    def compute() -> str:
+        release.wait()
+        raise BackendError
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = [pool.submit(cache.get_or_compute, "city", compute) for _ in range(CALLERS)]
+        while cache.misses + cache.shared < CALLERS:
+            time.sleep(0.01)
+        release.set()
+        assert all(isinstance(result.exception(), BackendError) for result in results)
+    assert cache.get_or_compute("city", lambda: "sunny") == "sunny"
+    assert cache.misses == 2
+
+
+def test_concurrent_async_callers_compute_once() -> None:
+    cache: ToolResultCache[str] = ToolResultCache("async", ttl=60, max_entries=8)
+    calls = 0
+
+    async def compute() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "sunny"
+
+    async def main() -> list[str]:
+        return await asyncio.gather(*(cache.aget_or_compute("city", compute) for _ in range(CALLERS)))
+
+    assert asyncio.run(main()) == ["sunny"] * CALLERS
+    assert calls == 1
+    assert (cache.misses, cache.shared) == (1, CALLERS - 1)
+
+
+def test_async_error_reaches_every_waiter_and_is_not_cached() -> None:
+    cache: ToolResultCache[str] = ToolResultCache("async-error", ttl=60, max_entries=8)
+
+    async def fail() -> str:
+        await asyncio.sleep(0.01)
+        raise BackendError
+
+    async def succeed() -> str:
+        return "sunny"
+
+    async def main() -> tuple[list[BaseException | str], str]:
+        failed = await asyncio.gather(
+            *(cache.aget_or_compute("city", fail) for _ in range(CALLERS)), return_exceptions=True
+        )
+        return failed, await cache.aget_or_compute("city", succeed)
+
+    failed, retried = asyncio.run(main())
+    assert all(isinstance(error, BackendError) for error in failed)
+    assert retried == "sunny"
+    assert cache.misses == 2
+
+
+def test_event_loops_in_different_threads_do_not_share_tasks() -> None:
+    cache: ToolResultCache[str] = ToolResultCache("loops", ttl=60, max_entries=8)
+    started = threading.Barrier(2)
+    loops: list[asyncio.AbstractEventLoop] = []
+
+    async def compute() -> str:
+        loops.append(asyncio.get_running_loop())
+        # Both loops are computing the same key at once.
+        await asyncio.to_thread(started.wait, 5)
+        return "sunny"
+
+    async def main() -> list[str]:
+        return await asyncio.gather(*(cache.aget_or_compute("city", compute) for _ in range(4)))
+
+    with ThreadPoolExecutor(2) as pool:
+        results = [pool.submit(asyncio.run, main()) for _ in range(2)]
+        assert [result.result(timeout=10) for result in results] == [["sunny"] * 4] * 2
+
+    # One computation per loop, each shared by that loop's callers.
+    assert len(set(loops)) == 2
+    assert (cache.misses, cache.shared) == (2, 6)
+    assert asyncio.run(cache.aget_or_compute("city", compute)) == "sunny"
+    assert cache.hits == 1
+
+
+def test_entries_expire() -> None:
+    cache: ToolResultCache[int] = ToolResultCache("expiry", ttl=0.05, max_entries=8)
+    assert cache.get_or_compute("key", lambda: 1) == 1
+    assert cache.get_or_compute("key", lambda: 2) == 1
+    time.sleep(0.1)
+    assert cache.get_or_compute("key", lambda: 3) == 3
+
+    async def compute() -> int:
+        return 4
+
+    assert asyncio.run(cache.aget_or_compute("key", compute)) == 3
+    time.sleep(0.1)
+    assert asyncio.run(cache.aget_or_compute("key", compute)) == 4
+
+
+def test_evicts_least_recently_used_entries() -> None:
+    cache: ToolResultCache[str] = ToolResultCache("eviction", ttl=60, max_entries=2)
+    cache.get_or_compute("a", lambda: "a")
+    cache.get_or_compute("b", lambda: "b")
+    cache.get_or_compute("a", lambda: "stale")
+    cache.get_or_compute("c", lambda: "c")
+    assert cache.get_or_compute("a", lambda: "new") == "a"
+    assert cache.get_or_compute("b", lambda: "new") == "new"
+
+
+@pytest.mark.parametrize("city", ["Boston", "  boston ", "BOSTON"])
+def test_ttl_cache_normalizes_arguments_and_shares_between_sync_and_async(city: str) -> None:
+    name = f"forecast-{city}"
+    calls: list[str] = []
+
+    @ttl_cache(60, name=name)
+    def forecast(city: str) -> str:
+        calls.append(city)
+        return f"sunny in {city.strip().title()}"
+
+    @ttl_cache(60, name=name)
+    async def aforecast(city: str) -> str:
+        calls.append(city)
+        return "rainy"
+
+    assert forecast("boston") == "sunny in Boston"
+    assert forecast(city) == "sunny in Boston"
+    assert asyncio.run(aforecast(city)) == "sunny in Boston"
+    assert calls == ["boston"]
+    assert TOOL_CACHES[name].hits == 2
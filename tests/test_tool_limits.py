@@ -0,0 +1,180 @@
+"""Tests of the per-tool concurrency limits and of tools running concurrently within a model step."""
+
+import asyncio
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+from langchain.tools.tool_node import ToolCallRequest
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import StructuredTool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from healthcare_ai.app import build_agent
+from healthcare_ai.config import get_settings
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.tool_cache import TOOL_CACHES
+from healthcare_ai.tool_limits import ToolConcurrencyMiddleware, get_tool_limits, parse_limits
+from healthcare_ai.tools import Context, get_weather_for_location
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+
+class Peak:
+    """Count the calls in progress and remember the most seen at once."""
+
+    def __init__(self) -> None:
+        """Start with no calls."""
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> None:
+        """Count a call starting."""
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *_: object) -> None:
+        """Count a call ending."""
+        with self._lock:
+            self.running -= 1
+
+
+def _request(name: str) -> ToolCallRequest:
+    return ToolCallRequest(
+        tool_call={"name": name, "args": {}, "id": "call_1"}, tool=None, state={}, runtime=cast("Any", None)
+    )
+
+
+@pytest.fixture
+def tool_settings(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    get_settings.cache_clear()
+    yield
+    monkeypatch.undo()
+    get_settings.cache_clear()
+
+
+def test_parse_limits() -> None:
+    assert parse_limits("") == {}
+    assert parse_limits(" get_weather = 2, search=0 ,") == {"get_weather": 2, "search": None}
+    with pytest.raises(ValueError, match="name=limit"):
+        parse_limits("get_weather")
+    with pytest.raises(ValueError, match="name=limit"):
+        parse_limits("get_weather=-1")
+
+
+@pytest.mark.usefixtures("tool_settings")
+def test_settings_configure_default_and_per_tool_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("HEALTHCARE_AI_TOOL_CONCURRENCY", "8")
+    monkeypatch.setenv("HEALTHCARE_AI_TOOL_CONCURRENCY_LIMITS", "get_weather_for_location=2,get_user_location=0")
+    [middleware] = get_tool_limits()
+    assert isinstance(middleware, ToolConcurrencyMiddleware)
+    assert middleware.limit("get_weather_for_location") == 2
+    assert middleware.limit("get_user_location") is None
+    assert middleware.limit("other") == 8
+
+    # Per-tool limits apply even without a default.
+    monkeypatch.setenv("HEALTHCARE_AI_TOOL_CONCURRENCY", "0")
+    get_settings.cache_clear()
+    [middleware] = get_tool_limits()
+    assert isinstance(middleware, ToolConcurrencyMiddleware)
+    assert middleware.limit("get_weather_for_location") == 2
+    assert middleware.limit("other") is None
+
+    monkeypatch.setenv("HEALTHCARE_AI_TOOL_CONCURRENCY_LIMITS", "")
+    get_settings.cache_clear()
+    assert get_tool_limits() == []
+
+
+def test_sync_calls_wait_for_a_slot() -> None:
+    limits = ToolConcurrencyMiddleware(default=None, limits={"slow": 2})
+    peaks = {"slow": Peak(), "fast": Peak()}
+
+    def call(name: str) -> None:
+        def handler(request: ToolCallRequest) -> ToolMessage:
+            with peaks[name]:
+                time.sleep(0.05)
+            return ToolMessage("done", tool_call_id=request.tool_call["id"] or "")
+
+        limits.wrap_tool_call(_request(name), handler)
+
+    with ThreadPoolExecutor(16) as callers:
+        list(callers.map(call, ["slow"] * 8 + ["fast"] * 8))
+
+    assert peaks["slow"].peak == 2
+    assert peaks["fast"].peak > 2
+
+
+def test_async_calls_wait_for_a_slot() -> None:
+    limits = ToolConcurrencyMiddleware(default=3)
+    peak = Peak()
+
+    async def handler(request: ToolCallRequest) -> ToolMessage:
+        with peak:
+            await asyncio.sleep(0.02)
+        return ToolMessage("done", tool_call_id=request.tool_call["id"] or "")
+
+    async def calls() -> None:
+        await asyncio.gather(*(limits.awrap_tool_call(_request("tool"), handler) for _ in range(10)))
+
+    # Each event loop gets semaphores of its own.
+    asyncio.run(calls())
+    asyncio.run(calls())
+    assert peak.peak == 3
+
+
+def _slow_tool(peak: Peak) -> StructuredTool:
+    def lookup(city: str) -> str:
+        """Look up a city."""
+        with peak:
+            time.sleep(0.1)
+        return city
+
+    async def alookup(city: str) -> str:
+        """Look up a city."""
+        with peak:
+            await asyncio.sleep(0.1)
+        return city
+
+    return StructuredTool.from_function(lookup, coroutine=alookup, name="lookup")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_tool_calls_of_one_step_run_concurrently_up_to_the_limit(*, use_async: bool) -> None:
+    peak = Peak()
+    model = FakeChatModel(script=[[{"name": "lookup", "args": {"city": f"city {i}"}} for i in range(6)]])
+    agent = build_agent(
+        model,
+        checkpointer=InMemorySaver(),
+        middleware=[ToolConcurrencyMiddleware(limits={"lookup": 3})],
+        tools=[_slow_tool(peak)],
+    )
+    question = {"messages": [{"role": "user", "content": "look up six cities"}]}
+    config: RunnableConfig = {"configurable": {"thread_id": "1"}}
+    start = time.monotonic()
+
+    if use_async:
+        response = asyncio.run(agent.ainvoke(question, config, context=Context(user_id="1")))
+    else:
+        response = agent.invoke(question, config, context=Context(user_id="1"))
+
+    # Six 0.1 s calls, three at a time.
+    assert 0.2 <= time.monotonic() - start < 0.5
+    assert peak.peak == 3
+    lookups = [message for message in response["messages"] if isinstance(message, ToolMessage)]
+    assert sorted(message.text for message in lookups if message.name == "lookup") == [f"city {i}" for i in range(6)]
+
+
+def test_sync_and_async_tools_share_one_implementation_and_cache() -> None:
+    cache = TOOL_CACHES["get_weather_for_location"]
+    hits = cache.hits
+
+    assert get_weather_for_location.invoke({"city": "Lisbon"}) == "It's always sunny in Lisbon!"
+    assert asyncio.run(get_weather_for_location.ainvoke({"city": "lisbon "})) == "It's always sunny in Lisbon!"
+    assert cache.hits == hits + 1
+    assert get_weather_for_location.description == "Get weather for a given city."
@@ -0,0 +1,119 @@
+"""Tests of the turn, step, model, tool and checkpoint spans recorded by the tracing callbacks."""
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from healthcare_ai.app import build_agent
+from healthcare_ai.fake_model import FakeChatModel
+from healthcare_ai.tools import Context
+from healthcare_ai.tracing import InMemorySpanExporter, Span, Tracer, TracingSaver, timing_record
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+QUESTION = {"messages": [{"role": "user", "content": "what is the weather outside?"}]}
+
+
+def _run(callbacks: list[Any], *, thread_id: str = "1") -> None:
+    agent = build_agent(FakeChatModel(), checkpointer=InMemorySaver())
+    config: RunnableConfig = {"configurable": {"thread_id": thread_id}, "callbacks": callbacks}
+    agent.invoke(QUESTION, config=config, context=Context(user_id="1"))
+
+
+def _named(spans: list[Span], prefix: str) -> list[Span]:
+    return [span for span in spans if span.name.split(".", 1)[0] == prefix]
+
+
+def test_spans_nest_under_the_turn() -> None:
+    spans = InMemorySpanExporter()
+    _run([Tracer(spans).handler])
+
+    [turn] = _named(spans.spans, "agent")
+    assert turn.parent_id is None
+    assert turn.attributes["thread_id"] == "1"
+    steps = _named(spans.spans, "step")
+    assert steps
+    assert all(step.parent_id == turn.span_id for step in steps)
+    step_ids = {step.span_id for step in steps}
+    # Model and tool calls run inside a graph step; checkpoint operations belong to the turn itself.
+    for span in _named(spans.spans, "model") + _named(spans.spans, "tool"):
+        assert span.parent_id in step_ids
+    assert all(span.parent_id == turn.span_id for span in _named(spans.spans, "checkpoint"))
+    assert {span.trace_id for span in spans.spans} == {turn.trace_id}
+    assert all(span.end_time_ns is not None and span.status == "ok" for span in spans.spans)
+
+
+def test_model_tool_and_checkpoint_spans() -> None:
+    spans = InMemorySpanExporter()
+    _run([Tracer(spans).handler])
+
+    # The fake model's script: two tool calls, then the structured response.
+    models = _named(spans.spans, "model")
+    assert len(models) == 3
+    assert all(span.attributes["input_tokens"] > 0 for span in models)
+    assert all(span.attributes["output_tokens"] > 0 for span in models)
+    assert [span.attributes["tool"] for span in _named(spans.spans, "tool")] == [
+        "get_user_location",
+        "get_weather_for_location",
+    ]
+    operations = {span.name for span in _named(spans.spans, "checkpoint")}
+    assert {"checkpoint.get", "checkpoint.put", "checkpoint.put_writes"} <= operations
+    assert all(span.attributes["thread_id"] == "1" for span in _named(spans.spans, "checkpoint"))
+
+    record = timing_record(spans.spans)
+    assert record["status"] == "ok"
+    assert record["model_calls"] == 3
+    assert record["tool_calls"] == 2
+    assert record["checkpoint_calls"] == len(_named(spans.spans, "checkpoint"))
+    assert record["input_tokens"] == sum(span.attributes["input_tokens"] for span in models)
+
+
+def test_every_handler_receives_checkpoint_spans() -> None:
+    # As `app.main` traces each turn alongside the process-wide tracer.
+    attached, per_call = InMemorySpanExporter(), InMemorySpanExporter()
+    _run([Tracer(attached).handler, Tracer(per_call).handler])
+
+    for spans in (attached, per_call):
+        [turn] = _named(spans.spans, "agent")
+        checkpoints = _named(spans.spans, "checkpoint")
+        assert checkpoints
+        assert all(span.parent_id == turn.span_id for span in checkpoints)
+    assert len(_named(attached.spans, "checkpoint")) == len(_named(per_call.spans, "checkpoint"))
+    assert len(_named(attached.spans, "model")) == len(_named(per_call.spans, "model")) == 3
+
+
+def test_turn_ends_leave_no_active_trace() -> None:
+    spans = InMemorySpanExporter()
+    _run([Tracer(spans).handler])
+    spans.clear()
+    # A checkpoint read outside any turn is not traced.
+    TracingSaver(InMemorySaver()).get_tuple({"configurable": {"thread_id": "1"}})
+    assert spans.spans == []
+
+
+def test_concurrent_async_turns_record_separate_traces() -> None:
+    spans = InMemorySpanExporter()
+    handler = Tracer(spans).handler
+    agent = build_agent(FakeChatModel(latency=0.01), checkpointer=InMemorySaver())
+
+    async def turns() -> None:
+        await asyncio.gather(
+            *(
+                agent.ainvoke(
+                    QUESTION,
+                    config={"configurable": {"thread_id": str(i)}, "callbacks": [handler]},
+                    context=Context(user_id="1"),
+                )
+                for i in range(4)
+            )
+        )
+
+    asyncio.run(turns())
+    turns_by_trace = {span.trace_id: span for span in _named(spans.spans, "agent")}
+    assert len(turns_by_trace) == 4
+    for span in _named(spans.spans, "checkpoint"):
+        turn = turns_by_trace[span.trace_id]
+        assert span.parent_id == turn.span_id
+        assert span.attributes["thread_id"] == turn.attributes["thread_id"]